@@ -0,0 +1,95 @@
+## Benchmark: JSON vs Arrow IPC (format=arrow) for the large tabular endpoints.
+## For each payload: body size, server-side encode time and client-side decode time
+## (orjson.loads for JSON, polars.read_ipc_stream for Arrow; the browser uses JSON.parse and
+## apache-arrow's tableFromIPC, which behave alike: Arrow decoding does not touch every value).
+##
+## Payloads are synthetic but have the shape of each endpoint's response.
+## Run from the repository root:  python -m backend.benchmarks.bench_arrow_responses
+
+import io
+import gzip
+import time
+import numpy as np
+import pandas as pd
+import polars as pl
+import orjson
+
+from backend.funcs.executor import encode_json
+from backend.funcs.arrow import cell_metadata_ipc, umap_ipc, expr_ipc, columns_ipc
+
+N_CELLS = 300_000
+N_EXPR = 120_000
+N_SNPS = 200_000
+N_BASES = 100_000
+N_REPEATS = 5
+
+
+def make_payloads():
+    rng = np.random.default_rng(42)
+    cells = [f"S{i % 8}_cell{i}" for i in range(N_CELLS)]
+
+    meta = pd.DataFrame(
+        {
+            "cell_type": rng.integers(0, 12, N_CELLS),
+            "nCount_RNA": rng.integers(100, 5000, N_CELLS),
+            "sample_id": [c.split("_")[0] for c in cells],
+        },
+        index=cells,
+    )
+    metadata = {"cell_metadata": meta.to_dict(orient="split"), "cell_metadata_mapping": {}, "sample_metadata": {}}
+
+    xs, ys = rng.normal(size=(2, N_CELLS)).round(2).tolist()
+    umap = [[c, x, y] for c, x, y in zip(cells, xs, ys)]
+
+    expr = dict(zip(cells[:N_EXPR], rng.random(N_EXPR).round(2).tolist()))
+
+    snps = {
+        "snp_id": pl.Series([f"rs{i}" for i in range(N_SNPS)]),
+        "position": pl.Series(np.sort(rng.integers(1, 248_000_000, N_SNPS))),
+    }
+
+    positions = np.arange(1_000_000, 1_000_000 + N_BASES, dtype=np.int64)
+    values = np.repeat(rng.random(N_BASES // 50).round(4), 50)
+    signal = {"position": positions, "value": values}
+
+    ## (endpoint, JSON payload, Arrow encoder, Arrow payload)
+    return [
+        ("getallmetadata", metadata, cell_metadata_ipc, meta),
+        ("getumapembedding", umap, umap_ipc, umap),
+        ("getexprdata", expr, expr_ipc, expr),
+        ("getsnplocations", snps, columns_ipc, snps),
+        ("getregionsignaldata", {"hasBWData": True, "data": signal}, columns_ipc, signal),
+    ]
+
+
+def best_of(func):
+    times = []
+    for _ in range(N_REPEATS):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+def main():
+    print(
+        f"{'endpoint':<22}{'JSON MB':>9}{'Arrow MB':>10}{'JSON gz':>9}{'Arrow gz':>10}"
+        f"{'enc JSON':>10}{'enc Arrow':>11}{'dec JSON':>10}{'dec Arrow':>11}"
+    )
+    for endpoint, json_payload, encode, arrow_payload in make_payloads():
+        json_enc, json_body = best_of(lambda: encode_json(json_payload))
+        arrow_enc, arrow_body = best_of(lambda: encode(arrow_payload))
+        json_dec, _ = best_of(lambda: orjson.loads(json_body))
+        arrow_dec, _ = best_of(lambda: pl.read_ipc_stream(io.BytesIO(arrow_body)))
+        json_gz = len(gzip.compress(json_body, 6))
+        arrow_gz = len(gzip.compress(arrow_body, 6))
+        print(
+            f"{endpoint:<22}{len(json_body) / 1e6:9.2f}{len(arrow_body) / 1e6:10.2f}"
+            f"{json_gz / 1e6:9.2f}{arrow_gz / 1e6:10.2f}"
+            f"{json_enc:10.1f}{arrow_enc:11.1f}{json_dec:10.1f}{arrow_dec:11.1f}"
+        )
+    print("times in ms (best of {}), gz = gzip level 6".format(N_REPEATS))
+
+
+if __name__ == "__main__":
+    main()
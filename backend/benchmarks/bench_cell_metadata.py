@@ -0,0 +1,90 @@
+## Benchmark: cellspot_metadata.csv (pd.read_csv + subset) vs cellspot_metadata.parquet
+## (backend/funcs/cell_metadata.read_cell_metadata) for the reads of getallmetadata and
+## getmetadataofsample: whole table, two columns, the UMAP subset of cells (a cs_id join on the
+## CSV, a positional take on the parquet), one sample.
+##
+## The table is synthetic with the shape written by 31_rename_meta_*.py (integer category codes,
+## numeric QC columns, one string column). Run from the repository root:
+##   python -m backend.benchmarks.bench_cell_metadata
+
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+from backend.funcs.utils import save_cell_metadata_parquet
+from backend.funcs.cell_metadata import read_cell_metadata
+
+N_CELLS = 1_000_000
+N_SAMPLES = 40
+N_UMAP = 50_000
+N_REPEATS = 3
+
+
+def make_table():
+    rng = np.random.default_rng(42)
+    samples = rng.integers(0, N_SAMPLES, N_CELLS)
+    cells = [f"S{s}_cell{i}" for i, s in enumerate(samples)]
+    return pd.DataFrame(
+        {
+            "cell_type": rng.integers(0, 20, N_CELLS).astype(np.int8),
+            "seurat_clusters": rng.integers(0, 40, N_CELLS).astype(np.int8),
+            "sample_id": samples.astype(np.int8),
+            "condition": rng.integers(0, 3, N_CELLS).astype(np.int8),
+            "nCount_RNA": rng.integers(100, 50_000, N_CELLS),
+            "nFeature_RNA": rng.integers(100, 8_000, N_CELLS),
+            "percent_mt": rng.random(N_CELLS).round(3),
+            "barcode": [f"AAACCTG{i:09d}" for i in range(N_CELLS)],
+        },
+        index=pd.Index(cells, name="cs_id"),
+    )
+
+
+def best_of(func):
+    times = []
+    for _ in range(N_REPEATS):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+def main():
+    table = make_table()
+    ## UMAP subset as positions in the dense cell index (= row of the table) and as cs_ids
+    umap_rows = np.random.default_rng(1).choice(N_CELLS, N_UMAP, replace=False)
+    umap_cells = table.index.to_numpy()[umap_rows].tolist()
+    cols = ["cell_type", "sample_id"]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = os.path.join(tmp_dir, "cellspot_metadata.csv")
+        parquet_file = os.path.join(tmp_dir, "cellspot_metadata.parquet")
+        table.to_csv(csv_file)
+        save_cell_metadata_parquet(table, parquet_file)
+        print(f"{N_CELLS} cells: csv {os.path.getsize(csv_file) / 1e6:.1f} MB, "
+              f"parquet {os.path.getsize(parquet_file) / 1e6:.1f} MB")
+
+        def csv_read():
+            return pd.read_csv(csv_file, index_col=0, header=0)
+
+        cases = [
+            ("all columns", lambda: csv_read(), lambda: read_cell_metadata(parquet_file)),
+            ("cols[] (2 columns)", lambda: csv_read()[cols], lambda: read_cell_metadata(parquet_file, cols=cols)),
+            ("rows[]=umap", lambda: csv_read().loc[umap_cells, :],
+             lambda: read_cell_metadata(parquet_file, cells=umap_rows)),
+            ("sample=S7", lambda: (lambda df: df.loc[df.index.str.startswith("S7_"), :])(csv_read()),
+             lambda: read_cell_metadata(parquet_file, prefix="S7_")),
+        ]
+
+        print(f"{'read':<22}{'csv ms':>10}{'parquet ms':>12}{'rows':>10}")
+        for name, csv_func, parquet_func in cases:
+            csv_ms, csv_df = best_of(csv_func)
+            parquet_ms, parquet_df = best_of(parquet_func)
+            assert csv_df.shape == parquet_df.shape
+            print(f"{name:<22}{csv_ms:10.0f}{parquet_ms:12.0f}{len(parquet_df):10}")
+    print(f"best of {N_REPEATS}")
+
+
+if __name__ == "__main__":
+    main()
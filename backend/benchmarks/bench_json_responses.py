@@ -0,0 +1,86 @@
+## Benchmark: JSON encoding of the five largest responses.
+## before: FastAPI's default path, jsonable_encoder() + stdlib json over Python lists/dicts
+## after:  ORJSONResponse (backend/funcs/responses.py) over the values the loaders now return
+##
+## Payloads are synthetic but have the shape of each endpoint's response.
+## Run from the repository root:  python -m backend.benchmarks.bench_json_responses
+
+import time
+import numpy as np
+import pandas as pd
+import polars as pl
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from backend.funcs.responses import ORJSONResponse
+
+N_CELLS = 300_000
+N_EXPR = 120_000
+N_GWAS = 200_000
+N_BASES = 100_000
+N_REPEATS = 5
+
+
+def make_payloads():
+    rng = np.random.default_rng(42)
+    cells = [f"S{i % 8}_cell{i}" for i in range(N_CELLS)]
+
+    meta = pd.DataFrame(
+        {
+            "cell_type": rng.integers(0, 12, N_CELLS),
+            "nCount_RNA": rng.integers(100, 5000, N_CELLS),
+            "sample_id": [c.split("_")[0] for c in cells],
+        },
+        index=cells,
+    )
+    metadata = {"cell_metadata": meta.to_dict(orient="split"), "cell_metadata_mapping": {}, "sample_metadata": {}}
+
+    xs, ys = rng.normal(size=(2, N_CELLS)).round(2).tolist()
+    umap = [[c, x, y] for c, x, y in zip(cells, xs, ys)]
+
+    expr = dict(zip(cells[:N_EXPR], rng.random(N_EXPR).round(2).tolist()))
+
+    gwas = pl.DataFrame(
+        {
+            "snp_id": [f"rs{i}" for i in range(N_GWAS)],
+            "position": np.sort(rng.integers(1, 248_000_000, N_GWAS)),
+            "beta_value": rng.normal(size=N_GWAS).round(4),
+            "p_value": rng.random(N_GWAS),
+        }
+    )
+    gwas_after = {"hasGwas": True, "data": {col: gwas.get_column(col) for col in gwas.columns}}
+    gwas_before = {"hasGwas": True, "data": gwas.to_dict(as_series=False)}
+
+    positions = np.arange(1_000_000, 1_000_000 + N_BASES, dtype=np.int64)
+    values = np.repeat(rng.random(N_BASES // 50).round(4), 50)
+    signal_after = {"hasBWData": True, "data": {"position": positions, "value": values}}
+    signal_before = {"hasBWData": True, "data": {"position": positions.tolist(), "value": values.tolist()}}
+
+    return [
+        ("getallmetadata", metadata, metadata),
+        ("getumapembedding", umap, umap),
+        ("getexprdata", expr, expr),
+        ("getgwasinchromosome", gwas_before, gwas_after),
+        ("getregionsignaldata", signal_before, signal_after),
+    ]
+
+
+def best_of(func):
+    times = []
+    for _ in range(N_REPEATS):
+        start = time.perf_counter()
+        body = func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, len(body)
+
+
+def main():
+    print(f"{'endpoint':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}{'MB':>8}")
+    for endpoint, before, after in make_payloads():
+        before_ms, _ = best_of(lambda: JSONResponse(jsonable_encoder(before)).body)
+        after_ms, size = best_of(lambda: ORJSONResponse(after).body)
+        print(f"{endpoint:<22}{before_ms:12.1f}{after_ms:12.1f}{before_ms / after_ms:9.1f}x{size / 1e6:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+## Benchmark: annotate the target genes of a SNP (get_gene_data_for_snp).
+## before: three map_elements passes, each opening gene_jsons/<gene>.json per row
+## after:  one join against the cached gene annotation table
+##
+## Run from the repository root:  python -m backend.benchmarks.bench_qtl_annotation
+
+import os
+import json
+import time
+import tempfile
+import numpy as np
+import polars as pl
+
+from backend.funcs.get_data import get_gene_data_for_snp, safe_filename
+
+N_GENES = 20000
+N_SNPS = 2000
+N_TARGETS = 50
+N_REPEATS = 20
+
+
+def make_dataset(root, dataset):
+    rng = np.random.default_rng(42)
+    dataset_path = os.path.join(root, "backend", "datasets", dataset)
+    for folder in ["celltypes", "gene_jsons", "gene_locations"]:
+        os.makedirs(os.path.join(dataset_path, folder), exist_ok=True)
+
+    genes = pl.DataFrame(
+        {
+            "gene_id": [f"GENE{i}" for i in range(N_GENES)],
+            "chromosome": rng.choice(["chr1", "chr2", "chr3"], N_GENES),
+            "position_start": rng.integers(1, 100_000_000, N_GENES),
+        }
+    ).with_columns((pl.col("position_start") + 10_000).alias("position_end"), pl.lit("+").alias("strand"))
+
+    for chrom, df in genes.group_by("chromosome"):
+        df.drop("chromosome").write_parquet(os.path.join(dataset_path, "gene_locations", f"{chrom[0]}.parquet"))
+    for row in genes.iter_rows(named=True):
+        with open(os.path.join(dataset_path, "gene_jsons", safe_filename(row["gene_id"]) + ".json"), "w") as f:
+            json.dump({k: row[k] for k in ["chromosome", "position_start", "position_end", "strand"]}, f)
+
+    ## every SNP has N_TARGETS target genes
+    snp_ids = np.repeat([f"rs{i}" for i in range(N_SNPS)], N_TARGETS)
+    qtl = pl.DataFrame(
+        {
+            "snp_id": snp_ids,
+            "gene_id": rng.choice(genes["gene_id"].to_numpy(), len(snp_ids)),
+            "p_value": rng.random(len(snp_ids)) * 0.01,
+            "beta_value": rng.normal(size=len(snp_ids)),
+        }
+    )
+    qtl.write_parquet(os.path.join(dataset_path, "celltypes", "Astro.parquet"))
+    with open(os.path.join(dataset_path, "celltypes", "celltype_parquet.json"), "w") as f:
+        json.dump({"Astro": "Astro.parquet"}, f)
+
+
+def get_gene_data_for_snp_before(dataset, snp, celltype):
+    ## the previous implementation, kept here for comparison
+    data_file = os.path.join("backend", "datasets", dataset, "celltypes", celltype + ".parquet")
+    snp_df = pl.scan_parquet(data_file).filter(pl.col("snp_id") == snp).collect().drop("snp_id")
+
+    def get_gene_location(gene):
+        with open(os.path.join("backend", "datasets", dataset, "gene_jsons", safe_filename(gene) + ".json")) as f:
+            gene_x = json.load(f)
+        return {"start": gene_x["position_start"], "end": gene_x["position_end"], "strand": gene_x["strand"]}
+
+    snp_df = snp_df.with_columns(
+        [
+            pl.col("gene_id").map_elements(lambda g: get_gene_location(g)["start"], return_dtype=pl.Int64).alias("position_start"),
+            pl.col("gene_id").map_elements(lambda g: get_gene_location(g)["end"], return_dtype=pl.Int64).alias("position_end"),
+            pl.col("gene_id").map_elements(lambda g: get_gene_location(g)["strand"], return_dtype=pl.String).alias("strand"),
+        ]
+    ).drop_nulls()
+    return {col: snp_df.get_column(col).to_list() for col in snp_df.columns}
+
+
+def timeit(func, snps):
+    times = []
+    for snp in snps:
+        start = time.perf_counter()
+        func(snp)
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000
+    return np.median(times), np.percentile(times, 95)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as root:
+        make_dataset(root, "bench_qtl")
+        cwd = os.getcwd()
+        os.chdir(root)
+        try:
+            snps = [f"rs{i}" for i in range(N_REPEATS)]
+            before = get_gene_data_for_snp_before("bench_qtl", snps[0], "Astro")
+            after = get_gene_data_for_snp("bench_qtl", snps[0], "Astro")
+            assert before == after, "results differ"
+
+            print(f"{N_GENES:,} genes, {N_TARGETS} target genes per SNP, {N_REPEATS} SNPs")
+            print("before: median %.2f ms, p95 %.2f ms" % timeit(lambda s: get_gene_data_for_snp_before("bench_qtl", s, "Astro"), snps))
+            print("after:  median %.2f ms, p95 %.2f ms" % timeit(lambda s: get_gene_data_for_snp("bench_qtl", s, "Astro"), snps))
+        finally:
+            os.chdir(cwd)
@@ -0,0 +1,101 @@
+## Load test: latency of a cheap endpoint while heavy requests run on the same worker.
+## The cheap requests should stay flat, because the heavy loaders run off the event loop
+## (backend/funcs/executor.py).
+##
+## Run from the repository root:  python -m backend.benchmarks.load_test
+
+import os
+import json
+import time
+import asyncio
+import tempfile
+import numpy as np
+import pandas as pd
+import httpx
+
+N_CELLS = 300_000
+N_HEAVY = 4
+N_CHEAP = 500
+CHEAP_INTERVAL = 0.01
+DATASET = "loadtest"
+
+
+def make_dataset(root):
+    rng = np.random.default_rng(42)
+    dataset_path = os.path.join(root, "backend", "datasets", DATASET)
+    os.makedirs(dataset_path, exist_ok=True)
+
+    cells = [f"S{i % 8}_cell{i}" for i in range(N_CELLS)]
+    meta = pd.DataFrame(
+        {
+            "cell_type": rng.integers(0, 12, N_CELLS),
+            "nCount_RNA": rng.integers(100, 5000, N_CELLS),
+            "sample_id": [c.split("_")[0] for c in cells],
+        },
+        index=pd.Index(cells, name="cs_id"),
+    )
+    meta.to_csv(os.path.join(dataset_path, "cellspot_metadata.csv"))
+    pd.DataFrame({"sample_id": [f"S{i}" for i in range(8)], "Condition": ["PD", "HC"] * 4}).to_csv(
+        os.path.join(dataset_path, "sample_metadata.csv"), index=False
+    )
+    with open(os.path.join(dataset_path, "cellspot_meta_mapping.json"), "w") as f:
+        json.dump({"cell_type": {str(i): [f"CT{i}", 0] for i in range(12)}}, f)
+    with open(os.path.join(dataset_path, "meta_list.json"), "w") as f:
+        json.dump(["cell_type", "nCount_RNA", "sample_id", "Condition"], f)
+
+
+def percentile(values, q):
+    return float(np.percentile(np.array(values) * 1000, q))
+
+
+async def cheap_requests(client, latencies):
+    ## open loop: latency is measured from the scheduled send time, so time spent waiting
+    ## for a blocked event loop is counted
+    t0 = time.perf_counter()
+    for k in range(N_CHEAP):
+        scheduled = t0 + k * CHEAP_INTERVAL
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        r = await client.get(f"/api/getmetalist?dataset={DATASET}&query_str=all")
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - scheduled)
+
+
+async def heavy_request(client):
+    start = time.perf_counter()
+    r = await client.get(f"/api/getallmetadata?dataset_id={DATASET}")
+    r.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(with_heavy):
+    from backend.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        latencies = []
+        tasks = [cheap_requests(client, latencies)]
+        if with_heavy:
+            tasks += [heavy_request(client) for _ in range(N_HEAVY)]
+        results = await asyncio.gather(*tasks)
+    heavy = results[1:]
+    return latencies, heavy
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        make_dataset(root)
+        os.chdir(root)
+
+        for label, with_heavy in [("cheap only", False), (f"cheap + {N_HEAVY} x getallmetadata", True)]:
+            latencies, heavy = asyncio.run(run(with_heavy))
+            line = (
+                f"{label:<32} getmetalist p50 {percentile(latencies, 50):7.1f} ms"
+                f"  p99 {percentile(latencies, 99):7.1f} ms  max {percentile(latencies, 100):7.1f} ms"
+            )
+            if heavy:
+                line += f"  | getallmetadata mean {np.mean(heavy) * 1000:8.1f} ms"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import io
+import pandas as pd
+import polars as pl
+from fastapi.responses import Response
+
+
+## Opt-in Arrow IPC stream responses for the large tabular endpoints, requested with ?format=arrow
+## or an "Accept: application/vnd.apache.arrow.stream" header; JSON stays the default.
+## Tables are written by polars (no pyarrow needed) as one uncompressed IPC stream, which the
+## apache-arrow JS reader (tableFromIPC) reads without copying the numeric columns.
+## The *_ipc encoders are module-level so run_encoded() can call them in the worker processes.
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def wants_arrow(request):
+    return request.query_params.get("format", "") == "arrow" or ARROW_STREAM in request.headers.get("accept", "")
+
+
+def _compact(series):
+    ## int64 as int32 when it fits, floats as float32 (the values served here are rounded to a
+    ## few significant digits), repeated strings dictionary-encoded
+    if series.dtype == pl.Int64 and (series.len() == series.null_count() or (
+        series.min() >= -(2**31) and series.max() < 2**31
+    )):
+        return series.cast(pl.Int32)
+    if series.dtype == pl.Float64:
+        return series.cast(pl.Float32)
+    if series.dtype == pl.String and len(series) and series.n_unique() * 2 <= len(series):
+        return series.cast(pl.Categorical)
+    return series
+
+
+def to_ipc(df):
+    ## oldest compat level: plain utf8 strings instead of string views, readable by older arrow clients
+    buffer = io.BytesIO()
+    df.select(_compact(series) for series in df.get_columns()).write_ipc_stream(
+        buffer, compat_level=pl.CompatLevel.oldest()
+    )
+    return buffer.getvalue()
+
+
+def arrow_response(body):
+    return Response(content=body, media_type=ARROW_STREAM)
+
+
+def columns_ipc(data):
+    ## {column: list/array/polars Series}, e.g. SNP locations or bigwig signal
+    return to_ipc(pl.DataFrame(data))
+
+
+def cell_metadata_ipc(data_df):
+    ## pandas cell table indexed by cs_id; built from numpy columns (pl.from_pandas needs pyarrow)
+    columns = [pl.Series("cs_id", data_df.index.astype(str).to_numpy(), dtype=pl.String)]
+    for col in data_df.columns:
+        values = data_df[col]
+        if values.dtype == object:
+            columns.append(pl.Series(str(col), [None if pd.isna(v) else str(v) for v in values], dtype=pl.String))
+        else:
+            columns.append(pl.Series(str(col), values.to_numpy()))
+    return to_ipc(pl.DataFrame(columns))
+
+
+def umap_ipc(rows):
+    ## [[cs_id, umap_1, umap_2], ...]
+    return to_ipc(pl.DataFrame(rows, schema=["cs_id", "umap_1", "umap_2"], orient="row"))
+
+
+def expr_ipc(cell_expr):
+    ## {cs_id: value}
+    return to_ipc(
+        pl.DataFrame(
+            {"cs_id": list(cell_expr.keys()), "value": list(cell_expr.values())},
+            schema={"cs_id": pl.String, "value": pl.Float64},
+        )
+    )
@@ -0,0 +1,149 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import pyBigWig
+
+from backend.settings import settings
+from backend.funcs.cache import file_signature
+
+
+class _PoolEntry:
+    def __init__(self, signature, max_readers):
+        self.signature = signature
+        self.idle = []
+        self.open = 0
+        self.readers = threading.BoundedSemaphore(max_readers)
+
+
+class BigWigPool:
+    """
+    Pool of pyBigWig handles, keyed by file path.
+
+    A handle is used by one thread at a time; at most `max_readers` handles are open per file
+    and further readers wait for one to be returned. Idle handles are closed least recently used
+    first when more than `max_handles` are open, and all handles of a file are closed once the
+    file's mtime/size changes or its dataset is invalidated.
+    """
+
+    def __init__(self, max_handles, max_readers):
+        self.max_handles = max_handles
+        self.max_readers = max_readers
+        self._entries = OrderedDict()  # path -> _PoolEntry, least recently used first
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.closed = 0
+        self.waits = 0
+
+    def _close(self, handle):
+        try:
+            handle.close()
+        except Exception as e:
+            print(f"Error: Could not close bigwig handle: {e}")
+        self.closed += 1
+
+    def _retire(self, path, entry):
+        ## close idle handles now; handles in use are closed when returned
+        for handle in entry.idle:
+            self._close(handle)
+        entry.open -= len(entry.idle)
+        entry.idle = []
+        if self._entries.get(path) is entry:
+            del self._entries[path]
+
+    def _evict_idle(self):
+        total = sum(entry.open for entry in self._entries.values())
+        for entry in list(self._entries.values()):
+            while total > self.max_handles and entry.idle:
+                self._close(entry.idle.pop())
+                entry.open -= 1
+                total -= 1
+            if total <= self.max_handles:
+                break
+
+    def _entry(self, path, signature):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature != signature:
+                self._retire(path, entry)
+                entry = None
+            if entry is None:
+                entry = _PoolEntry(signature, self.max_readers)
+                self._entries[path] = entry
+            self._entries.move_to_end(path)
+            return entry
+
+    @contextmanager
+    def handle(self, path):
+        ## yields an open handle for this thread only, or None if the file cannot be opened
+        try:
+            signature = file_signature(path)
+        except OSError:
+            print(f"Error: Could not open {path}")
+            yield None
+            return
+
+        entry = self._entry(path, signature)
+        if not entry.readers.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            entry.readers.acquire()
+
+        try:
+            with self._lock:
+                bw = entry.idle.pop() if entry.idle else None
+                if bw is None:
+                    entry.open += 1
+            if bw is None:
+                try:
+                    bw = pyBigWig.open(path)
+                except Exception as e:
+                    print(f"Error: Could not open {path}")
+                    print(f"{e}")
+                    with self._lock:
+                        entry.open -= 1
+                    yield None
+                    return
+                with self._lock:
+                    self.opened += 1
+
+            try:
+                yield bw
+            finally:
+                with self._lock:
+                    if self._entries.get(path) is entry:
+                        entry.idle.append(bw)
+                        self._evict_idle()
+                    else:
+                        ## file changed or dataset invalidated while in use
+                        entry.open -= 1
+                        self._close(bw)
+        finally:
+            entry.readers.release()
+
+    def invalidate(self, dataset=None):
+        prefix = os.path.join("backend", "datasets", dataset, "") if dataset is not None else ""
+        with self._lock:
+            for path, entry in list(self._entries.items()):
+                if path.startswith(prefix):
+                    self._retire(path, entry)
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            open_handles = sum(entry.open for entry in entries)
+            idle = sum(len(entry.idle) for entry in entries)
+            return {
+                "files": len(entries),
+                "open": open_handles,
+                "in_use": open_handles - idle,
+                "idle": idle,
+                "max_handles": self.max_handles,
+                "max_readers_per_file": self.max_readers,
+                "opened": self.opened,
+                "closed": self.closed,
+                "waits": self.waits,
+            }
+
+
+bigwig_pool = BigWigPool(settings.bigwig_max_handles, settings.bigwig_readers_per_file)
@@ -0,0 +1,202 @@
+import os
+import json
+import threading
+import toml
+import numpy as np
+import pandas as pd
+from types import MappingProxyType
+from collections import OrderedDict
+
+from backend.settings import settings
+
+
+class LRUCache:
+    """
+    Thread-safe LRU mapping bounded by a total cost (e.g. bytes), with hit/miss counters.
+    """
+
+    def __init__(self, max_cost, name="cache"):
+        self.name = name
+        self.max_cost = max_cost
+        self.total_cost = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()  # key -> (value, cost)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key, None)
+            if item is None:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, cost=1):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total_cost -= old[1]
+            if cost > self.max_cost:
+                ## larger than the whole budget, do not cache
+                return
+            self._items[key] = (value, cost)
+            self.total_cost += cost
+            self._evict()
+
+    def resize(self, max_cost):
+        with self._lock:
+            self.max_cost = max_cost
+            self._evict()
+
+    def _evict(self):
+        ## called with the lock held
+        while self.total_cost > self.max_cost and self._items:
+            _, (_, evicted_cost) = self._items.popitem(last=False)
+            self.total_cost -= evicted_cost
+            self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                return None
+            self.total_cost -= item[1]
+            return item[0]
+
+    def remove_if(self, predicate):
+        with self._lock:
+            keys = [key for key in self._items if predicate(key)]
+            for key in keys:
+                self.total_cost -= self._items.pop(key)[1]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.total_cost = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "items": len(self._items),
+                "cost": self.total_cost,
+                "max_cost": self.max_cost,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+_MUTABLE = (dict, list, tuple, np.ndarray)
+
+
+def freeze(value):
+    ## read-only version of a loaded value, shared by every request that hits the cache:
+    ## dicts -> MappingProxyType, lists -> tuples (recursively), numpy arrays -> non-writeable.
+    ## Done once per load; other objects are kept as they are (pandas frames are copied on return)
+    if isinstance(value, dict):
+        return MappingProxyType(
+            {key: freeze(item) if isinstance(item, _MUTABLE) else item for key, item in value.items()}
+        )
+    if isinstance(value, list) or type(value) is tuple:
+        return tuple([freeze(item) if isinstance(item, _MUTABLE) else item for item in value])
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    return value
+
+
+class ArtifactCache:
+    """
+    Process-wide cache of parsed dataset files, keyed by (dataset, artifact path, tag).
+
+    Each entry remembers the mtime/size of its file and is reloaded when the file changes,
+    so files rewritten by a dataset upload/re-processing are picked up without a restart.
+    The memory budget is accounted in on-disk bytes of the cached files, unless the caller
+    passes an explicit cost (a number, or a function of the loaded value).
+
+    Cached values are shared between requests and threads, so callers must not mutate them:
+    loaded dicts, lists and numpy arrays are frozen (see freeze()) and pandas DataFrames are
+    returned as copies. Build a new object (dict(value), list(value), array.copy()) to modify it.
+    """
+
+    def __init__(self, max_bytes):
+        self._lru = LRUCache(max_bytes, name="artifacts")
+
+    def load(self, dataset, path, loader, tag="", cost=None):
+        key = (dataset, path, tag)
+        try:
+            signature = file_signature(path)
+        except FileNotFoundError:
+            self._lru.pop(key)
+            raise
+
+        cached = self._lru.get(key)
+        if cached is not None and cached[0] == signature:
+            return self._view(cached[1])
+
+        value = freeze(loader(path))
+        if cost is None:
+            cost = signature[1]
+        elif callable(cost):
+            cost = cost(value)
+        self._lru.put(key, (signature, value), cost=cost)
+        return self._view(value)
+
+    @staticmethod
+    def _view(value):
+        ## pandas has no read-only frames: every caller gets its own copy
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return value.copy()
+        return value
+
+    def resize(self, max_bytes):
+        ## memory budget of the executor's worker processes (settings.process_cache_mb)
+        self._lru.resize(max_bytes)
+
+    def invalidate(self, dataset=None):
+        if dataset is None:
+            self._lru.clear()
+            return
+        self._lru.remove_if(lambda key: key[0] == dataset)
+
+    def stats(self):
+        return self._lru.stats()
+
+
+artifact_cache = ArtifactCache(settings.artifact_cache_mb * 1024 * 1024)
+
+
+def read_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def read_toml(path):
+    with open(path, "r") as f:
+        return toml.load(f)
+
+
+def load_json(dataset, path):
+    return artifact_cache.load(dataset, path, read_json, tag="json")
+
+
+def load_toml(dataset, path):
+    return artifact_cache.load(dataset, path, read_toml, tag="toml")
+
+
+def load_csv(dataset, path, index_col=None):
+    return artifact_cache.load(
+        dataset, path, lambda p: pd.read_csv(p, index_col=index_col, header=0), tag=f"csv:{index_col}"
+    )
@@ -0,0 +1,76 @@
+import os
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from backend.funcs.cache import artifact_cache, read_json
+
+
+## Dense int32 cell index of a dataset: cell i is row i of cellspot_metadata (.csv/.parquet) and of
+## the expression store (whose indices.npy already holds these positions). The string cs_ids are
+## kept once, in <dataset>/cell_ids.json (utils.save_cell_ids, written by 31_rename_meta_*.py);
+## older datasets take the list from expr_store/cells.json or the metadata file, which have the
+## same order. The UMAP cells are resolved to positions once per file, so the metadata and
+## expression of the UMAP subset are positional takes instead of cs_id joins, and layout=index
+## responses send positions (the client fetches the lookup table from /api/getcellids once).
+
+CELL_IDS_FILE = "cell_ids.json"
+
+
+class CellIndex:
+    def __init__(self, cell_ids):
+        self.cell_ids = np.asarray(cell_ids, dtype=object)
+        ## built with the (cached, shared) index instead of on first use
+        self._lookup = pd.Index(self.cell_ids)
+
+    def __len__(self):
+        return len(self.cell_ids)
+
+    def positions(self, cs_ids):
+        ## int32 positions of cs_ids, -1 for unknown cells
+        return self._lookup.get_indexer(cs_ids).astype(np.int32)
+
+
+def _read_cell_ids(path):
+    if path.endswith(".json"):
+        return read_json(path)
+    if path.endswith(".parquet"):
+        df = pl.scan_parquet(path)
+        return df.select(pl.first()).collect().to_series().to_list()
+    return pd.read_csv(path, usecols=[0]).iloc[:, 0].astype(str).tolist()
+
+
+def get_cell_index(dataset):
+    ## CellIndex of the dataset, or None without cell ids
+    dataset_path = os.path.join("backend", "datasets", dataset)
+    for file_name in [CELL_IDS_FILE, os.path.join("expr_store", "cells.json"),
+                      "cellspot_metadata.parquet", "cellspot_metadata.csv"]:
+        path = os.path.join(dataset_path, file_name)
+        if os.path.exists(path):
+            return artifact_cache.load(
+                dataset, path, lambda f: CellIndex(_read_cell_ids(f)), tag="cell_index",
+                cost=lambda index: 100 * len(index),
+            )
+    return None
+
+
+def _load_umap_cells(dataset, umap_file):
+    data_df = pd.read_csv(umap_file, index_col=None, header=0)
+    cell_index = get_cell_index(dataset)
+    cs_ids = data_df.iloc[:, 0].astype(str).to_numpy()
+    return {
+        "cell": cell_index.positions(cs_ids) if cell_index is not None else np.full(len(cs_ids), -1, dtype=np.int32),
+        "x": data_df.iloc[:, 1].to_numpy(dtype=np.float64),
+        "y": data_df.iloc[:, 2].to_numpy(dtype=np.float64),
+    }
+
+
+def get_umap_cells(dataset):
+    ## the UMAP subset (umap_embeddings_50k.csv) as aligned arrays {"cell": int32, "x", "y"}, or None
+    umap_file = os.path.join("backend", "datasets", dataset, "umap_embeddings_50k.csv")
+    if not os.path.exists(umap_file):
+        return None
+    return artifact_cache.load(
+        dataset, umap_file, lambda f: _load_umap_cells(dataset, f), tag="umap_cells",
+        cost=lambda cells: 20 * len(cells["cell"]),
+    )
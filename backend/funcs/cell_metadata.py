@@ -0,0 +1,53 @@
+import os
+import pandas as pd
+import polars as pl
+
+
+## Columnar cell metadata store: <dataset>/cellspot_metadata.parquet, written next to
+## cellspot_metadata.csv by 31_rename_meta_*.py (utils.save_cell_metadata_parquet).
+## The file keeps the CSV's row order and the integer category codes in their narrow types
+## (decoded by cellspot_meta_mapping.json as before), with small row groups so the sample prefix
+## filter on cs_id skips row groups by their min/max statistics. Row i is cell i of the dense cell
+## index (backend/funcs/cell_index.py), so the UMAP subset is a positional take.
+## Reads are lazy: only the requested columns are decoded and the row filter is pushed into the
+## scan; polars memory-maps the local file. Datasets without the file use the CSV.
+
+CELL_METADATA_PARQUET = "cellspot_metadata.parquet"
+
+
+def get_cell_metadata_parquet(dataset):
+    ## path of the parquet store, or None for datasets processed before it
+    parquet_file = os.path.join("backend", "datasets", dataset, CELL_METADATA_PARQUET)
+    return parquet_file if os.path.exists(parquet_file) else None
+
+
+def to_pandas(df, index="cs_id"):
+    ## polars -> pandas without pyarrow: numpy columns, missing values become NaN/None
+    return pd.DataFrame(
+        {name: df.get_column(name).to_numpy() for name in df.columns if name != index},
+        index=pd.Index(df.get_column(index).to_numpy(), name=index),
+    )
+
+
+def read_cell_metadata(parquet_file, cols=None, cells=None, prefix=None):
+    """
+    Cell metadata table indexed by cs_id, as pandas.
+
+    cols:    column names to read (None for all, unknown names are skipped)
+    cells:   only the rows at these positions (the dense cell index), in this order
+    prefix:  only cells whose cs_id starts with prefix (a sample id)
+    """
+    lf = pl.scan_parquet(parquet_file)
+    names = lf.collect_schema().names()
+    index = names[0]
+
+    if cols is not None:
+        lf = lf.select([index] + [col for col in cols if col in names and col != index])
+    if prefix is not None:
+        lf = lf.filter(pl.col(index).str.starts_with(prefix))
+
+    df = lf.collect()
+    if cells is not None:
+        ## positional take, no cs_id join
+        df = df[pl.Series(cells, dtype=pl.Int64)]
+    return to_pandas(df, index=index)
@@ -0,0 +1,208 @@
+import os
+import gzip
+import zlib
+import asyncio
+import mimetypes
+from fastapi.responses import FileResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+from backend.settings import settings
+from backend.funcs.executor import io_pool
+
+## optional codecs: zstd and brotli are offered when their packages are installed, gzip always
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+## Response compression for the data routes (registered in backend/main.py).
+## The encoding is negotiated from Accept-Encoding (server preference zstd > br > gzip), responses
+## smaller than settings.compression_min_size, of other media types, or already encoded pass through.
+## Whole bodies above _OFFLOAD_SIZE are compressed on the io pool, so a large UMAP or metadata
+## response does not stall the event loop; streamed bodies (files) are compressed chunk by chunk.
+##
+## Immutable dataset files can also be precompressed once by the preprocessing scripts
+## (utils.save_precompressed, next to the file as <name>.gz / .br / .zst) and are then served by
+## precompressed_response() with Content-Encoding and no per-request compression.
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/vnd.apache.arrow.stream",
+    "application/javascript",
+    "text/",
+)
+
+## file suffix of each encoding's precompressed copy
+SUFFIXES = {"zstd": ".zst", "br": ".br", "gzip": ".gz"}
+
+_OFFLOAD_SIZE = 256 * 1024
+
+
+def available_encodings():
+    ## in server preference order
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def choose_encoding(accept_encoding, encodings=None):
+    ## best encoding the client accepts (q > 0), or None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    for encoding in encodings or available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    level = settings.compression_levels.get(encoding)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level if level is not None else 1, mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=level if level is not None else 4)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level if level is not None else 3).compress(body)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class _StreamCompressor:
+    ## incremental compressor with .compress(chunk) / .flush()
+    def __init__(self, encoding):
+        level = settings.compression_levels.get(encoding)
+        if encoding == "gzip":
+            obj = zlib.compressobj(level if level is not None else 1, zlib.DEFLATED, 31)
+            self.compress, self.flush = obj.compress, obj.flush
+        elif encoding == "br":
+            obj = brotli.Compressor(quality=level if level is not None else 4)
+            self.compress, self.flush = obj.process, obj.finish
+        elif encoding == "zstd":
+            obj = zstandard.ZstdCompressor(level=level if level is not None else 3).compressobj()
+            self.compress, self.flush = obj.compress, obj.flush
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def _is_compressible(headers):
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return any(content_type.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app, encoding, minimum_size):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.started = False  # first body message seen
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not _is_compressible(headers) or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                ## whole body in one message (all JSON/Arrow responses)
+                if len(body) >= _OFFLOAD_SIZE:
+                    loop = asyncio.get_running_loop()
+                    body = await loop.run_in_executor(io_pool, compress, body, self.encoding)
+                else:
+                    body = compress(body, self.encoding)
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+            ## streamed body (FileResponse): length unknown up front
+            del headers["Content-Length"]
+            self.compressor = _StreamCompressor(self.encoding)
+            await self.send(self.start_message)
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.flush()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+def precompressed_response(path, accept_encoding, media_type=None):
+    ## serve the freshest precompressed copy of `path` the client accepts, else the file itself
+    source_mtime = os.path.getmtime(path)
+    copies = [
+        encoding for encoding, suffix in SUFFIXES.items()
+        if os.path.exists(path + suffix) and os.path.getmtime(path + suffix) >= source_mtime
+    ]
+    encoding = choose_encoding(accept_encoding, copies) if copies else None
+    media_type = media_type or mimetypes.guess_type(path)[0] or "text/plain"
+    if encoding is None:
+        return FileResponse(path, media_type=media_type)
+    return FileResponse(
+        path + SUFFIXES[encoding],
+        media_type=media_type,
+        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+    )
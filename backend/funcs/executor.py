@@ -0,0 +1,134 @@
+import asyncio
+import weakref
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from fastapi.responses import Response
+
+from backend.settings import settings
+from backend.funcs.cache import artifact_cache
+from backend.funcs.responses import ORJSONResponse
+
+
+## Execution model of the data routes: the handlers stay `async def`, but the blocking
+## get_data.py loaders never run on the event loop.
+##   run_blocking()  loaders on a bounded thread pool (settings.io_threads)
+##   run_encoded()   whole-dataset loaders (full metadata, UMAP, expression) on a process pool
+##                   (settings.process_workers, 0 for the thread pool); the worker returns the
+##                   JSON-encoded bytes, so parsing and encoding do not hold this process's GIL.
+##                   Workers have their own artifact caches (settings.process_cache_mb each),
+##                   reset_process_pool() drops them
+##   render_json()   encode a large response on the thread pool instead of the event loop
+## Each endpoint also has its own concurrency limit (settings.endpoint_limits, default
+## settings.endpoint_concurrency), so a burst of heavy requests cannot take every worker.
+## The limits are asyncio.Semaphores, which belong to one event loop: they are created per running loop.
+
+io_pool = ThreadPoolExecutor(max_workers=settings.io_threads, thread_name_prefix="io")
+
+_process_pool = None
+_semaphores = weakref.WeakKeyDictionary()
+_active = {}
+_lock = threading.Lock()
+
+
+def _init_worker():
+    ## each worker has its own artifact cache, with its own (smaller) budget
+    artifact_cache.resize(settings.process_cache_mb * 1024 * 1024)
+
+
+def _get_process_pool():
+    ## started on first use; "spawn" because forking a process that already runs threads is unsafe
+    global _process_pool
+    with _lock:
+        if _process_pool is None and settings.process_workers > 0:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.process_workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _process_pool
+
+
+def reset_process_pool():
+    ## drop the worker processes (and their artifact caches) after dataset files changed;
+    ## running requests finish on the old workers, the next one starts a new pool
+    global _process_pool
+    with _lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def _endpoint_semaphore(endpoint):
+    loop = asyncio.get_running_loop()
+    with _lock:
+        semaphores = _semaphores.setdefault(loop, {})
+        semaphore = semaphores.get(endpoint, None)
+        if semaphore is None:
+            limit = settings.endpoint_limits.get(endpoint, settings.endpoint_concurrency)
+            semaphore = asyncio.Semaphore(limit)
+            semaphores[endpoint] = semaphore
+            _active.setdefault(endpoint, 0)
+        return semaphore
+
+
+async def _run(endpoint, pool, func, *args, **kwargs):
+    semaphore = _endpoint_semaphore(endpoint)
+    async with semaphore:
+        _active[endpoint] += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, partial(func, *args, **kwargs))
+        finally:
+            _active[endpoint] -= 1
+
+
+async def run_blocking(endpoint, func, *args, **kwargs):
+    ## await func(*args, **kwargs) on the io pool, at most the endpoint's limit at a time
+    return await _run(endpoint, io_pool, func, *args, **kwargs)
+
+
+def encode_json(result):
+    return ORJSONResponse(result).body
+
+
+def _call_encoded(func, args, kwargs, encode):
+    result = func(*args, **kwargs)
+    if isinstance(result, str):
+        return result
+    return encode(result)
+
+
+async def run_encoded(endpoint, func, *args, encode=encode_json, **kwargs):
+    ## returns the error string of func, or its result encoded by `encode` (a module-level
+    ## function, JSON by default) as bytes for encoded_response()/arrow_response()
+    global _process_pool
+    pool = _get_process_pool()
+    if pool is not None:
+        try:
+            return await _run(endpoint, pool, _call_encoded, func, args, kwargs, encode)
+        except BrokenProcessPool as e:
+            ## a worker died (or could not start); start a new pool on the next request
+            print(f"Error: process pool is broken, running {endpoint} on a thread: {e}")
+            with _lock:
+                if _process_pool is pool:
+                    _process_pool = None
+    return await _run(endpoint, io_pool, _call_encoded, func, args, kwargs, encode)
+
+
+def encoded_response(body):
+    return Response(content=body, media_type="application/json")
+
+
+async def render_json(endpoint, content):
+    ## serialize a large response on the io pool; returning the dict would encode it on the event loop
+    return await run_blocking(endpoint, ORJSONResponse, content)
+
+
+def executor_stats():
+    with _lock:
+        return {
+            "io_threads": settings.io_threads,
+            "process_workers": settings.process_workers if _process_pool is not None else 0,
+            "active": {endpoint: n for endpoint, n in _active.items() if n},
+        }
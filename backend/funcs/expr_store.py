@@ -0,0 +1,95 @@
+import os
+import json
+import numpy as np
+
+from backend.funcs.cache import artifact_cache
+
+
+## Reader for the CSC-style expression store written by utils.save_expr_store():
+##   <dataset>/expr_store/indptr.npy   int64, one offset per gene (+1)
+##   <dataset>/expr_store/indices.npy  int32, cell positions in cells.json
+##   <dataset>/expr_store/data.npy     float32/float16 expression values
+## The three arrays are memory-mapped, so one gene lookup is a slice instead of parsing a whole JSON file.
+
+
+class ExprStore:
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(store_dir, "genes.json"), "r") as f:
+            self.genes = json.load(f)
+        with open(os.path.join(store_dir, "cells.json"), "r") as f:
+            self.cell_ids = np.array(json.load(f), dtype=object)
+
+        self.gene_index = {gene: i for i, gene in enumerate(self.genes)}
+        self.decimals = self.meta.get("decimals", None)
+
+        self.indptr = np.load(os.path.join(store_dir, "indptr.npy"), mmap_mode="r")
+        self.indices = np.load(os.path.join(store_dir, "indices.npy"), mmap_mode="r")
+        self.data = np.load(os.path.join(store_dir, "data.npy"), mmap_mode="r")
+
+    @property
+    def n_cells(self):
+        return len(self.cell_ids)
+
+    def has_gene(self, gene):
+        return gene in self.gene_index
+
+    def get_gene_slice(self, gene):
+        ## returns (cell positions, values) of the non-zero entries of one gene
+        i = self.gene_index.get(gene, None)
+        if i is None:
+            return None
+        start, end = int(self.indptr[i]), int(self.indptr[i + 1])
+        values = np.asarray(self.data[start:end], dtype=np.float64)
+        if self.decimals is not None:
+            values = values.round(self.decimals)
+        return np.asarray(self.indices[start:end]), values
+
+    def get_gene_dense(self, gene, cells):
+        ## values of one gene at the given cell positions, zeros where the gene is not expressed
+        gene_slice = self.get_gene_slice(gene)
+        if gene_slice is None:
+            return None
+        return dense_values(*gene_slice, cells)
+
+    def get_gene_expr(self, gene):
+        ## same shape as the legacy gene_jsons/<gene>.json: {cs_id: value}
+        gene_slice = self.get_gene_slice(gene)
+        if gene_slice is None:
+            return None
+        cells, values = gene_slice
+        return dict(zip(self.cell_ids[cells].tolist(), values.tolist()))
+
+
+def dense_values(nz_cells, values, cells):
+    ## scatter sparse (sorted cell positions, values) onto `cells`: one binary search per requested
+    ## cell, no array over all cells of the dataset
+    cells = np.asarray(cells, dtype=np.int64)
+    dense = np.zeros(len(cells), dtype=np.float64)
+    if len(nz_cells) == 0 or len(cells) == 0:
+        return dense
+    pos = np.minimum(np.searchsorted(nz_cells, cells), len(nz_cells) - 1)
+    hit = nz_cells[pos] == cells
+    dense[hit] = values[pos[hit]]
+    return dense
+
+
+def get_expr_store(dataset):
+    store_dir = os.path.join("backend", "datasets", dataset, "expr_store")
+    meta_file = os.path.join(store_dir, "meta.json")
+    if not os.path.exists(meta_file):
+        return None
+
+    try:
+        ## meta.json is rewritten last by the writer, so it identifies the store version;
+        ## the arrays are memory-mapped, only the gene/cell id lists count against the cache budget
+        id_bytes = sum(os.path.getsize(os.path.join(store_dir, f)) for f in ["genes.json", "cells.json"])
+        return artifact_cache.load(
+            dataset, meta_file, lambda f: ExprStore(store_dir), tag="expr_store", cost=id_bytes
+        )
+    except Exception as e:
+        print(f"Error: Could not open expression store {store_dir}")
+        print(f"{e}")
+        return None
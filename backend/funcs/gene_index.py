@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import threading
+
+from backend.settings import settings
+from backend.funcs.cache import read_json, read_toml
+from backend.funcs.prefix_index import PrefixIndex
+from backend.funcs.utils import DATASET_VERSION_FILE
+
+
+## Global gene index of the "all" dataset path: gene -> datasets containing it, with flags
+##   expression  the gene has single-cell/spot expression (gene_list.json of an sc/Visium dataset)
+##   pseudobulk  gene_pseudobulk/<gene>.json exists
+##   qtl         the gene is in the gene list of a QTL dataset
+## The genes of each dataset are persisted in backend/datasets/gene_index.json together with the
+## mtime of the dataset's dataset_version.json (recorded when processing finishes). Only datasets that
+## were added, changed or deleted are rescanned: dm_routes updates the index on upload/delete, and at
+## most once per settings.gene_index_check_seconds a lookup stats the version files (one stat per
+## dataset, outside the lock) to pick up datasets whose processing finished since.
+
+DATASETS_DIR = os.path.join("backend", "datasets")
+GENE_INDEX_FILE = os.path.join(DATASETS_DIR, "gene_index.json")
+FLAGS = ("expression", "pseudobulk", "qtl")
+
+
+def _json_names(folder):
+    if not os.path.isdir(folder):
+        return []
+    return sorted(file_name[:-5] for file_name in os.listdir(folder) if file_name.endswith(".json"))
+
+
+def _is_qtl_dataset(dataset_path):
+    info_file = os.path.join(dataset_path, "dataset_info.toml")
+    if os.path.exists(info_file):
+        try:
+            datatype = read_toml(info_file).get("datasetfile", {}).get("datatype", "")
+            if datatype:
+                return datatype.lower().endswith("qtl")
+        except Exception as e:
+            print(f"Error: Could not read {info_file}: {e}")
+    return os.path.exists(os.path.join(dataset_path, "snp_list.json"))
+
+
+def _version_stamp(dataset):
+    ## mtime of the dataset's recorded version, None while it has none (e.g. still processing)
+    try:
+        return os.stat(os.path.join(DATASETS_DIR, dataset, DATASET_VERSION_FILE)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def scan_dataset_genes(dataset):
+    ## genes of one dataset per flag
+    dataset_path = os.path.join(DATASETS_DIR, dataset)
+    gene_list_file = os.path.join(dataset_path, "gene_list.json")
+    genes = read_json(gene_list_file) if os.path.exists(gene_list_file) else []
+
+    entry = {"stamp": _version_stamp(dataset), "expression": [], "pseudobulk": [], "qtl": []}
+    if _is_qtl_dataset(dataset_path):
+        entry["qtl"] = genes
+    else:
+        store_genes_file = os.path.join(dataset_path, "expr_store", "genes.json")
+        if not genes and os.path.exists(store_genes_file):
+            genes = read_json(store_genes_file)
+        entry["expression"] = genes
+        entry["pseudobulk"] = _json_names(os.path.join(dataset_path, "gene_pseudobulk"))
+    return entry
+
+
+class GlobalGeneIndex:
+    def __init__(self, index_file):
+        self.index_file = index_file
+        self._datasets = {}  # dataset -> scan_dataset_genes() entry
+        self._removed = set()  # deleted through dm_routes, the folder may still exist
+        ## (gene -> {dataset: {flag: True}}, casefolded gene -> [gene], PrefixIndex), replaced as a whole
+        self._lookup = ({}, {}, PrefixIndex([]))
+        self._checked = 0.0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if os.path.exists(self.index_file):
+            try:
+                data = read_json(self.index_file)
+                self._datasets = data.get("datasets", {})
+                self._removed = set(data.get("removed", []))
+            except Exception as e:
+                print(f"Error: Could not read {self.index_file}, rebuilding it: {e}")
+        self._rebuild()
+
+    def _save(self):
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"datasets": self._datasets, "removed": sorted(self._removed)}, f)
+        os.replace(tmp_file, self.index_file)
+
+    def _rebuild(self):
+        genes = {}
+        for dataset in sorted(self._datasets):
+            entry = self._datasets[dataset]
+            for flag in FLAGS:
+                for gene in entry.get(flag, []):
+                    genes.setdefault(gene, {}).setdefault(dataset, {})[flag] = True
+        folded = {}
+        for gene in genes:
+            folded.setdefault(gene.casefold(), []).append(gene)
+        self._lookup = (genes, folded, PrefixIndex(list(genes)))
+
+    def _dataset_names(self):
+        if not os.path.isdir(DATASETS_DIR):
+            return []
+        return [name for name in os.listdir(DATASETS_DIR) if os.path.isdir(os.path.join(DATASETS_DIR, name))]
+
+    def refresh(self, force=False):
+        ## rescan datasets whose version file changed, add new ones and drop missing ones
+        if not force and self._loaded and time.time() - self._checked < settings.gene_index_check_seconds:
+            return
+        with self._lock:
+            self._load()
+            if not force and time.time() - self._checked < settings.gene_index_check_seconds:
+                return
+            self._checked = time.time()
+            datasets, removed = dict(self._datasets), set(self._removed)
+
+        ## stat and scan without the lock, lookups keep using the current index meanwhile
+        on_disk = [dataset for dataset in self._dataset_names() if dataset not in removed]
+        scanned = {}
+        for dataset in on_disk:
+            entry = datasets.get(dataset)
+            if entry is None or "stamp" not in entry or entry["stamp"] != _version_stamp(dataset):
+                scanned[dataset] = scan_dataset_genes(dataset)
+        missing = set(datasets) - set(on_disk)
+        if not scanned and not missing:
+            return
+
+        with self._lock:
+            for dataset, entry in scanned.items():
+                if dataset not in self._removed:
+                    self._datasets[dataset] = entry
+            for dataset in missing:
+                self._datasets.pop(dataset, None)
+            self._rebuild()
+            self._save()
+
+    def update_dataset(self, dataset):
+        with self._lock:
+            self._load()
+            self._removed.discard(dataset)
+            if os.path.isdir(os.path.join(DATASETS_DIR, dataset)):
+                self._datasets[dataset] = scan_dataset_genes(dataset)
+            else:
+                self._datasets.pop(dataset, None)
+            self._rebuild()
+            self._save()
+
+    def remove_dataset(self, dataset):
+        with self._lock:
+            self._load()
+            self._removed.add(dataset)
+            self._datasets.pop(dataset, None)
+            self._rebuild()
+            self._save()
+
+    def reset(self):
+        ## forget deletions and rescan everything (used by /datasetmanage/refreshdatabase)
+        with self._lock:
+            self._load()
+            self._removed = set()
+            self._datasets = {}
+            self.refresh(force=True)
+
+    def genes(self):
+        self.refresh()
+        return self._lookup[2].names
+
+    def search(self, query_str, mode="prefix", limit=None):
+        self.refresh()
+        return self._lookup[2].search(query_str, mode, limit)
+
+    def datasets_of(self, gene):
+        ## {gene: {dataset: {flag: True}}} for the exact name, else for its case-insensitive matches
+        self.refresh()
+        genes, folded, _ = self._lookup
+        if gene in genes:
+            return {gene: genes[gene]}
+        return {name: genes[name] for name in folded.get(gene.casefold(), [])}
+
+    def search_datasets(self, query_str, mode="prefix", limit=None):
+        ## search() with the datasets of each match: [{"gene", "datasets"}]
+        self.refresh()
+        genes, _, prefix = self._lookup
+        return [{"gene": gene, "datasets": genes[gene]} for gene in prefix.search(query_str, mode, limit)]
+
+    def stats(self):
+        with self._lock:
+            return {"datasets": len(self._datasets), "removed": len(self._removed), "genes": len(self._lookup[0])}
+
+
+gene_index = GlobalGeneIndex(GENE_INDEX_FILE)
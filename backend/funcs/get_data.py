@@ -3,11 +3,24 @@ import pandas as pd
 import polars as pl
 import numpy as np
 import pyBigWig
-import math
 import json
 import toml
 import re
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.settings import settings
+from backend.funcs.cache import load_json, load_toml, load_csv, artifact_cache
+from backend.funcs.expr_store import get_expr_store, dense_values
+from backend.funcs.interval_index import get_interval_index
+from backend.funcs.bigwig_pool import bigwig_pool
+from backend.funcs.signal_tiles import format_signal_values, get_binned_signal, snap_bin_size
+from backend.funcs.gwas_levels import get_gwas_level, pick_level, slice_positions
+from backend.funcs.qtl_index import lookup_snp_positions, get_gene_index
+from backend.funcs.prefix_index import search_list
+from backend.funcs.gene_index import gene_index
+from backend.funcs.cell_metadata import get_cell_metadata_parquet, read_cell_metadata
+from backend.funcs.umap_tiles import get_umap_tiles
+from backend.funcs.cell_index import get_cell_index, get_umap_cells
 
 
 def safe_filename(name):
@@ -40,12 +53,11 @@ def get_gene_location(dataset, gene):
         )
 
     if os.path.exists(genes_file):
-        with open(genes_file, "r") as f:
-            data = json.load(f)
-            gene_x = data.get(gene, None)
-            if not gene_x:
-                # gene info is not groupped and stored directly in the file
-                gene_x = data
+        data = load_json(dataset, genes_file)
+        gene_x = data.get(gene, None)
+        if not gene_x:
+            # gene info is not groupped and stored directly in the file
+            gene_x = data
 
         if gene_x:
             position_start = gene_x["position_start"]
@@ -76,9 +88,8 @@ def get_snp_location(dataset, snp):
         )
 
     if os.path.exists(snps_file):
-        with open(snps_file, "r") as f:
-            data = json.load(f)
-            snp = data.get(snp, None)
+        data = load_json(dataset, snps_file)
+        snp = data.get(snp, None)
         if data and snp:
             position = snp["position"]
 
@@ -105,16 +116,14 @@ def get_gene_locations_in_chromosome(dataset, chromosome, start, end):
         # significant_genes_list = get_qtl_gene_list(dataset)
 
         if os.path.exists(chromosome_file):
-            df = pl.read_parquet(chromosome_file).filter(
-                (pl.col("position_end") >= start)
-                & (pl.col("position_start") <= end)
-                # & pl.col("gene_id").is_in(significant_genes_list)
+            gene_locations = get_interval_index(
+                dataset, chromosome_file, "position_start", "position_end", tag="gene_intervals"
             )
+            df = gene_locations.query(start, end)
 
             if not df.is_empty():
-                df = df.drop_nulls()
-
-                return {col: df.get_column(col).to_list() for col in df.columns}
+                ## polars columns, serialized as arrays by the ORJSONResponse of the route
+                return {col: df.get_column(col) for col in df.columns}
             else:
                 return f"No genes found in the region."
         else:
@@ -129,17 +138,32 @@ def get_snp_locations_in_chromosome(dataset, chromosome, start, end):
         chromosome_file = os.path.join(
             "backend", "datasets", dataset, "snp_locations", chromosome + ".parquet"
         )
-        significant_snps_list = get_qtl_snp_list(dataset)
 
         if os.path.exists(chromosome_file):
-            df = pl.read_parquet(chromosome_file).filter(
-                (pl.col("position") >= start)
-                & (pl.col("position") <= end)
-                & pl.col("snp_id").is_in(significant_snps_list)
+            ## the index keeps significant SNPs only, filtered once when it is built
+            snp_list_file = os.path.join("backend", "datasets", dataset, "snp_list.json")
+            snp_list_version = os.stat(snp_list_file).st_mtime_ns if os.path.exists(snp_list_file) else 0
+
+            def keep_significant(df):
+                if "is_significant" in df.columns:
+                    return df.filter(pl.col("is_significant")).drop("is_significant")
+                ## older datasets without the flag column: check against snp_list.json
+                significant_snps_list = get_qtl_snp_list(dataset)
+                if isinstance(significant_snps_list, str):
+                    return df.clear()
+                return df.filter(pl.col("snp_id").is_in(significant_snps_list))
+
+            snp_locations = get_interval_index(
+                dataset,
+                chromosome_file,
+                "position",
+                "position",
+                row_filter=keep_significant,
+                tag=f"snp_intervals:{snp_list_version}",
             )
+            df = snp_locations.query(start, end)
             if not df.is_empty():
-                df = df.drop_nulls()
-                return {col: df.get_column(col).to_list() for col in df.columns}
+                return {col: df.get_column(col) for col in df.columns}
             else:
                 return f"No SNPs found in the region."
         else:
@@ -147,34 +171,59 @@ def get_snp_locations_in_chromosome(dataset, chromosome, start, end):
             return "Error: Chromosome file not found for the specified dataset."
 
 
-def get_gwas_in_chromosome(dataset, chromosome, start, end):
+def get_gwas_in_chromosome(dataset, chromosome, start, end, max_points=None):
     if dataset == "all":
         return "Error: Dataset is not specified."
     else:
-        chromosome_file = os.path.join(
-            "backend", "datasets", dataset, "gwas", chromosome + ".tsv"
-        )
-        # significant_snps_list = get_qtl_snp_list(dataset)
-
-        if os.path.exists(chromosome_file):
-            df = pl.read_csv(chromosome_file, separator="\t").filter(
-                (pl.col("position") >= start) & (pl.col("position") <= end)
-            )
-            if not df.is_empty():
-                df = df.drop_nulls()
-                return {col: df.get_column(col).to_list() for col in df.columns}
-            else:
-                # return empty
-                return {
-                    "snp_id": [],
-                    "position": [],
-                    "beta_value": [],
-                    "p_value": [],
-                }
+        gwas_folder = os.path.join("backend", "datasets", dataset, "gwas")
+        ## position-sorted parquet written by 07_gwas.py; older datasets have <chromosome>.tsv
+        parquet_file = os.path.join(gwas_folder, chromosome + ".parquet")
+        chromosome_file = os.path.join(gwas_folder, chromosome + ".tsv")
+
+        if os.path.exists(parquet_file):
+            ## the filter is pushed down to the row-group statistics, only row groups overlapping the range are read
+            gwas_lf = pl.scan_parquet(parquet_file)
+        elif os.path.exists(chromosome_file):
+            gwas_lf = pl.read_csv(chromosome_file, separator="\t").lazy()
         else:
             print(chromosome_file + " not found")
             return "Error: Chromosome file not found for the specified dataset."
 
+        in_range = []
+        if start is not None:
+            in_range.append(pl.col("position") >= start)
+        if end is not None:
+            in_range.append(pl.col("position") <= end)
+        window_lf = gwas_lf.filter(in_range) if in_range else gwas_lf
+
+        df = None
+        if max_points:
+            ## zoomed out: serve a precomputed reduction when the window holds more than max_points variants
+            n, min_pos, max_pos = window_lf.select(
+                pl.len(), pl.col("position").min().alias("min"), pl.col("position").max().alias("max")
+            ).collect().row(0)
+            if n > max_points:
+                window_start = start if start is not None else min_pos
+                window_end = end if end is not None else max_pos
+                bin_size = pick_level(window_end - window_start, max_points)
+                track_file = parquet_file if os.path.exists(parquet_file) else chromosome_file
+                level = get_gwas_level(dataset, chromosome, track_file, bin_size)
+                df = slice_positions(level, start, end)
+        if df is None:
+            df = window_lf.collect()
+
+        if not df.is_empty():
+            df = df.drop_nulls()
+            return {col: df.get_column(col) for col in df.columns}
+        else:
+            # return empty
+            return {
+                "snp_id": [],
+                "position": [],
+                "beta_value": [],
+                "p_value": [],
+            }
+
 
 def get_gene_chromosome(dataset, gene):
     if dataset == "all":
@@ -185,12 +234,11 @@ def get_gene_chromosome(dataset, gene):
         )
 
     if os.path.exists(genes_file):
-        with open(genes_file, "r") as f:
-            data = json.load(f)
-            gene_x = data.get(gene, None)
-            if not gene_x:
-                # gene info is not groupped and stored directly in the file
-                gene_x = data
+        data = load_json(dataset, genes_file)
+        gene_x = data.get(gene, None)
+        if not gene_x:
+            # gene info is not groupped and stored directly in the file
+            gene_x = data
         if gene_x:
             return gene_x["chromosome"]
         else:
@@ -209,9 +257,8 @@ def get_snp_chromosome(dataset, snp):
         )
 
     if os.path.exists(snps_file):
-        with open(snps_file, "r") as f:
-            data = json.load(f)
-            snp = data.get(snp, None)
+        data = load_json(dataset, snps_file)
+        snp = data.get(snp, None)
         if data and snp:
             return snp["chromosome"]
         else:
@@ -221,57 +268,75 @@ def get_snp_chromosome(dataset, snp):
         return "Error: SNP list file not found for the specified dataset."
 
 
-def get_gene_list(dataset, query_str="AB"):
+## The *_list functions below return the whole list for query_str "all", else the names matching
+## query_str (mode "prefix", "substring" or "fuzzy", at most `limit`), see backend/funcs/prefix_index.py
+
+def get_gene_list(dataset, query_str="AB", mode="prefix", limit=None):
     if dataset == "all":
-        genes_file = os.path.join("backend", "datasets", "gene_list.json")
-    else:
-        genes_file = os.path.join("backend", "datasets", dataset, "gene_list.json")
+        ## genes of all datasets, from the global gene index
+        if query_str == "all":
+            return gene_index.genes()
+        elif query_str == "default":
+            return gene_index.genes()[:10]
+        return gene_index.search(query_str, mode, limit)
+
+    genes_file = os.path.join("backend", "datasets", dataset, "gene_list.json")
 
     if os.path.exists(genes_file):
-        with open(genes_file, "r") as f:
-            data = json.load(f)
         if query_str == "all":
-            return data
+            return load_json(dataset, genes_file)
         elif query_str == "default":
-            return data[:10]
+            return load_json(dataset, genes_file)[:10]
         else:
-            return [gene for gene in data if gene.lower().startswith(query_str.lower())]
+            return search_list(dataset, genes_file, query_str, mode, limit)
     else:
         print(genes_file + " not found")
         return "Error: Gene list file not found"
 
 
-def get_qtl_gene_list(dataset, query_str="all"):
+def get_gene_datasets(genes):
+    ## datasets containing each gene (case-insensitive if there is no exact match), with
+    ## expression/pseudobulk/qtl flags: {gene: {dataset: {flag: True}}}
+    result = {}
+    for gene in genes:
+        result.update(gene_index.datasets_of(gene))
+    return result
+
+
+def search_global_genes(query_str, mode="prefix", limit=None):
+    ## genes of all datasets matching query_str, with the datasets of each: [{"gene", "datasets"}]
+    if not query_str:
+        return "Error: Query is not specified."
+    return gene_index.search_datasets(query_str, mode, limit)
+
+
+def get_qtl_gene_list(dataset, query_str="all", mode="prefix", limit=None):
     if dataset == "all":
         return "Error: Gene dataset not specified."
     else:
         genes_file = os.path.join("backend", "datasets", dataset, "gene_list.json")
 
     if os.path.exists(genes_file):
-        with open(genes_file, "r") as f:
-            data = json.load(f)
         if query_str == "all":
-            return data
+            return load_json(dataset, genes_file)
         else:
-            return [gene for gene in data if gene.lower().startswith(query_str.lower())]
+            return search_list(dataset, genes_file, query_str, mode, limit)
     else:
         print(genes_file + " not found")
         return "Error: Gene list file not found"
 
 
-def get_qtl_snp_list(dataset, query_str="all"):
+def get_qtl_snp_list(dataset, query_str="all", mode="prefix", limit=None):
     if dataset == "all":
         return "Error: SNP dataset not specified."
     else:
         snps_file = os.path.join("backend", "datasets", dataset, "snp_list.json")
 
     if os.path.exists(snps_file):
-        with open(snps_file, "r") as f:
-            data = json.load(f)
         if query_str == "all":
-            return data
+            return load_json(dataset, snps_file)
         else:
-            return [snp for snp in data if snp.lower().startswith(query_str.lower())]
+            return search_list(dataset, snps_file, query_str, mode, limit)
     else:
         print(snps_file + " not found")
         return "Error: SNP list file not found"
@@ -286,12 +351,11 @@ def get_gene_celltypes(dataset, gene):
         )
 
     if os.path.exists(genes_file):
-        with open(genes_file, "r") as f:
-            data = json.load(f)
-            gene_x = data.get(gene, None)
-            if not gene_x:
-                # gene info is not groupped and stored directly in the file
-                gene_x = data
+        data = load_json(dataset, genes_file)
+        gene_x = data.get(gene, None)
+        if not gene_x:
+            # gene info is not groupped and stored directly in the file
+            gene_x = data
                 
         if gene_x:
             return gene_x["celltypes"]
@@ -311,9 +375,8 @@ def get_snp_celltypes(dataset, snp):
         )
 
     if os.path.exists(snps_file):
-        with open(snps_file, "r") as f:
-            data = json.load(f)
-            snp = data.get(snp, None)
+        data = load_json(dataset, snps_file)
+        snp = data.get(snp, None)
         if data and snp:
             return snp["celltypes"]
         else:
@@ -332,8 +395,7 @@ def get_snp_data_for_gene(dataset, gene, celltype=""):
         )
 
         if os.path.exists(celltype_mapping_file):
-            with open(celltype_mapping_file, "r") as f:
-                celltype_mapping = json.load(f)
+            celltype_mapping = load_json(dataset, celltype_mapping_file)
         else:
             print(celltype_mapping_file + " not found")
             return "Error: Celltype mapping file not found for the specified dataset."
@@ -350,19 +412,25 @@ def get_snp_data_for_gene(dataset, gene, celltype=""):
         if gene_df.is_empty():
             return f"Error: Gene {gene} not found in {celltype or 'file'} cell type."
 
-        def get_position(snp_id: str):
-            snp_location = get_snp_location(dataset, snp_id)
-            if isinstance(snp_location, dict):
-                return snp_location.get("position")
-            return None
-
-        gene_df = gene_df.with_columns(
-            [
-                pl.col("snp_id")
-                .map_elements(get_position, return_dtype=pl.Int64)
-                .alias("position")
-            ]
-        ).drop_nulls()
+        ## fill positions from the sorted SNP index in one vectorized lookup
+        positions = lookup_snp_positions(dataset, gene_df.get_column("snp_id"))
+        if positions is not None:
+            gene_df = gene_df.with_columns(positions).drop_nulls()
+        else:
+            ## no snp_index.parquet / snp_locations in the dataset, look up the per-SNP json files
+            def get_position(snp_id: str):
+                snp_location = get_snp_location(dataset, snp_id)
+                if isinstance(snp_location, dict):
+                    return snp_location.get("position")
+                return None
+
+            gene_df = gene_df.with_columns(
+                [
+                    pl.col("snp_id")
+                    .map_elements(get_position, return_dtype=pl.Int64)
+                    .alias("position")
+                ]
+            ).drop_nulls()
 
         return gene_df.to_dict(as_series=False)
         # return {col: gene_df.get_column(col).to_list() for col in gene_df.columns}
@@ -379,8 +447,7 @@ def get_gene_data_for_snp(dataset, snp, celltype=""):
             "backend", "datasets", dataset,"celltypes", "celltype_parquet.json"
         )
         if os.path.exists(celltype_mapping_file):
-            with open(celltype_mapping_file, "r") as f:
-                celltype_mapping = json.load(f)
+            celltype_mapping = load_json(dataset, celltype_mapping_file)
         else:
             print(celltype_mapping_file + " not found")
             return "Error: Celltype mapping file not found for the specified dataset."
@@ -397,31 +464,42 @@ def get_gene_data_for_snp(dataset, snp, celltype=""):
         if snp_df.is_empty():
             return f"Error: SNP not found in cell type file."
 
-        def get_start(gene_id):
-            loc = get_gene_location(dataset, gene_id)
-            return loc.get("start") if isinstance(loc, dict) else None
-
-        def get_end(gene_id):
-            loc = get_gene_location(dataset, gene_id)
-            return loc.get("end") if isinstance(loc, dict) else None
-
-        def get_strand(gene_id):
-            loc = get_gene_location(dataset, gene_id)
-            return loc.get("strand") if isinstance(loc, dict) else None
-
-        snp_df = snp_df.with_columns(
-            [
-                pl.col("gene_id")
-                .map_elements(get_start, return_dtype=pl.Int64)
-                .alias("position_start"),
-                pl.col("gene_id")
-                .map_elements(get_end, return_dtype=pl.Int64)
-                .alias("position_end"),
-                pl.col("gene_id")
-                .map_elements(get_strand, return_dtype=pl.String)
-                .alias("strand"),
-            ]
-        ).drop_nulls()
+        gene_table = get_gene_index(dataset)
+        if gene_table is not None:
+            ## annotate all target genes with one join against the gene table
+            snp_df = snp_df.join(
+                gene_table.select(["gene_id", "position_start", "position_end", "strand"]),
+                on="gene_id",
+                how="left",
+                maintain_order="left",
+            ).drop_nulls()
+        else:
+            ## no gene_index.parquet / gene_locations in the dataset, look up the per-gene json files
+            def get_start(gene_id):
+                loc = get_gene_location(dataset, gene_id)
+                return loc.get("start") if isinstance(loc, dict) else None
+
+            def get_end(gene_id):
+                loc = get_gene_location(dataset, gene_id)
+                return loc.get("end") if isinstance(loc, dict) else None
+
+            def get_strand(gene_id):
+                loc = get_gene_location(dataset, gene_id)
+                return loc.get("strand") if isinstance(loc, dict) else None
+
+            snp_df = snp_df.with_columns(
+                [
+                    pl.col("gene_id")
+                    .map_elements(get_start, return_dtype=pl.Int64)
+                    .alias("position_start"),
+                    pl.col("gene_id")
+                    .map_elements(get_end, return_dtype=pl.Int64)
+                    .alias("position_end"),
+                    pl.col("gene_id")
+                    .map_elements(get_strand, return_dtype=pl.String)
+                    .alias("strand"),
+                ]
+            ).drop_nulls()
 
         return {col: snp_df.get_column(col).to_list() for col in snp_df.columns}
     else:
@@ -437,59 +515,49 @@ def get_cell2sample_map(dataset):
         "backend", "datasets", dataset, "cell_to_sample.json"
     )
     if os.path.exists(cell2sample_file):
-        with open(cell2sample_file, "r") as f:
-            data = json.load(f)
+        data = load_json(dataset, cell2sample_file)
         return data
     else:
         return f"Error: cell2sample file not found."
 
 
-def get_sample_list(dataset, query_str="all"):
+def get_sample_list(dataset, query_str="all", mode="prefix", limit=None):
     if dataset == "all":
         return "Error: Sample dataset not specified."
     else:
         sample_file = os.path.join("backend", "datasets", dataset, "sample_list.json")
 
     if os.path.exists(sample_file):
-        with open(sample_file, "r") as f:
-            data = json.load(f)
         if query_str == "all" or query_str == "":
-            return data
+            return load_json(dataset, sample_file)
         else:
-            return [
-                sample
-                for sample in data
-                if sample.lower().startswith(query_str.lower())
-            ]
+            return search_list(dataset, sample_file, query_str, mode, limit)
     else:
         print(sample_file + " not found")
         return "Error: Sample list file not found"
 
 
-def get_meta_list(dataset, query_str="all"):
+def get_meta_list(dataset, query_str="all", mode="prefix", limit=None):
     if dataset == "all":
         return "Error: Dataset not specified."
     else:
         meta_file = os.path.join("backend", "datasets", dataset, "meta_list.json")
 
     if os.path.exists(meta_file):
-        with open(meta_file, "r") as f:
-            data = json.load(f)
         if query_str == "all" or query_str == "":
-            return data
+            return load_json(dataset, meta_file)
         elif query_str == "cell_level":
             cellspot_meta_file = os.path.join(
                 "backend", "datasets", dataset, "cellspot_meta_mapping.json"
             )
             if os.path.exists(cellspot_meta_file):
-                with open(cellspot_meta_file, "r") as f:
-                    cellspot_meta = json.load(f)
+                cellspot_meta = load_json(dataset, cellspot_meta_file)
                 return list(cellspot_meta.keys())
             else:
                 print(cellspot_meta_file + " not found")
                 return "Error: cellspot_meta_mapping file not found"
         else:
-            return [meta for meta in data if meta.lower().startswith(query_str.lower())]
+            return search_list(dataset, meta_file, query_str, mode, limit)
     else:
         print(meta_file + " not found")
         return "Error: Meta list file not found"
@@ -502,8 +570,7 @@ def get_config_info(dataset):
         config_file = os.path.join("backend", "datasets", dataset, "dataset_info.toml")
 
     if os.path.exists(config_file):
-        with open(config_file, "r") as f:
-            config = toml.load(f)
+        config = load_toml(dataset, config_file)
         return config
     else:
         print(config_file + " not found")
@@ -519,8 +586,7 @@ def get_cluster_list(dataset):
         )
 
     if os.path.exists(cellconuts_file):
-        with open(cellconuts_file, "r") as f:
-            data = json.load(f)
+        data = load_json(dataset, cellconuts_file)
         return list(data.keys()) if data is not None else data.keys()
     else:
         print(cellconuts_file + " not found")
@@ -536,8 +602,7 @@ def get_celltype_counts(dataset):
         )
 
     if os.path.exists(cellconuts_file):
-        with open(cellconuts_file, "r") as f:
-            data = json.load(f)
+        data = load_json(dataset, cellconuts_file)
         return data
     else:
         print(cellconuts_file + " not found")
@@ -557,7 +622,7 @@ def get_marker_genes(dataset):
         )
 
     if os.path.exists(markergene_file):
-        data_df = pd.read_csv(markergene_file, index_col=None, header=0)
+        data_df = load_csv(dataset, markergene_file)
         data = data_df.to_dict(orient="split")
         return data
     else:
@@ -726,32 +791,66 @@ def get_degs_pseudobulk(dataset, cluster):
         return "Error: DEGs file not found"
 
 
-def get_umapembedding(dataset):
+def get_umapembedding(dataset, layout="rows"):
     if dataset == "all":
         return "Error: Dataset is not specified."
 
+    if layout == "index":
+        ## aligned arrays {"cell", "x", "y"}, cells as positions in the dense cell index
+        umap_cells = get_umap_cells(dataset)
+        return umap_cells if umap_cells is not None else "Error: UMAP file not found"
+
     umap_file = os.path.join("backend", "datasets", dataset, "umap_embeddings_50k.csv")
     if os.path.exists(umap_file):
-        data_df = pd.read_csv(umap_file, index_col=None, header=0)
-        data = data_df.to_dict(orient="split")
-        return data["data"]
+        data = artifact_cache.load(
+            dataset,
+            umap_file,
+            lambda f: pd.read_csv(f, index_col=None, header=0).to_dict(orient="split")["data"],
+            tag="umap_rows",
+        )
+        return data
     else:
         return "Error: UMAP file not found"
 
 
+def get_umap_tile_data(dataset, x0=None, y0=None, x1=None, y1=None, level=None, layout="columns"):
+    ## cells of the viewport at a level of detail (level=None picks it from the viewport size)
+    if dataset == "all":
+        return "Error: Dataset is not specified."
+
+    umap_tiles = get_umap_tiles(dataset)
+    if umap_tiles is None:
+        return "Error: UMAP file not found"
+    if layout == "index" and umap_tiles.cells is None:
+        return "Error: Cell ids not found"
+    return umap_tiles.query(x0, y0, x1, y1, level, layout)
+
+
+def get_cell_ids(dataset):
+    ## lookup table of the dense cell index: cs_id of each position
+    if dataset == "all":
+        return "Error: Dataset is not specified."
+
+    cell_index = get_cell_index(dataset)
+    if cell_index is None:
+        return "Error: Cell ids not found"
+    return cell_index.cell_ids
+
+
 def get_sample_metadata(dataset, samples=["all"], meta="all"):
     if dataset == "all":
         return "Error: Dataset is not specified."
 
     meta_file = os.path.join("backend", "datasets", dataset, "sample_metadata.csv")
     if os.path.exists(meta_file):
-        data_df = pd.read_csv(meta_file, index_col=0, header=0)
+        ## load_csv returns a copy of the cached DataFrame
+        data_df = load_csv(dataset, meta_file, index_col=0)
         if len(samples) > 0 and samples[0] != "all":
             data_df = data_df.loc[samples, :]
         if meta != "all":
             data_df = data_df[meta]
 
-        data_df.fillna("", inplace=True)
+        data_df = data_df.fillna("")
         data = data_df.to_dict(orient="index")
         return data
     else:
@@ -762,30 +861,38 @@ def get_metadata_of_sample(dataset, sample="all", features="all"):
     if dataset == "all":
         return "Error: Dataset is not specified."
 
+    parquet_file = get_cell_metadata_parquet(dataset)
     meta_file = os.path.join("backend", "datasets", dataset, "cellspot_metadata.csv")
-    if os.path.exists(meta_file):
+    if parquet_file is not None:
+        ## columnar store: read only this sample's cells and the requested features
+        data_df = read_cell_metadata(
+            parquet_file,
+            cols=None if features == "all" else features,
+            prefix=None if sample == "all" else sample,
+        )
+    elif os.path.exists(meta_file):
         data_df = pd.read_csv(meta_file, index_col=0, header=0)
         if sample != "all":
             data_df = data_df.loc[data_df.index.str.startswith(sample), :]
         if features != "all":
             data_df = data_df[features]
-        cell_metadata = data_df.to_dict(orient="split")
+    else:
+        return f"Error: Meta file not found."
 
-        # get sample metadata
-        sample_metadata = get_sample_metadata(dataset, samples=[sample])
+    cell_metadata = data_df.to_dict(orient="split")
 
-        ## get cell_metadata_mapping
-        cell_metadata_mapping = get_metadata_mapping(dataset)
+    # get sample metadata
+    sample_metadata = get_sample_metadata(dataset, samples=[sample])
 
-        data = {
-            "cell_metadata": cell_metadata,
-            "cell_metadata_mapping": cell_metadata_mapping,
-            "sample_metadata": sample_metadata,
-        }
-        return data
+    ## get cell_metadata_mapping
+    cell_metadata_mapping = get_metadata_mapping(dataset)
 
-    else:
-        return f"Error: Meta file not found."
+    data = {
+        "cell_metadata": cell_metadata,
+        "cell_metadata_mapping": cell_metadata_mapping,
+        "sample_metadata": sample_metadata,
+    }
+    return data
 
 
 def get_metadata_mapping(dataset):
@@ -796,53 +903,147 @@ def get_metadata_mapping(dataset):
         "backend", "datasets", dataset, "cellspot_meta_mapping.json"
     )
     if os.path.exists(meta_file):
-        with open(meta_file, "r") as f:
-            data = json.load(f)
+        data = load_json(dataset, meta_file)
         return data
     else:
         return f"Error: cell_metadata_mapping file not found."
 
 
-def get_all_metadata(dataset, cols=["all"], rows=["all"]):
+def get_cell_metadata_table(dataset, cols=["all"], rows=["all"]):
+    ## cell table of get_all_metadata (indexed by cs_id), missing values kept as NaN
     if dataset == "all":
         return "Error: Dataset is not specified."
 
+    parquet_file = get_cell_metadata_parquet(dataset)
+    if parquet_file is not None:
+        ## columnar store: project the requested columns, filter to the UMAP cells in the scan
+        if cols and cols[0] != "all" and cols[0] != "":
+            read_cols = cols
+        else:
+            read_cols = None
+        umap_cells = None
+        if rows and rows[0] == "umap":
+            umap_cells = _umap_cell_positions(dataset)
+            if isinstance(umap_cells, str):
+                return umap_cells
+        return read_cell_metadata(parquet_file, cols=read_cols, cells=umap_cells)
+
     meta_file = os.path.join("backend", "datasets", dataset, "cellspot_metadata.csv")
-    if os.path.exists(meta_file):
-        with open(meta_file, "r") as f:
-            data_df = pd.read_csv(meta_file, index_col=0, header=0)
+    if not os.path.exists(meta_file):
+        return "Error: Meta file not found"
+
+    data_df = pd.read_csv(meta_file, index_col=0, header=0)
+
+    if cols and cols[0] != "all" and cols[0] != "":
+        cols = [i for i in cols if i in data_df.columns]
+        data_df = data_df.loc[:, cols]
 
-            if cols and cols[0] != "all" and cols[0] != "":
-                cols = [i for i in cols if i in data_df.columns]
-                data_df = data_df.loc[:, cols]
+    if rows and rows[0] == "umap":
+        umap_cells = _umap_cell_positions(dataset)
+        if isinstance(umap_cells, str):
+            return umap_cells
+        data_df = data_df.iloc[umap_cells, :]
 
-            if rows and rows[0] == "umap":
-                uamp_rows = get_umapembedding(dataset)
-                data_df = data_df.loc[[r[0] for r in uamp_rows], :]
+    return data_df
 
-            data_df = data_df.fillna("")
-            cell_metadata = data_df.to_dict(orient="split")
 
-        ## load cell2sample map file (json)
-        # cell2sample = get_cell2sample_map(dataset)
+def _umap_cell_positions(dataset):
+    ## rows of the UMAP cells in the metadata table (= dense cell index), in UMAP order
+    umap_cells = get_umap_cells(dataset)
+    if umap_cells is None:
+        return "Error: UMAP file not found"
+    if (umap_cells["cell"] < 0).any():
+        return "Error: UMAP cells not found in the cell metadata"
+    return umap_cells["cell"]
 
-        # get sample metadata
-        sample_metadata = get_sample_metadata(dataset)
 
-        ## get cell_metadata_mapping
-        cell_metadata_mapping = get_metadata_mapping(dataset)
+def get_all_metadata(dataset, cols=["all"], rows=["all"], layout="split"):
+    data_df = get_cell_metadata_table(dataset, cols, rows)
+    if isinstance(data_df, str):
+        return data_df
 
-        data = {
-            "cell_metadata": cell_metadata,
-            "cell_metadata_mapping": cell_metadata_mapping,
-            "sample_metadata": sample_metadata,
+    if layout == "index":
+        ## aligned columns without cs_ids: row i is cell["cell"][i] of the dense cell index
+        ## (for rows[]=umap the UMAP order, so it lines up with getumapembedding?layout=index)
+        if rows and rows[0] == "umap":
+            cells = get_umap_cells(dataset)["cell"]
+        else:
+            cells = np.arange(len(data_df), dtype=np.int32)
+        cell_metadata = {
+            "cell": cells,
+            "columns": data_df.columns.tolist(),
+            "data": {col: data_df[col].to_numpy() for col in data_df.columns},
         }
-        return data
     else:
-        return "Error: Meta file not found"
+        data_df = data_df.fillna("")
+        cell_metadata = data_df.to_dict(orient="split")
+
+    ## load cell2sample map file (json)
+    # cell2sample = get_cell2sample_map(dataset)
+
+    # get sample metadata
+    sample_metadata = get_sample_metadata(dataset)
+
+    ## get cell_metadata_mapping
+    cell_metadata_mapping = get_metadata_mapping(dataset)
 
+    data = {
+        "cell_metadata": cell_metadata,
+        "cell_metadata_mapping": cell_metadata_mapping,
+        "sample_metadata": sample_metadata,
+    }
+    return data
+
+
+def _gene_nonzeros(dataset, gene):
+    ## (sorted cell positions in the dense cell index, values) of the cells expressing a gene,
+    ## None without data for the gene, or an error string
+    expr_store = get_expr_store(dataset)
+    if expr_store is not None and expr_store.has_gene(gene):
+        return expr_store.get_gene_slice(gene)
+
+    gene_expr_file = os.path.join("backend", "datasets", dataset, "gene_jsons", gene + ".json")
+    if not os.path.exists(gene_expr_file):
+        return None
+    with open(gene_expr_file, "r") as f:
+        cell_expr = json.load(f)
 
-def get_expr_data(dataset, gene):
+    cell_index = get_cell_index(dataset)
+    if cell_index is None:
+        return "Error: Cell ids not found"
+    nz_cells = cell_index.positions(list(cell_expr.keys()))
+    values = np.fromiter(cell_expr.values(), dtype=np.float64, count=len(cell_expr))
+    known = nz_cells >= 0
+    order = np.argsort(nz_cells[known], kind="stable")
+    return nz_cells[known][order], values[known][order]
+
+
+def get_expr_data(dataset, gene, layout="dict", subset=None, cells=None):
+    ## layout="index": {"cell": positions in the dense cell index, "value": values} of the non-zero cells
+    ## subset="umap" / cells=[positions]: {"value": dense array aligned with the UMAP cells (the order
+    ## of getumapembedding) or with `cells`}, zeros for cells without expression
+    if subset == "umap":
+        umap_cells = get_umap_cells(dataset)
+        if umap_cells is None:
+            return "Error: UMAP file not found"
+        cells = umap_cells["cell"]
+
+    if layout == "index" or cells is not None:
+        gene_slice = _gene_nonzeros(dataset, gene)
+        if gene_slice is None:
+            return "Error: Gene expression file not found"
+        if isinstance(gene_slice, str):
+            return gene_slice
+        if cells is not None:
+            return {"value": dense_values(*gene_slice, cells)}
+        return {"cell": gene_slice[0], "value": gene_slice[1]}
+
+    ## use the memory-mapped expression store if the dataset has one
+    expr_store = get_expr_store(dataset)
+    if expr_store is not None and expr_store.has_gene(gene):
+        return expr_store.get_gene_expr(gene)
+
+    ## fallback: one json file per gene (datasets processed before the expression store)
     gene_expr_file = os.path.join(
         "backend", "datasets", dataset, "gene_jsons", gene + ".json"
     )
@@ -855,6 +1056,36 @@ def get_expr_data(dataset, gene):
     return cell_expr
 
 
+## dataset files that can be downloaded as-is by /api/getdatasetfile (see backend/funcs/compression.py)
+SERVED_DATASET_FILES = [
+    "cellspot_metadata.csv",
+    "cellspot_meta_mapping.json",
+    "sample_metadata.csv",
+    "umap_embeddings_50k.csv",
+    "gene_list.json",
+    "meta_list.json",
+]
+
+
+def get_dataset_file_path(dataset, file_name="", gene=""):
+    ## path of a served dataset file, or of the legacy gene_jsons/<gene>.json when gene is given
+    if not dataset or dataset == "all" or dataset != os.path.basename(dataset):
+        return "Error: Dataset is not specified."
+
+    if gene:
+        file_path = os.path.join("backend", "datasets", dataset, "gene_jsons", gene + ".json")
+        if gene != os.path.basename(gene):
+            return "Error: Invalid gene name."
+    elif file_name in SERVED_DATASET_FILES:
+        file_path = os.path.join("backend", "datasets", dataset, file_name)
+    else:
+        return f"Error: {file_name} can not be downloaded."
+
+    if not os.path.exists(file_path):
+        return "Error: File not found."
+    return file_path
+
+
 def get_pseudoexpr_data(dataset, gene):
     gene_expr_file = os.path.join(
         "backend", "datasets", dataset, "gene_pseudobulk", gene + ".json"
@@ -868,6 +1099,192 @@ def get_pseudoexpr_data(dataset, gene):
     return sample_expr
 
 
+## reads the genes of the batch expression requests
+expr_pool = ThreadPoolExecutor(max_workers=settings.expr_threads, thread_name_prefix="expr")
+
+
+def _sample_of_cells(cell_ids):
+    ## cs_id = <sample_id>_c<n> (cells) or <sample_id>_s<n> (spots)
+    return pd.Series(cell_ids, dtype=object).str.rsplit("_", n=1).str[0]
+
+
+def _load_cell_groups(dataset, column):
+    data_df = get_cell_metadata_table(dataset, cols=[column])
+    if isinstance(data_df, str):
+        return data_df
+    if column in data_df.columns:
+        codes, uniques = pd.factorize(data_df[column].to_numpy(), sort=True)
+        labels = uniques.tolist()
+        ## categorical columns hold codes, labelled by cellspot_meta_mapping.json
+        mapping = get_metadata_mapping(dataset)
+        mapping = mapping.get(column) if not isinstance(mapping, str) else None
+        if mapping:
+            labels = [mapping[str(code)][0] if str(code) in mapping else None for code in labels]
+    else:
+        ## sample-level column (e.g. Condition): through the sample of each cell
+        meta_file = os.path.join("backend", "datasets", dataset, "sample_metadata.csv")
+        sample_df = load_csv(dataset, meta_file, index_col=0) if os.path.exists(meta_file) else None
+        if sample_df is None or column not in sample_df.columns:
+            return f"Error: Metadata column {column} not found"
+        sample_codes, samples = pd.factorize(_sample_of_cells(data_df.index.to_numpy()).to_numpy())
+        codes, labels = pd.factorize(pd.Series(samples).map(sample_df[column]).to_numpy(), sort=True)
+        codes = np.append(codes, -1)[sample_codes]
+        labels = labels.tolist()
+
+    ## values without a label (unmapped codes) belong to no group
+    kept = [i for i, label in enumerate(labels) if label is not None]
+    remap = np.full(len(labels) + 1, -1)
+    remap[kept] = np.arange(len(kept))
+    return remap[codes], [labels[i] for i in kept]
+
+
+def _cell_groups(dataset, group_by):
+    ## group code of every cell in dense cell index order (-1: no group) and the group labels.
+    ## group_by: "cluster" (main cluster column), "condition", or a cell/sample metadata column
+    column = group_by
+    if group_by == "cluster":
+        config = get_config_info(dataset)
+        if isinstance(config, str):
+            return config
+        column = config.get("meta_features", {}).get("main_cluster_column", "")
+    elif group_by == "condition":
+        column = "Condition"
+
+    meta_file = get_cell_metadata_parquet(dataset)
+    if meta_file is None:
+        meta_file = os.path.join("backend", "datasets", dataset, "cellspot_metadata.csv")
+    if not os.path.exists(meta_file):
+        return "Error: Meta file not found"
+    ## cached per column until the metadata file changes
+    return artifact_cache.load(
+        dataset, meta_file, lambda f: _load_cell_groups(dataset, column), tag=f"cell_groups:{column}",
+        cost=lambda groups: 100 if isinstance(groups, str) else groups[0].nbytes,
+    )
+
+
+def _group_summary(gene_slices, codes, n_groups):
+    ## mean (all cells of the group, zeros included) and % of cells expressing, genes x groups
+    sizes = np.bincount(codes[codes >= 0], minlength=n_groups)
+    mean = np.zeros((len(gene_slices), n_groups))
+    pct = np.zeros((len(gene_slices), n_groups))
+    for i, (nz_cells, values) in enumerate(gene_slices):
+        known = nz_cells < len(codes)
+        group, values = codes[nz_cells[known]], values[known]
+        kept = group >= 0
+        mean[i] = np.bincount(group[kept], weights=values[kept], minlength=n_groups)
+        ## stored values can round to 0
+        pct[i] = np.bincount(group[kept], weights=values[kept] > 0, minlength=n_groups)
+    mean /= np.maximum(sizes, 1)
+    pct *= 100 / np.maximum(sizes, 1)
+    return sizes, mean.round(4), pct.round(2)
+
+
+def get_batch_expr_data(dataset, genes, level="cell", subset=None, cells=None, group_by=None):
+    """
+    Expression of several genes in one response; the genes are read in parallel.
+
+    level="cell":  genes x cells, sparse {"indptr", "cell", "value"} (the cells of gene i are
+                   cell[indptr[i]:indptr[i+1]], positions in the dense cell index), or dense
+                   {"value": [[...], ...]} aligned with the UMAP cells (subset="umap") or `cells`
+    level="pseudobulk":  genes x samples {"samples", "value"}, null where a sample has no value
+    group_by:      instead of values, per group of "cluster", "condition" or a metadata column:
+                   {"groups", "n", "mean", "pct"} (mean over the cells/samples of the group, zeros
+                   included; pct = % expressing), e.g. for dot plots
+    Genes without data are returned in "missing".
+    """
+    if dataset == "all":
+        return "Error: Dataset is not specified."
+    if not genes:
+        return "Error: No genes specified."
+    if len(genes) > settings.batch_genes_max:
+        return f"Error: At most {settings.batch_genes_max} genes per request."
+
+    if level == "pseudobulk":
+        return _batch_pseudobulk(dataset, genes, group_by)
+
+    if subset == "umap":
+        umap_cells = get_umap_cells(dataset)
+        if umap_cells is None:
+            return "Error: UMAP file not found"
+        cells = umap_cells["cell"]
+
+    gene_slices = list(expr_pool.map(lambda gene: _gene_nonzeros(dataset, gene), genes))
+    for gene_slice in gene_slices:
+        if isinstance(gene_slice, str):
+            return gene_slice
+    found = [(gene, gene_slice) for gene, gene_slice in zip(genes, gene_slices) if gene_slice is not None]
+    data = {"genes": [gene for gene, _ in found], "missing": [gene for gene, s in zip(genes, gene_slices) if s is None]}
+    gene_slices = [gene_slice for _, gene_slice in found]
+
+    if group_by:
+        groups = _cell_groups(dataset, group_by)
+        if isinstance(groups, str):
+            return groups
+        codes, labels = groups
+        if cells is not None:
+            ## summaries over the requested cells only
+            subset_codes = np.full(len(codes), -1, dtype=codes.dtype)
+            cells = np.asarray(cells)
+            cells = cells[(cells >= 0) & (cells < len(codes))]
+            subset_codes[cells] = codes[cells]
+            codes = subset_codes
+        sizes, mean, pct = _group_summary(gene_slices, codes, len(labels))
+        data.update({"groups": labels, "n": sizes, "mean": mean, "pct": pct})
+        return data
+
+    if cells is not None:
+        value = np.zeros((len(gene_slices), len(cells)))
+        for i, gene_slice in enumerate(gene_slices):
+            value[i] = dense_values(*gene_slice, cells)
+        data["value"] = value
+        return data
+
+    data["indptr"] = np.concatenate([[0], np.cumsum([len(nz_cells) for nz_cells, _ in gene_slices])]).astype(np.int64)
+    data["cell"] = np.concatenate([nz_cells for nz_cells, _ in gene_slices] or [np.zeros(0, dtype=np.int32)])
+    data["value"] = np.concatenate([values for _, values in gene_slices] or [np.zeros(0)])
+    return data
+
+
+def _batch_pseudobulk(dataset, genes, group_by=None):
+    sample_exprs = list(expr_pool.map(lambda gene: get_pseudoexpr_data(dataset, gene), genes))
+    found = [(gene, expr) for gene, expr in zip(genes, sample_exprs) if not isinstance(expr, str)]
+    data = {"genes": [gene for gene, _ in found], "missing": [gene for gene, e in zip(genes, sample_exprs) if isinstance(e, str)]}
+
+    samples = sorted({sample for _, expr in found for sample in expr})
+    sample_pos = {sample: i for i, sample in enumerate(samples)}
+    value = np.full((len(found), len(samples)), np.nan)
+    for i, (_, expr) in enumerate(found):
+        value[i, [sample_pos[sample] for sample in expr]] = list(expr.values())
+
+    if not group_by:
+        data.update({"samples": samples, "value": value})
+        return data
+
+    ## per group of a sample metadata column ("condition": Condition)
+    column = "Condition" if group_by == "condition" else group_by
+    meta_file = os.path.join("backend", "datasets", dataset, "sample_metadata.csv")
+    sample_df = load_csv(dataset, meta_file, index_col=0) if os.path.exists(meta_file) else None
+    if sample_df is None or column not in sample_df.columns:
+        return f"Error: Sample metadata column {column} not found"
+    codes, labels = pd.factorize(pd.Series(samples).map(sample_df[column]).to_numpy(), sort=True)
+    n_groups = len(labels)
+    sizes = np.bincount(codes[codes >= 0], minlength=n_groups)
+    present = ~np.isnan(value) & (codes >= 0)
+    sums = np.zeros((len(found), n_groups))
+    expressing = np.zeros((len(found), n_groups))
+    for g in range(n_groups):
+        in_group = present & (codes == g)
+        sums[:, g] = np.where(in_group, value, 0).sum(axis=1)
+        expressing[:, g] = (in_group & (value > 0)).sum(axis=1)
+    data.update({
+        "groups": labels.tolist(),
+        "n": sizes,
+        "mean": (sums / np.maximum(sizes, 1)).round(4),
+        "pct": (expressing * 100 / np.maximum(sizes, 1)).round(2),
+    })
+    return data
+
+
 def get_visium_coordinates(dataset, sample):
     if dataset == "all":
         return "Error: Dataset is not specified."
@@ -920,8 +1337,11 @@ def get_bw_data_exists(dataset):
         return False
     return True
 
-@lru_cache(maxsize=128)  # bump cache size since you’ll open more small files
-def get_cached_bigwig_handle(dataset, celltype):
+## shared by the multi-track signal requests
+signal_pool = ThreadPoolExecutor(max_workers=settings.signal_threads, thread_name_prefix="bigwig")
+
+
+def get_bigwig_path(dataset, celltype):
     celltype_mapping_file = os.path.join(
         "backend", "datasets", dataset,"bigwig","celltype_bigwig.json"
     )
@@ -929,12 +1349,10 @@ def get_cached_bigwig_handle(dataset, celltype):
         print(celltype_mapping_file + " not found")
         return None
 
-    with open(celltype_mapping_file, "r") as f:
-        celltype_mapping = json.load(f)
-
+    celltype_mapping = load_json(dataset, celltype_mapping_file)
     celltype_file = celltype_mapping.get(celltype, celltype)
 
-    bw_path = os.path.join(
+    return os.path.join(
         "backend",
         "datasets",
         dataset,
@@ -942,25 +1360,10 @@ def get_cached_bigwig_handle(dataset, celltype):
         celltype_file,
     )
 
-    try:
-        return pyBigWig.open(bw_path)
-    except Exception as e:
-        print(f"Error: Could not open {bw_path}")
-        print(f"{e}")
-        return None
-
-
-def format_signal_value(value, sig_figs=5):
-    if value == 0:
-        return 0.0
-
-    magnitude = math.floor(math.log10(abs(value))) if value != 0 else 0
-    decimal_places = max(0, sig_figs - magnitude - 1)
 
-    return round(value, decimal_places)
-
-
-def get_region_signal_data(dataset, chromosome, start, end, celltype="", bin_size=1):
+def get_region_signal_data(dataset, chromosome, start, end, celltype="", bin_size=1, rle=False):
+    ## rle=True returns runs {"start", "end", "value"} (half-open, bigwig coordinates)
+    ## instead of one {"position", "value"} entry per base/bin
     if dataset == "all":
         return "Error: Dataset is not specified."
 
@@ -969,54 +1372,80 @@ def get_region_signal_data(dataset, chromosome, start, end, celltype="", bin_siz
         return f"Error: BigWig folder not found"
 
     try:
-        bw = get_cached_bigwig_handle(dataset, celltype)
-        if bw is None:
+        bw_path = get_bigwig_path(dataset, celltype)
+        if bw_path is None:
             return f"Error: BigWig file not found for the celltype"
 
-        chrom_len = bw.chroms().get(chromosome)
-        if chrom_len is None:
-            return f"Error: Chromosome not found in the dataset/celltype"
-
-        start = max(0, start)
-        end = min(end, chrom_len)
-        if start >= end:
-            return f"Error: Invalid range input"
-
-        # Binning
-        if bin_size > 1:
-            num_bins = (end - start) // bin_size
-            if (end - start) % bin_size != 0:
-                num_bins += 1
-
-            values = bw.stats(chromosome, start, end, nBins=num_bins, type="mean")
-            positions = [start + i * bin_size for i in range(num_bins)]
-            values = [v if v is not None else 0 for v in values]
-
-            formatted_values = [
-                format_signal_value(v) if v is not None else 0.0 for v in values
-            ]
-            return {"position": positions, "value": formatted_values}
-
-        # No binning
-        intervals = bw.intervals(chromosome, start, end)
-        if not intervals:
-            # return f"No coverage in {chromosome}:{start}-{end} for celltype {celltype}"
-            # just return empty
-            return {"position": [], "value": []}
-
-        positions, values = [], []
-        for interval_start, interval_end, value in intervals:
-            for pos in range(max(start, interval_start), min(end, interval_end) + 1):
-                positions.append(pos)
-                values.append(format_signal_value(value))
-
-        return {"position": positions, "value": values}
+        ## the handle is used by this thread only until the block exits
+        with bigwig_pool.handle(bw_path) as bw:
+            if bw is None:
+                return f"Error: BigWig file not found for the celltype"
+
+            chrom_len = bw.chroms().get(chromosome)
+            if chrom_len is None:
+                return f"Error: Chromosome not found in the dataset/celltype"
+
+            start = max(0, start)
+            end = min(end, chrom_len)
+            if start >= end:
+                return f"Error: Invalid range input"
+
+            # Binning
+            if bin_size > 1:
+                ## bin size is snapped to a power of two, bins are read from cached tiles
+                positions, values = get_binned_signal(
+                    bw, bw_path, chromosome, chrom_len, start, end, bin_size
+                )
+                if rle:
+                    bin_ends = np.minimum(positions + snap_bin_size(bin_size), chrom_len)
+                    return {"start": positions, "end": bin_ends, "value": values}
+                return {"position": positions, "value": values}
+
+            # No binning
+            intervals = bw.intervals(chromosome, start, end)
+            if not intervals:
+                # return f"No coverage in {chromosome}:{start}-{end} for celltype {celltype}"
+                # just return empty
+                return {"start": [], "end": [], "value": []} if rle else {"position": [], "value": []}
+
+            intervals = np.array(intervals, dtype=np.float64)
+            run_starts = np.maximum(start, intervals[:, 0].astype(np.int64))
+            run_ends = np.minimum(end, intervals[:, 1].astype(np.int64))
+            run_values = format_signal_values(intervals[:, 2])
+            if rle:
+                return {"start": run_starts, "end": run_ends, "value": run_values}
+
+            ## expand each run to one entry per base, run end included
+            counts = np.maximum(run_ends + 1 - run_starts, 0)
+            offsets = np.cumsum(counts) - counts
+            positions = np.arange(counts.sum(), dtype=np.int64) + np.repeat(run_starts - offsets, counts)
+            values = np.repeat(run_values, counts)
+
+            ## numpy arrays, serialized directly by the ORJSONResponse of the route
+            return {"position": positions, "value": values}
 
     except Exception as e:
         print(f"Error processing BigWig data: {e}")
         return f"Error processing data: {str(e)}"
 
 
+def get_multi_region_signal_data(dataset, chromosome, start, end, celltypes, bin_size=1, rle=False):
+    ## one region for several cell types; each track is read on the signal thread pool
+    ## returns {celltype: track}, tracks that failed hold their "Error: ..." message
+    if dataset == "all":
+        return "Error: Dataset is not specified."
+
+    if not get_bw_data_exists(dataset):
+        return f"Error: BigWig folder not found"
+
+    celltypes = list(dict.fromkeys(celltypes))
+    tracks = signal_pool.map(
+        lambda celltype: get_region_signal_data(dataset, chromosome, start, end, celltype, bin_size, rle),
+        celltypes,
+    )
+    return dict(zip(celltypes, tracks))
+
+
 def get_celltype_list(dataset):
     if dataset == "all":
         return "Error: Dataset is not specified."
@@ -1028,8 +1457,7 @@ def get_celltype_list(dataset):
         print(celltype_mapping_file + " not found")
         return f"Error: Celltype mapping file not found for the dataset"
 
-    with open(celltype_mapping_file, "r") as f:
-        celltype_mapping = json.load(f)
+    celltype_mapping = load_json(dataset, celltype_mapping_file)
 
     return list(celltype_mapping.keys())
 
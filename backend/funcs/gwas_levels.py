@@ -0,0 +1,69 @@
+import os
+import polars as pl
+
+from backend.funcs.cache import artifact_cache
+
+
+## Multi-resolution GWAS tracks for zoomed-out views.
+## A level with bin size B keeps every variant with p_value < GWAS_KEEP_P_VALUE, plus the variant
+## with the smallest p_value in each B-bp bin of the remaining ones, so peaks survive the reduction.
+##   <dataset>/gwas/levels/<chromosome>.<bin_size>.parquet  (written by 07_gwas.py)
+## Levels missing on disk are built from the full chromosome track on first use and cached.
+
+GWAS_LEVEL_BIN_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+GWAS_KEEP_P_VALUE = 1e-5
+
+
+def reduce_gwas_level(df, bin_size, keep_p_value=GWAS_KEEP_P_VALUE):
+    df = df.drop_nulls()
+    significant = df.filter(pl.col("p_value") < keep_p_value)
+    binned = (
+        df.filter(pl.col("p_value") >= keep_p_value)
+        .with_columns((pl.col("position") // bin_size).alias("_bin"))
+        .sort("p_value")
+        .unique(subset="_bin", keep="first")
+        .drop("_bin")
+    )
+    return pl.concat([significant, binned]).sort("position")
+
+
+def pick_level(width, max_points):
+    ## finest level whose bins over the window fit in max_points, else the coarsest one
+    for bin_size in GWAS_LEVEL_BIN_SIZES:
+        if width // bin_size + 1 <= max_points:
+            return bin_size
+    return GWAS_LEVEL_BIN_SIZES[-1]
+
+
+def _read_track(path):
+    if path.endswith(".parquet"):
+        return pl.read_parquet(path)
+    return pl.read_csv(path, separator="\t")
+
+
+def get_gwas_level(dataset, chromosome, track_file, bin_size):
+    ## position-sorted reduced track of one chromosome at one bin size
+    level_file = os.path.join(
+        "backend", "datasets", dataset, "gwas", "levels", f"{chromosome}.{bin_size}.parquet"
+    )
+    if os.path.exists(level_file):
+        return artifact_cache.load(
+            dataset, level_file, lambda f: pl.read_parquet(f).sort("position"), tag="gwas_level"
+        )
+
+    ## keyed on the full track, so a rewritten track rebuilds its levels
+    return artifact_cache.load(
+        dataset,
+        track_file,
+        lambda f: reduce_gwas_level(_read_track(f), bin_size),
+        tag=f"gwas_level:{bin_size}",
+        cost=lambda df: df.estimated_size(),
+    )
+
+
+def slice_positions(df, start=None, end=None):
+    ## rows of a position-sorted frame with start <= position <= end
+    positions = df.get_column("position")
+    lo = 0 if start is None else positions.search_sorted(start, side="left")
+    hi = df.height if end is None else positions.search_sorted(end, side="right")
+    return df.slice(lo, max(hi - lo, 0))
@@ -0,0 +1,107 @@
+import os
+import hashlib
+import functools
+from fastapi.responses import Response
+
+from backend.settings import settings
+from backend.funcs.cache import load_json
+from backend.funcs.responses import ORJSONResponse
+from backend.funcs.utils import DATASET_VERSION_FILE, save_dataset_version
+
+
+## HTTP caching of responses that only depend on a dataset's files.
+## Every processed dataset has a content version (dataset_version.json, written by
+## utils.save_dataset_version() as the last step of x0_run_from_toml.py and of the marker import, and
+## re-recorded by /datasetmanage/refreshdatabase). Requests only read it; it is never rebuilt on the fly.
+## Routes decorated with @dataset_etag() answer with
+##   ETag           W/"<version>-<hash of path, query and Accept>"
+##   Cache-Control  public, max-age=settings.dataset_cache_max_age
+##                  (immutable for a year when the request carries ?v=<current version>)
+## and with 304 Not Modified when If-None-Match matches, without running the handler.
+## Datasets without a version file fall back to the mtimes/sizes of their top-level entries.
+
+
+def _fallback_version(dataset_path):
+    entries = []
+    with os.scandir(dataset_path) as it:
+        for entry in it:
+            st = entry.stat()
+            entries.append(f"{entry.name}\t{st.st_mtime_ns}\t{st.st_size}")
+    return "f" + hashlib.sha1("\n".join(sorted(entries)).encode()).hexdigest()[:15]
+
+
+def get_dataset_version(dataset):
+    ## None for unknown datasets
+    if not dataset or dataset != os.path.basename(dataset):
+        return None
+    dataset_path = os.path.join("backend", "datasets", dataset)
+    version_file = os.path.join(dataset_path, DATASET_VERSION_FILE)
+    try:
+        return load_json(dataset, version_file)["version"]
+    except (FileNotFoundError, KeyError, ValueError):
+        pass
+    try:
+        return _fallback_version(dataset_path)
+    except OSError:
+        return None
+
+
+def update_dataset_version(dataset):
+    ## re-record the version after the dataset's files were changed by the server itself
+    return save_dataset_version(os.path.join("backend", "datasets", dataset))["version"]
+
+
+def remove_dataset_version(dataset):
+    ## while a dataset is re-processed, its ETags follow the fallback version
+    version_file = os.path.join("backend", "datasets", dataset, DATASET_VERSION_FILE)
+    if os.path.exists(version_file):
+        os.remove(version_file)
+
+
+def _etag(request, version):
+    key = f"{request.url.path}?{request.url.query}\n{request.headers.get('accept', '')}"
+    return f'W/"{version}-{hashlib.sha1(key.encode()).hexdigest()[:12]}"'
+
+
+def _matches(if_none_match, etag):
+    ## weak comparison: W/"x" matches "x"
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in tags]
+
+
+def _cache_headers(request, version, etag):
+    if request.query_params.get("v", "") == version:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = f"public, max-age={settings.dataset_cache_max_age}"
+    return {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept"}
+
+
+def dataset_etag(param="dataset"):
+    ## decorator for GET handlers taking `request`, whose response depends only on the dataset
+    ## named by the query parameter `param` (and the rest of the query string)
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            request = kwargs["request"]
+            version = get_dataset_version(request.query_params.get(param))
+            if version is None:
+                return await handler(*args, **kwargs)
+
+            etag = _etag(request, version)
+            headers = _cache_headers(request, version, etag)
+            if _matches(request.headers.get("if-none-match", ""), etag):
+                return Response(status_code=304, headers=headers)
+
+            response = await handler(*args, **kwargs)
+            if not isinstance(response, Response):
+                response = ORJSONResponse(response)
+            if response.status_code == 200:
+                response.headers["ETag"] = etag
+                response.headers["Cache-Control"] = headers["Cache-Control"]
+                response.headers.add_vary_header("Accept")
+            return response
+
+        return wrapper
+
+    return decorator
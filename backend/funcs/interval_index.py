@@ -0,0 +1,54 @@
+import numpy as np
+import polars as pl
+
+from backend.funcs.cache import artifact_cache
+
+
+class IntervalIndex:
+    """
+    Rows of a per-chromosome table sorted by start, with a running maximum of end.
+
+    An overlap query [start, end] is two binary searches: rows past the first one whose
+    running max end reaches `start`, up to the last one starting at or before `end`.
+    Only that window is checked row by row, so latency does not grow with chromosome size.
+    """
+
+    def __init__(self, df, start_col, end_col):
+        self.df = df.drop_nulls().sort(start_col)
+        self.starts = self.df.get_column(start_col).to_numpy()
+        self.ends = self.df.get_column(end_col).to_numpy()
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def __len__(self):
+        return self.df.height
+
+    def query(self, start=None, end=None):
+        lo = 0 if start is None else int(np.searchsorted(self.max_ends, start, side="left"))
+        hi = len(self.starts) if end is None else int(np.searchsorted(self.starts, end, side="right"))
+        if lo >= hi:
+            return self.df.clear()
+
+        window = self.df.slice(lo, hi - lo)
+        if start is None:
+            return window
+        overlaps = self.ends[lo:hi] >= start
+        if overlaps.all():
+            return window
+        return window.filter(pl.Series(overlaps))
+
+    def estimated_size(self):
+        return self.df.estimated_size() + self.starts.nbytes + self.ends.nbytes + self.max_ends.nbytes
+
+
+def get_interval_index(dataset, chromosome_file, start_col, end_col, row_filter=None, tag="intervals"):
+    ## built lazily on first query of a chromosome, rebuilt when the parquet file changes;
+    ## row_filter(df) is applied once at build time
+    def build(path):
+        df = pl.read_parquet(path)
+        if row_filter is not None:
+            df = row_filter(df)
+        return IntervalIndex(df, start_col, end_col)
+
+    return artifact_cache.load(
+        dataset, chromosome_file, build, tag=tag, cost=lambda index: index.estimated_size()
+    )
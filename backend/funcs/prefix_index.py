@@ -0,0 +1,113 @@
+import sys
+import difflib
+from bisect import bisect_left, bisect_right
+
+from backend.funcs.cache import artifact_cache, read_json
+
+
+## Autocompletion index of the gene, SNP, sample and meta lists (list of names in a JSON file).
+## Names are case-folded and sorted once per file (cached in the artifact cache and rebuilt when
+## the file changes), so a prefix lookup is two bisects instead of a scan of the whole list.
+##   prefix     names starting with the query, in case-folded order
+##   substring  names containing the query, in case-folded order (one C-level scan of the keys)
+##   fuzzy      closest names by difflib ratio among those sharing a prefix with the query,
+##              for typos such as "GABRB" -> "GABBR1"
+
+MODES = ("prefix", "substring", "fuzzy")
+
+_MAX_CHAR = chr(sys.maxunicode)
+_FUZZY_CANDIDATES = 1000
+
+
+class PrefixIndex:
+    def __init__(self, names):
+        names = [str(name) for name in names]
+        keys = [name.casefold() for name in names]
+        if keys == names:
+            ## rsIDs are already case-folded, share the strings
+            names.sort()
+            keys = names
+        else:
+            pairs = sorted(zip(keys, names))
+            keys = [key for key, _ in pairs]
+            names = [name for _, name in pairs]
+        self.names = names
+        self.keys = keys
+        self._joined = None
+        self._offsets = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prefix_range(self, query):
+        lo = bisect_left(self.keys, query)
+        hi = bisect_right(self.keys, query + _MAX_CHAR, lo)
+        return lo, hi
+
+    def prefix(self, query, limit=None):
+        lo, hi = self._prefix_range(query.casefold())
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self.names[lo:hi]
+
+    def substring(self, query, limit=None):
+        query = query.casefold()
+        if "\n" in query:
+            return []
+        if self._joined is None:
+            ## built on first use: all keys in one string and the offset of each key
+            self._joined = "\n".join(self.keys) + "\n"
+            offsets, position = [], 0
+            for key in self.keys:
+                offsets.append(position)
+                position += len(key) + 1
+            self._offsets = offsets
+
+        result, position = [], 0
+        while limit is None or len(result) < limit:
+            position = self._joined.find(query, position)
+            if position < 0:
+                break
+            i = bisect_right(self._offsets, position) - 1
+            result.append(self.names[i])
+            ## continue after this key, each name is returned once
+            position = self._offsets[i] + len(self.keys[i]) + 1
+        return result
+
+    def fuzzy(self, query, limit=None, cutoff=0.6):
+        query = query.casefold()
+        if not query:
+            return []
+        ## candidates: names sharing the longest prefix with the query that still has at most
+        ## _FUZZY_CANDIDATES names (typos after the first characters are found)
+        lo, hi = self._prefix_range(query[:1])
+        for n in range(2, len(query) + 1):
+            if hi - lo <= _FUZZY_CANDIDATES:
+                break
+            next_lo, next_hi = self._prefix_range(query[:n])
+            if next_lo == next_hi:
+                break
+            lo, hi = next_lo, next_hi
+        hi = min(hi, lo + _FUZZY_CANDIDATES)
+        matches = difflib.get_close_matches(query, self.keys[lo:hi], n=limit or 10, cutoff=cutoff)
+        ## keys back to names; duplicates of a key are rare, take the first
+        return [self.names[bisect_left(self.keys, key, lo, hi)] for key in matches]
+
+    def search(self, query, mode="prefix", limit=None):
+        if mode == "substring":
+            return self.substring(query, limit)
+        if mode == "fuzzy":
+            return self.fuzzy(query, limit)
+        return self.prefix(query, limit)
+
+
+def get_prefix_index(dataset, list_file):
+    ## cost: names, keys and list slots, about 3x the JSON file
+    return artifact_cache.load(
+        dataset, list_file, lambda path: PrefixIndex(read_json(path)), tag="prefix_index",
+        cost=lambda index: 3 * sum(len(name) + 50 for name in index.names),
+    )
+
+
+def search_list(dataset, list_file, query_str, mode="prefix", limit=None):
+    return get_prefix_index(dataset, list_file).search(query_str, mode, limit)
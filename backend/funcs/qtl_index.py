@@ -0,0 +1,115 @@
+import os
+from glob import glob
+import polars as pl
+
+from backend.funcs.cache import artifact_cache
+
+
+## Per-dataset annotation indexes for the QTL views, loaded once and kept in the artifact cache.
+##   snp_index.parquet   snp_id, chromosome, position (written by 04_annotate.py)
+##   gene_index.parquet  gene_id, chromosome, position_start, position_end, strand (04_annotate.py/06_filter_clean.py)
+## Older datasets without the index files fall back to building them from snp_locations/ and gene_locations/.
+
+
+def _frame_size(df):
+    return df.estimated_size() if df is not None else 0
+
+
+def _read_snp_index(index_file):
+    df = pl.read_parquet(index_file, columns=["snp_id", "position"])
+    return df.drop_nulls().unique(subset="snp_id", keep="first").sort("snp_id")
+
+
+def _build_snp_index(snp_locations_folder):
+    chrom_files = sorted(glob(os.path.join(snp_locations_folder, "*.parquet")))
+    if not chrom_files:
+        return None
+    df = pl.concat([pl.read_parquet(f, columns=["snp_id", "position"]) for f in chrom_files])
+    return df.drop_nulls().unique(subset="snp_id", keep="first").sort("snp_id")
+
+
+def get_snp_index(dataset):
+    ## sorted snp_id -> position table
+    dataset_path = os.path.join("backend", "datasets", dataset)
+    index_file = os.path.join(dataset_path, "snp_index.parquet")
+    if os.path.exists(index_file):
+        return artifact_cache.load(
+            dataset, index_file, _read_snp_index, tag="snp_index", cost=_frame_size
+        )
+
+    snp_locations_folder = os.path.join(dataset_path, "snp_locations")
+    if os.path.exists(snp_locations_folder):
+        ## directory mtime changes when chromosome files are added/removed
+        return artifact_cache.load(
+            dataset, snp_locations_folder, _build_snp_index, tag="snp_index", cost=_frame_size
+        )
+    return None
+
+
+def lookup_snp_positions(dataset, snp_ids: pl.Series):
+    ## binary search of snp_ids in the sorted index; unknown SNPs get null positions
+    snp_index = get_snp_index(dataset)
+    if snp_index is None:
+        return None
+
+    index_ids = snp_index.get_column("snp_id")
+    if index_ids.is_empty():
+        return pl.repeat(None, len(snp_ids), dtype=pl.Int64, eager=True).alias("position")
+
+    idx = index_ids.search_sorted(snp_ids, side="left").clip(0, len(index_ids) - 1)
+    matched = index_ids.gather(idx) == snp_ids
+    positions = snp_index.get_column("position").cast(pl.Int64).gather(idx)
+    missing = pl.repeat(None, len(snp_ids), dtype=pl.Int64, eager=True)
+    return positions.zip_with(matched, missing).alias("position")
+
+
+def _read_gene_index(index_file):
+    df = pl.read_parquet(index_file)
+    return _clean_gene_index(df)
+
+
+def _build_gene_index(gene_locations_folder):
+    chrom_files = sorted(glob(os.path.join(gene_locations_folder, "*.parquet")))
+    if not chrom_files:
+        return None
+    df = pl.concat(
+        [
+            pl.read_parquet(f, columns=["gene_id", "position_start", "position_end", "strand"]).with_columns(
+                pl.lit(os.path.splitext(os.path.basename(f))[0]).alias("chromosome")
+            )
+            for f in chrom_files
+        ],
+        how="vertical_relaxed",
+    )
+    return _clean_gene_index(df)
+
+
+def _clean_gene_index(df):
+    return (
+        df.select(
+            pl.col("gene_id").cast(pl.String),
+            pl.col("chromosome").cast(pl.String),
+            pl.col("position_start").cast(pl.Int64),
+            pl.col("position_end").cast(pl.Int64),
+            pl.col("strand").cast(pl.String),
+        )
+        .drop_nulls(subset=["gene_id", "position_start", "position_end"])
+        .unique(subset="gene_id", keep="first", maintain_order=True)
+    )
+
+
+def get_gene_index(dataset):
+    ## gene_id -> chromosome/start/end/strand table
+    dataset_path = os.path.join("backend", "datasets", dataset)
+    index_file = os.path.join(dataset_path, "gene_index.parquet")
+    if os.path.exists(index_file):
+        return artifact_cache.load(
+            dataset, index_file, _read_gene_index, tag="gene_index", cost=_frame_size
+        )
+
+    gene_locations_folder = os.path.join(dataset_path, "gene_locations")
+    if os.path.exists(gene_locations_folder):
+        return artifact_cache.load(
+            dataset, gene_locations_folder, _build_gene_index, tag="gene_index", cost=_frame_size
+        )
+    return None
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import polars as pl
+import orjson
+from types import MappingProxyType
+from fastapi.responses import JSONResponse
+
+
+## Application-wide JSON response class (FastAPI default_response_class, see backend/main.py).
+## orjson writes numpy arrays directly (OPT_SERIALIZE_NUMPY), so loaders can return column arrays
+## without building Python lists first. Frames are written as:
+##   polars DataFrame  {column: [values]}                 (same as to_dict(as_series=False))
+##   pandas DataFrame  {"index", "columns", "data"}       (same as to_dict(orient="split"))
+## NaN/inf are written as null.
+
+
+def _series(series):
+    if series.dtype.is_numeric() and series.null_count() == 0:
+        return series.to_numpy()
+    return series.to_list()
+
+
+def _default(obj):
+    ## called by orjson for anything it does not serialize natively
+    if isinstance(obj, pl.DataFrame):
+        return {name: _series(obj.get_column(name)) for name in obj.columns}
+    if isinstance(obj, pl.Series):
+        return _series(obj)
+    if isinstance(obj, pd.DataFrame):
+        return {"index": obj.index.tolist(), "columns": obj.columns.tolist(), "data": obj.to_numpy()}
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.tolist()
+    if isinstance(obj, np.ndarray):
+        ## object/string dtypes or non-contiguous arrays
+        if obj.dtype.kind in "biuf" and not obj.flags.c_contiguous:
+            return np.ascontiguousarray(obj)
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, MappingProxyType):
+        ## read-only dicts of the artifact cache (backend/funcs/cache.py)
+        return dict(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content):
+    return orjson.dumps(
+        content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content):
+        return dumps(content)
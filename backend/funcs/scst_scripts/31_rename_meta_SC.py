@@ -4,7 +4,7 @@ import json
 import os
 import sys
 
-from utils.funcs import is_categorical, dumps_compact_lists
+from utils.funcs import is_categorical, dumps_compact_lists, save_expr_store, save_precompressed, save_cell_metadata_parquet, save_umap_tiles, save_downsample_index, save_cell_ids
 
 import functools
 print = functools.partial(print, flush=True)
@@ -24,6 +24,18 @@ sample_col = "sample_id"
 cluster_col = "cell_type"
 condition_col = "case"
 
+## Also write one JSON file per gene (legacy format): the backend and steps 41/x1 read expr_store/,
+## gene_jsons/ is only read as a fallback for datasets prepared before the store
+save_gene_jsons = False
+## Also write compressed copies (.gz, add "br"/"zstd" if installed) of the files the portal serves as-is,
+## served by /api/getdatasetfile with Content-Encoding instead of compressing on every request
+precompress_encodings = ()  # e.g. ("gzip",)
+## Downsampling of the UMAP files (umap_embeddings_100k/50k.csv): "stratified" by the cluster column,
+## keeping at least min_per_cluster cells of every cluster, "sketch" (even coverage of the embedding)
+## or "random" (uniform, rare clusters can disappear)
+downsample_method = "stratified"
+min_per_cluster = 200
+
 print("Dataset path: ", dataset_path)
 print("Kept features: ", kept_features)
 print("Sample column: ", sample_col)
@@ -81,6 +93,9 @@ barcode_to_cid = metadata["cs_id"].to_dict()
 metadata["barcode"] = metadata.index.tolist()
 metadata = metadata.set_index("cs_id")
 
+## dense cell index: position in this order, shared by the metadata, expression and UMAP files
+save_cell_ids(metadata.index, dataset_path)
+
 all_samples = metadata["sample_id"].unique().tolist()
 with open(dataset_path + "/sample_list.json", "w") as f:
     json.dump(sorted(all_samples), f)
@@ -131,6 +146,8 @@ with open(dataset_path + "/cellspot_meta_mapping.json", "w") as f:
     f.write(dumps_compact_lists(cell_meta_mapping, indent=4))
 
 metadata_lite.to_csv(dataset_path + "/cellspot_metadata.csv")
+## columnar copy, read by the server instead of the CSV
+save_cell_metadata_parquet(metadata_lite, dataset_path + "/cellspot_metadata.parquet")
 
 print("Processing sample metadata...")
 sample_meta_list = sample_level_features
@@ -159,17 +176,26 @@ embeddings_data["index"] = embeddings_data["index"].map(barcode_to_cid)  # Renam
 embeddings_data = embeddings_data.set_index("index")  # Set the renamed column as index
 embeddings_data.to_csv(dataset_path + "/umap_embeddings.csv", index_label="cs_id")
 
-## sampling umap, get 100k cells
-print("Sampling umap...")
-n_rows = embeddings_data.shape[0]
-
-sample_rows = 100000 if n_rows > 100000 else n_rows
-embeddings_data_nk = embeddings_data.sample(n=sample_rows, random_state=42)
-embeddings_data_nk.to_csv(dataset_path + "/umap_embeddings_100k.csv", index_label="cs_id")
-
-sample_rows = 50000 if n_rows > 50000 else n_rows
-embeddings_data_nk = embeddings_data.sample(n=sample_rows, random_state=42)
-embeddings_data_nk.to_csv(dataset_path + "/umap_embeddings_50k.csv", index_label="cs_id")
+## sampling umap, get 100k and 50k cells: sampled once into downsample_index.json (the 50k are the first
+## 50k of the 100k), every UMAP-sized file below uses these cells
+print(f"Sampling umap ({downsample_method})...")
+cluster_labels = None
+if cluster_col in metadata.columns:
+    cluster_labels = metadata[cluster_col].reindex(embeddings_data.index)
+elif downsample_method == "stratified":
+    print(f"Cluster column {cluster_col} not found, sampling at random")
+    downsample_method = "random"
+sampled_ids = save_downsample_index(
+    dataset_path, embeddings_data.index, sizes=(100000, 50000), method=downsample_method,
+    labels=cluster_labels, coords=embeddings_data[["UMAP_1", "UMAP_2"]].to_numpy(), min_per_cluster=min_per_cluster,
+)
+embeddings_data.loc[sampled_ids[:100000]].to_csv(dataset_path + "/umap_embeddings_100k.csv", index_label="cs_id")
+embeddings_data.loc[sampled_ids[:50000]].to_csv(dataset_path + "/umap_embeddings_50k.csv", index_label="cs_id")
+
+## level-of-detail tile pyramid of the full embedding, served by /api/getumaptiles;
+## the coarsest levels take the sampled cells first
+print("Building umap tiles...")
+save_umap_tiles(embeddings_data, dataset_path, preferred_ids=sampled_ids[:50000])
 
 
 # %% ============================================================================
@@ -198,33 +224,38 @@ all_genes = grouped_by_gene.groups.keys()
 all_genes = [gene_i.replace("/", "_") for gene_i in list(set(all_genes))]
 with open(dataset_path + "/gene_list.json", "w") as f:
     json.dump(sorted(all_genes), f)
+total_n = len(all_genes)
 
-# Create directory for genes
-os.makedirs(dataset_path + "/gene_jsons", exist_ok=True)
+# Save the expression matrix as a memory-mapped sparse store (one column per gene)
+print("Saving expression store...")
+save_expr_store(expression_data, metadata.index.tolist(), dataset_path + "/expr_store")
 
-# Save each gene as a separate JSON file
-print("Saving gene... be patient...")
-i = 0
-total_n = len(all_genes)
-for gene, df in grouped_by_gene:
-    try:
-        i += 1
-        if i % 1000 == 0:
-            print(f"{i}/{total_n}")
+if save_gene_jsons:
+    # Create directory for genes
+    os.makedirs(dataset_path + "/gene_jsons", exist_ok=True)
+
+    # Save each gene as a separate JSON file
+    print("Saving gene... be patient...")
+    i = 0
+    for gene, df in grouped_by_gene:
+        try:
+            i += 1
+            if i % 1000 == 0:
+                print(f"{i}/{total_n}")
 
-        gene_dict = dict(zip(df["cs_id"], df["Expression"]))
+            gene_dict = dict(zip(df["cs_id"], df["Expression"]))
 
-        safe_gene_name = gene.replace("/", "_")
+            safe_gene_name = gene.replace("/", "_")
 
-        # Create JSON file
-        file_name = f"{dataset_path}/gene_jsons/{safe_gene_name}.json"
-        with open(file_name, "w") as f:
-            json.dump(gene_dict, f, indent=4)
+            # Create JSON file
+            file_name = f"{dataset_path}/gene_jsons/{safe_gene_name}.json"
+            with open(file_name, "w") as f:
+                json.dump(gene_dict, f)
 
-    except Exception as e:
-        print(f"Error in processing {gene} !!! Check the error_gene.txt")
-        with open(dataset_path + "/error_gene_json.txt", "a") as f_err:
-            f_err.write(gene + "\n")
+        except Exception as e:
+            print(f"Error in processing {gene} !!! Check the error_gene.txt")
+            with open(dataset_path + "/error_gene_json.txt", "a") as f_err:
+                f_err.write(gene + "\n")
 
 # %% ============================================================================
 ## calculate psuedo count of each gene in each sample
@@ -248,5 +279,15 @@ for gene, df_gene in pseudo_bulk.groupby("Gene"):
     with open(f"{dataset_path}/gene_pseudobulk/{safe_gene_name}.json", "w") as f:
         json.dump(gene_dict, f, indent=4)
 
+# %% ============================================================================
+if precompress_encodings:
+    print("Precompressing served files...")
+    served_files = ["cellspot_metadata.csv", "cellspot_meta_mapping.json", "sample_metadata.csv",
+                    "umap_embeddings_50k.csv", "gene_list.json", "meta_list.json"]
+    if save_gene_jsons:
+        served_files += ["gene_jsons/" + f for f in os.listdir(dataset_path + "/gene_jsons") if f.endswith(".json")]
+    for file_name in served_files:
+        save_precompressed(dataset_path + "/" + file_name, precompress_encodings)
+
 print("Done! Feature/Gene data processed and saved.")
 
@@ -6,6 +6,8 @@ import os
 import sys
 import numpy as np
 
+from utils.funcs import read_expr_store_genes
+
 
 # %% ============================================================================
 ## top 10 marker genes in each cell type
@@ -60,6 +62,22 @@ pool_genes = top_genes["gene"].unique().tolist()
 cluster_list = top_genes["cluster"].unique().tolist()
 metadata = pd.read_csv(dataset_folder + "/cellspot_metadata_original.csv", index_col=0, header=0)
 
+## read the marker genes from the expression store written by 31_rename_meta_*.py,
+## datasets prepared before the store existed only have gene_jsons/
+store_exprs = read_expr_store_genes(dataset_folder + "/expr_store", pool_genes)
+if store_exprs is None:
+    print("No expression store found, reading gene_jsons/")
+    store_exprs = {}
+
+def load_gene_expr(gene):
+    if gene in store_exprs:
+        return store_exprs[gene]
+    gene_file = dataset_folder + "/gene_jsons/" + gene + ".json"
+    if os.path.exists(gene_file):
+        return json.load(open(gene_file))
+    ## not stored anywhere: the gene is not expressed in any cell
+    return {}
+
 #%% ============================================================================
 ## calculate the percentage of cells where the gene is detected in that cell type
 
@@ -90,7 +108,7 @@ for cluster in cluster_list:
     marker_genes = {}
     for gene in pool_genes:
         marker_genes[gene] = {}
-        gene_expr = json.load(open(dataset_folder + "/gene_jsons/"+gene+".json"))
+        gene_expr = load_gene_expr(gene)
         gene_expr_in_cells =  list(gene_expr.keys())
 
         cells_with_gene_expr = [cell for cell in gene_expr_in_cells if cell in cells_in_cluster.index]
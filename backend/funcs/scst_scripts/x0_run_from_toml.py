@@ -3,6 +3,8 @@ import os
 import json
 import subprocess
 
+from utils.funcs import save_dataset_version
+
 ## ==============================================================
 print("Loading toml file...")
 # Check if the toml file exists
@@ -203,6 +205,13 @@ with open(f"{dataset_path}/prepare_cellcount_output.log", "w") as log_file:
         log_file.flush()            # ensure it’s written immediately
 
     process_py.wait()
+
+## ==============================================================
+## content version of the processed files, the ETag of the dataset's cached responses;
+## last, every step above writes files into the dataset folder
+print("Recording dataset version...")
+save_dataset_version(dataset_path)
+
 ## ==============================================================
 print("Done! All scripts executed successfully.")
 
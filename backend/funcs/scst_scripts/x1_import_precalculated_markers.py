@@ -4,6 +4,8 @@ import json
 import os
 import numpy as np
 
+from utils.funcs import read_expr_store_genes, save_dataset_version
+
 
 #%% ============================================
 data_file = "Seurats/Jie/pseudobulk_layer_all_deseq2_contsonly_12052023.csv"
@@ -70,6 +72,22 @@ pool_genes = df_top["gene"].unique().tolist()
 cluster_list = df_top["cluster"].unique().tolist()
 metadata = pd.read_csv(dataset_folder + "/cellspot_metadata_original.csv", index_col=0, header=0)
 
+## read the marker genes from the expression store written by 31_rename_meta_*.py,
+## datasets prepared before the store existed only have gene_jsons/
+store_exprs = read_expr_store_genes(dataset_folder + "/expr_store", pool_genes)
+if store_exprs is None:
+    print("No expression store found, reading gene_jsons/")
+    store_exprs = {}
+
+def load_gene_expr(gene):
+    if gene in store_exprs:
+        return store_exprs[gene]
+    gene_file = dataset_folder + "/gene_jsons/" + gene + ".json"
+    if os.path.exists(gene_file):
+        return json.load(open(gene_file))
+    ## not stored anywhere: the gene is not expressed in any cell
+    return {}
+
 pct_detected = {}
 
 marker_genes_df = pd.DataFrame()
@@ -97,7 +115,7 @@ for cluster in cluster_list:
     marker_genes = {}
     for gene in pool_genes:
         marker_genes[gene] = {}
-        gene_expr = json.load(open(dataset_folder + "/gene_jsons/"+gene+".json"))
+        gene_expr = load_gene_expr(gene)
         gene_expr_in_cells =  list(gene_expr.keys())
 
         cells_with_gene_expr = [cell for cell in gene_expr_in_cells if cell in cells_in_cluster.index]
@@ -144,4 +162,7 @@ marker_genes_df.to_csv(output_folder + "/cluster_markergenes_cellcounts.csv", in
 # Save the dictionary to a JSON file
 with open(output_folder + "/cluster_cellcounts.json", "w") as f:
     json.dump(pct_detected, f, indent=4)    
+
+## the marker files changed, record the new content version of the dataset
+save_dataset_version(dataset_folder)
 # %%
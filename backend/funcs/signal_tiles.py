@@ -0,0 +1,59 @@
+import numpy as np
+
+from backend.settings import settings
+from backend.funcs.cache import LRUCache, file_signature
+
+
+## Binned bigwig signal served from fixed tiles.
+## Bin sizes are snapped up to a power of two and each tile holds TILE_BINS bins aligned to the
+## chromosome start, so overlapping, panned and repeated windows reuse the same tiles.
+## Tiles are keyed by bigwig path and mtime/size; a replaced file misses and its old tiles age out.
+
+TILE_BINS = 256
+
+tile_cache = LRUCache(settings.signal_tile_cache_mb * 1024 * 1024, name="signal_tiles")
+
+
+def format_signal_values(values, sig_figs=5):
+    ## round to sig_figs significant digits, missing values (None/NaN) become 0.0
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+    nonzero = values != 0
+    magnitude = np.zeros(values.shape, dtype=np.int64)
+    magnitude[nonzero] = np.floor(np.log10(np.abs(values[nonzero])))
+    scale = 10.0 ** np.maximum(0, sig_figs - magnitude - 1)
+    return np.round(values * scale) / scale
+
+
+def snap_bin_size(bin_size):
+    ## smallest power of two >= bin_size
+    return 1 << max(0, int(bin_size) - 1).bit_length()
+
+
+def _read_tile(bw, chromosome, chrom_len, bin_size, tile):
+    tile_start = tile * TILE_BINS * bin_size
+    tile_end = min(tile_start + TILE_BINS * bin_size, chrom_len)
+    num_bins = -(-(tile_end - tile_start) // bin_size)
+    return format_signal_values(bw.stats(chromosome, tile_start, tile_end, nBins=num_bins, type="mean"))
+
+
+def get_binned_signal(bw, bw_path, chromosome, chrom_len, start, end, bin_size):
+    ## returns (bin starts, values) of the snapped bins overlapping [start, end)
+    bin_size = snap_bin_size(bin_size)
+    first_bin = start // bin_size
+    last_bin = (end - 1) // bin_size
+    signature = file_signature(bw_path)
+
+    parts = []
+    for tile in range(first_bin // TILE_BINS, last_bin // TILE_BINS + 1):
+        key = (bw_path, signature, chromosome, bin_size, tile)
+        values = tile_cache.get(key)
+        if values is None:
+            values = _read_tile(bw, chromosome, chrom_len, bin_size, tile)
+            tile_cache.put(key, values, cost=values.nbytes)
+        parts.append(values)
+
+    values = np.concatenate(parts)
+    offset = (first_bin // TILE_BINS) * TILE_BINS
+    values = values[first_bin - offset:last_bin - offset + 1]
+    positions = np.arange(first_bin, last_bin + 1, dtype=np.int64) * bin_size
+    return positions, values
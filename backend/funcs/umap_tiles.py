@@ -0,0 +1,163 @@
+import os
+import math
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from backend.funcs.cache import artifact_cache, read_json
+from backend.funcs.cell_index import get_cell_index
+from backend.funcs.utils import umap_tile_levels, umap_tile_counts
+
+
+## Multi-resolution UMAP (/api/getumaptiles): a quadtree pyramid over the full embedding, written by
+## 31_rename_meta_*.py (utils.save_umap_tiles). Every cell belongs to one level; level z adds up to
+## tile_points random cells to each of its 2^z x 2^z tiles, so the cells of levels <= z in a viewport
+## are a uniform sample of it whose size does not grow with the dataset. The rows are sorted by
+## level, and a viewport query is a bounding-box filter over the first level_offsets[z + 1] rows.
+## The point counts of every tile are precomputed per level (umap_tiles.json), so the density and
+## n_cells of a viewport come from the counts of its tiles instead of a pass over all cells.
+## Datasets processed before the pyramid existed get it built in memory from umap_embeddings.csv.
+
+UMAP_TILES_PARQUET = "umap_tiles.parquet"
+UMAP_TILES_INFO = "umap_tiles.json"
+
+
+class UmapTiles:
+    def __init__(self, cs_ids, x, y, levels, bounds, tile_counts=None, cells=None):
+        ## arrays sorted by level
+        self.cs_ids = cs_ids
+        self.x = x
+        self.y = y
+        ## dense cell index positions of cs_ids (layout=index), None without cell ids
+        self.cells = cells
+        self.origin_x, self.origin_y, self.size = bounds
+        self.max_level = int(levels[-1]) if len(levels) else 0
+        self.level_offsets = np.searchsorted(levels, np.arange(self.max_level + 2), side="left")
+        if tile_counts is None:
+            tile_counts = umap_tile_counts(x, y, levels, bounds)
+        ## per level: (sorted tile keys, points per tile, points of levels <= level per tile)
+        self.tile_counts = [
+            (np.asarray(counts["tile"], dtype=np.int64), np.asarray(counts["count"], dtype=np.int64),
+             np.asarray(counts["sampled"], dtype=np.int64))
+            for counts in tile_counts
+        ]
+
+    def __len__(self):
+        return len(self.cs_ids)
+
+    def level_for(self, x0, y0, x1, y1):
+        ## the level whose tiles are about half the viewport: 2-3 tiles across, a bounded point count
+        span = max(x1 - x0, y1 - y0)
+        if span <= 0:
+            return self.max_level
+        level = math.floor(math.log2(self.size / span)) + 1
+        return min(max(level, 0), self.max_level)
+
+    def query(self, x0=None, y0=None, x1=None, y1=None, level=None, layout="columns"):
+        x0 = self.origin_x if x0 is None else x0
+        y0 = self.origin_y if y0 is None else y0
+        x1 = self.origin_x + self.size if x1 is None else x1
+        y1 = self.origin_y + self.size if y1 is None else y1
+        if level is None:
+            level = self.level_for(x0, y0, x1, y1)
+        level = min(max(level, 0), self.max_level)
+
+        ## points of levels <= level inside the viewport
+        end = self.level_offsets[level + 1]
+        x, y = self.x[:end], self.y[:end]
+        idx = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+        ## columns, x and y stay numpy arrays (written directly by ORJSONResponse)
+        if layout == "index":
+            points = {"cell": self.cells[idx], "x": x[idx], "y": y[idx]}
+        else:
+            points = {"cs_id": self.cs_ids[idx].tolist(), "x": x[idx], "y": y[idx]}
+
+        ## cell counts of the tiles of this level that overlap the viewport: the tile keys are
+        ## sorted by column, so the columns tx0..tx1 are one slice
+        tiles = 1 << level
+        tx0, tx1 = self._tile(x0, self.origin_x, tiles), self._tile(x1, self.origin_x, tiles)
+        ty0, ty1 = self._tile(y0, self.origin_y, tiles), self._tile(y1, self.origin_y, tiles)
+        keys, counts, sampled = self.tile_counts[level]
+        lo, hi = np.searchsorted(keys, [tx0 * tiles, (tx1 + 1) * tiles])
+        keys, counts, sampled = keys[lo:hi], counts[lo:hi], sampled[lo:hi]
+        in_rows = (keys % tiles >= ty0) & (keys % tiles <= ty1)
+        keys, counts, sampled = keys[in_rows], counts[in_rows], sampled[in_rows]
+        density = [[key // tiles, key % tiles, count] for key, count in zip(keys.tolist(), counts.tolist())]
+
+        ## cells in the viewport: exact when no overlapping tile has cells of deeper levels, else the
+        ## returned points of each tile (a uniform sample of its cells) scaled by count / sampled
+        complete = bool(np.all(counts == sampled))
+        if complete:
+            n_in_view = len(idx)
+        else:
+            px = np.minimum(((x[idx] - self.origin_x) / self.size * tiles).astype(np.int64), tiles - 1)
+            py = np.minimum(((y[idx] - self.origin_y) / self.size * tiles).astype(np.int64), tiles - 1)
+            shown = np.bincount(np.searchsorted(keys, px * tiles + py), minlength=len(keys))[:len(keys)]
+            n_in_view = int(round(float(np.sum(shown * counts / np.maximum(sampled, 1)))))
+
+        return {
+            "level": level,
+            "max_level": self.max_level,
+            "origin": [self.origin_x, self.origin_y],
+            "tile_size": self.size / tiles,
+            "n_cells": n_in_view,
+            "complete": complete,
+            "points": points,
+            "density": density,
+        }
+
+    def _tile(self, value, origin, tiles):
+        ## tile column/row of a coordinate, clamped to the pyramid
+        tile = math.floor((value - origin) / self.size * tiles)
+        return min(max(tile, 0), tiles - 1)
+
+
+def _cell_positions(dataset, cs_ids):
+    ## resolved once per load, the cached UmapTiles is never modified afterwards
+    cell_index = get_cell_index(dataset)
+    return cell_index.positions(cs_ids) if cell_index is not None else None
+
+
+def _load_tiles(dataset, parquet_file):
+    info = read_json(os.path.join(os.path.dirname(parquet_file), UMAP_TILES_INFO))
+    df = pl.read_parquet(parquet_file, columns=["cs_id", "UMAP_1", "UMAP_2", "level"])
+    cs_ids = df.get_column("cs_id").to_numpy()
+    ## tile counts are missing from files written before they were precomputed
+    return UmapTiles(
+        cs_ids,
+        df.get_column("UMAP_1").to_numpy(),
+        df.get_column("UMAP_2").to_numpy(),
+        df.get_column("level").to_numpy(),
+        info["bounds"],
+        tile_counts=info.get("tile_counts"),
+        cells=_cell_positions(dataset, cs_ids),
+    )
+
+
+def _build_tiles(dataset, umap_file):
+    data_df = pd.read_csv(umap_file, index_col=0, header=0)
+    x = data_df["UMAP_1"].to_numpy(dtype=np.float64)
+    y = data_df["UMAP_2"].to_numpy(dtype=np.float64)
+    levels, bounds = umap_tile_levels(x, y)
+    order = np.argsort(levels, kind="stable")
+    cs_ids = data_df.index.astype(str).to_numpy()[order]
+    return UmapTiles(
+        cs_ids, x[order], y[order], levels[order], bounds, cells=_cell_positions(dataset, cs_ids)
+    )
+
+
+def get_umap_tiles(dataset):
+    ## UmapTiles of the dataset, or None without a UMAP
+    dataset_path = os.path.join("backend", "datasets", dataset)
+    parquet_file = os.path.join(dataset_path, UMAP_TILES_PARQUET)
+    cost = lambda tiles: 100 * len(tiles)
+    if os.path.exists(parquet_file):
+        return artifact_cache.load(
+            dataset, parquet_file, lambda f: _load_tiles(dataset, f), tag="umap_tiles", cost=cost
+        )
+    umap_file = os.path.join(dataset_path, "umap_embeddings.csv")
+    if os.path.exists(umap_file):
+        return artifact_cache.load(
+            dataset, umap_file, lambda f: _build_tiles(dataset, f), tag="umap_tiles", cost=cost
+        )
+    return None
@@ -1,5 +1,12 @@
+import gzip
+import hashlib
 import json
+import os
 import re
+import time
+
+import numpy as np
+import pandas as pd
 
 
 def is_categorical(arr, unique_threshold=20):
@@ -43,3 +50,505 @@ def dumps_compact_lists(obj, indent=4):
     return compacted
 
 
+def save_expr_store(expression_data, cell_ids, store_dir, gene_col="Gene", cell_col="cs_id", value_col="Expression",
+                    dtype="float32", decimals=2):
+    """
+    Save long-format expression data as a CSC-style sparse matrix (one column per gene).
+
+    Parameters:
+    expression_data (DataFrame): Long-format table with one row per non-zero (gene, cell) value.
+    cell_ids (list): Ordered cell/spot ids, the position in this list is the row index of the matrix.
+    store_dir (str): Output folder, e.g. <dataset>/expr_store.
+    dtype (str): "float32" or "float16" for the stored values.
+    decimals (int or None): Rounding applied by the reader when values are returned.
+
+    Files:
+    indptr.npy (int64, n_genes + 1), indices.npy (int32 cell positions), data.npy (values),
+    genes.json, cells.json and meta.json. meta.json is written last and marks the store as complete.
+    """
+
+    os.makedirs(store_dir, exist_ok=True)
+    meta_file = os.path.join(store_dir, "meta.json")
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+
+    cell_codes = pd.Index(cell_ids).get_indexer(expression_data[cell_col])
+    kept = cell_codes >= 0
+    cell_codes = cell_codes[kept]
+
+    genes = pd.Categorical(expression_data[gene_col].to_numpy()[kept])
+    gene_codes = genes.codes
+    values = expression_data[value_col].to_numpy()[kept]
+
+    order = np.lexsort((cell_codes, gene_codes))
+    counts = np.bincount(gene_codes, minlength=len(genes.categories))
+    indptr = np.zeros(len(genes.categories) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+
+    np.save(os.path.join(store_dir, "indptr.npy"), indptr)
+    np.save(os.path.join(store_dir, "indices.npy"), cell_codes[order].astype(np.int32))
+    np.save(os.path.join(store_dir, "data.npy"), values[order].astype(dtype))
+
+    gene_names = [str(gene).replace("/", "_") for gene in genes.categories]
+    with open(os.path.join(store_dir, "genes.json"), "w") as f:
+        json.dump(gene_names, f)
+    with open(os.path.join(store_dir, "cells.json"), "w") as f:
+        json.dump([str(cell) for cell in cell_ids], f)
+
+    meta = {
+        "format_version": 1,
+        "n_genes": len(gene_names),
+        "n_cells": len(cell_ids),
+        "nnz": int(indptr[-1]),
+        "dtype": str(np.dtype(dtype)),
+        "decimals": decimals,
+    }
+    with open(meta_file, "w") as f:
+        json.dump(meta, f, indent=4)
+
+    return meta
+
+
+def read_expr_store_genes(store_dir, genes):
+    """
+    Read genes from an expression store written by save_expr_store(), for the preprocessing scripts
+    that run outside the backend (backend/funcs/expr_store.py is the server-side reader).
+
+    Parameters:
+    store_dir (str): Store folder, e.g. <dataset>/expr_store.
+    genes (list): Gene names to read.
+
+    Returns:
+    dict: {gene: {cs_id: value}}, the same shape as the legacy gene_jsons/<gene>.json files.
+    Genes missing from the store are left out. None if the store is missing or incomplete.
+    """
+
+    meta_file = os.path.join(store_dir, "meta.json")
+    if not os.path.exists(meta_file):
+        return None
+    with open(meta_file, "r") as f:
+        meta = json.load(f)
+    with open(os.path.join(store_dir, "genes.json"), "r") as f:
+        gene_index = {gene: i for i, gene in enumerate(json.load(f))}
+    with open(os.path.join(store_dir, "cells.json"), "r") as f:
+        cell_ids = np.array(json.load(f), dtype=object)
+
+    indptr = np.load(os.path.join(store_dir, "indptr.npy"), mmap_mode="r")
+    indices = np.load(os.path.join(store_dir, "indices.npy"), mmap_mode="r")
+    data = np.load(os.path.join(store_dir, "data.npy"), mmap_mode="r")
+    decimals = meta.get("decimals", None)
+
+    gene_exprs = {}
+    for gene in genes:
+        i = gene_index.get(str(gene).replace("/", "_"), None)
+        if i is None:
+            continue
+        start, end = int(indptr[i]), int(indptr[i + 1])
+        values = np.asarray(data[start:end], dtype=np.float64)
+        if decimals is not None:
+            values = values.round(decimals)
+        gene_exprs[gene] = dict(zip(cell_ids[indices[start:end]].tolist(), values.tolist()))
+    return gene_exprs
+
+
+def save_precompressed(file_path, encodings=("gzip",)):
+    """
+    Write compressed copies of an immutable dataset file next to it, for serving with Content-Encoding.
+
+    Parameters:
+    file_path (str): File to compress, e.g. <dataset>/umap_embeddings_50k.csv.
+    encodings (tuple): Any of "gzip" (<file>.gz), "br" (<file>.br, needs brotli) and "zstd"
+        (<file>.zst, needs zstandard). Max compression levels, this runs once per file.
+
+    Returns:
+    list: Paths of the written copies. A copy older than its file is ignored by the server,
+    so re-run this after regenerating the file.
+    """
+
+    with open(file_path, "rb") as f:
+        body = f.read()
+
+    written = []
+    for encoding in encodings:
+        if encoding == "gzip":
+            suffix, data = ".gz", gzip.compress(body, compresslevel=9, mtime=0)
+        elif encoding == "br":
+            import brotli
+            suffix, data = ".br", brotli.compress(body, quality=11)
+        elif encoding == "zstd":
+            import zstandard
+            suffix, data = ".zst", zstandard.ZstdCompressor(level=19).compress(body)
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+        ## write to a temporary name first, a half-written copy must never be served
+        tmp_path = file_path + suffix + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path + suffix)
+        written.append(file_path + suffix)
+
+    return written
+
+
+def save_cell_ids(cell_ids, dataset_path):
+    """
+    Write the lookup table of the dense cell index (cell_ids.json), read by backend/funcs/cell_index.py.
+
+    Parameters:
+    cell_ids (list): cs_ids in metadata order; position i is cell i in cellspot_metadata, the
+        expression store and the layout=index responses.
+    dataset_path (str): Dataset folder.
+
+    Returns:
+    int: Number of cells.
+    """
+
+    cell_ids = [str(cell) for cell in cell_ids]
+    with open(os.path.join(dataset_path, "cell_ids.json"), "w") as f:
+        json.dump(cell_ids, f)
+    return len(cell_ids)
+
+
+def save_cell_metadata_parquet(metadata_lite, file_path, row_group_size=65536):
+    """
+    Write the cell metadata table as parquet, the columnar store read by backend/funcs/cell_metadata.py.
+
+    Parameters:
+    metadata_lite (pd.DataFrame): Cell metadata indexed by cs_id, as written to cellspot_metadata.csv
+        (categorical columns already replaced by their integer codes).
+    file_path (str): Output file, <dataset>/cellspot_metadata.parquet.
+    row_group_size (int): Rows per row group. Row groups carry min/max statistics of cs_id, so a
+        read of one sample or of the UMAP cells skips the groups it does not need.
+
+    Returns:
+    str: file_path.
+    """
+
+    import polars as pl
+
+    columns = [pl.Series(metadata_lite.index.name or "cs_id", metadata_lite.index.astype(str).to_numpy(), dtype=pl.String)]
+    for col in metadata_lite.columns:
+        values = metadata_lite[col]
+        if values.dtype == object:
+            ## strings with missing values: None instead of NaN
+            columns.append(pl.Series(str(col), [None if pd.isna(v) else str(v) for v in values], dtype=pl.String))
+        else:
+            columns.append(pl.Series(str(col), values.to_numpy()))
+
+    tmp_path = file_path + ".tmp"
+    pl.DataFrame(columns).write_parquet(tmp_path, compression="zstd", statistics=True, row_group_size=row_group_size)
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def _stratified_quota(sizes, n, min_per_cluster):
+    ## cells per cluster: min(size, min_per_cluster) first, the rest of n in proportion to the cells left
+    floors = np.minimum(sizes, min_per_cluster)
+    if floors.sum() >= n:
+        ## not even the floors fit: the largest equal share t with sum(min(size, t)) <= n
+        quota = np.zeros_like(sizes)
+        left, open_clusters = n, np.argsort(sizes)
+        for i, cluster in enumerate(open_clusters):
+            share = left // (len(open_clusters) - i)
+            quota[cluster] = min(sizes[cluster], share)
+            left -= quota[cluster]
+        return quota
+    rest = sizes - floors
+    extra = rest * (n - floors.sum()) / rest.sum() if rest.sum() else np.zeros(len(sizes))
+    quota = floors + np.floor(extra).astype(np.int64)
+    ## largest remainders get the cells lost to rounding
+    for cluster in np.argsort(-(extra - np.floor(extra)))[: n - quota.sum()]:
+        quota[cluster] += 1
+    return np.minimum(quota, sizes)
+
+
+def downsample_cells(n_cells, n, method="stratified", labels=None, coords=None, min_per_cluster=200, random_state=42):
+    """
+    Pick a subset of cells for the browser, as positions into the full cell list.
+
+    Parameters:
+    n_cells (int): Number of cells.
+    n (int): Number of cells to keep (all cells when there are fewer).
+    method (str): "random" (uniform), "stratified" (per cluster, each cluster keeps at least
+        min_per_cluster cells or all of them, the rest is shared in proportion to cluster size),
+        or "sketch" (geometric sketching: even coverage of the embedding, dense regions are thinned
+        and sparse ones kept).
+    labels (array-like): Cluster label of each cell, for "stratified".
+    coords (np.ndarray): n_cells x 2 embedding, for "sketch".
+    min_per_cluster (int): Floor of each cluster for "stratified".
+    random_state (int): Seed.
+
+    Returns:
+    np.ndarray: Positions of the kept cells, in random order.
+    """
+
+    if method not in ("random", "stratified", "sketch"):
+        raise ValueError(f"Unsupported downsampling method: {method}")
+
+    rng = np.random.default_rng(random_state)
+    if n >= n_cells:
+        return rng.permutation(n_cells)
+
+    if method == "random":
+        return rng.choice(n_cells, n, replace=False)
+
+    if method == "stratified":
+        codes = np.unique(pd.Series(labels).astype(str).to_numpy(), return_inverse=True)[1]
+        quota = _stratified_quota(np.bincount(codes), n, min_per_cluster)
+        ## random rank of each cell within its cluster, keep the first quota[cluster]
+        order = np.lexsort((rng.random(n_cells), codes))
+        rank = np.arange(n_cells) - np.searchsorted(codes[order], codes[order], side="left")
+        kept = order[rank < quota[codes[order]]]
+        return rng.permutation(kept)
+
+    ## sketch: a grid of ~n boxes over the embedding, cells taken round-robin across the occupied boxes
+    coords = np.asarray(coords, dtype=np.float64)
+    grid = max(int(np.ceil(np.sqrt(n))), 1)
+    lo = coords.min(axis=0)
+    span = np.maximum(coords.max(axis=0) - lo, 1e-12) * (1 + 1e-9)
+    box = ((coords - lo) / span * grid).astype(np.int64)
+    key = box[:, 0] * grid + box[:, 1]
+    order = np.lexsort((rng.random(n_cells), key))
+    rank = np.arange(n_cells) - np.searchsorted(key[order], key[order], side="left")
+    ## by rank, then randomly among the boxes of the same rank
+    kept = order[np.lexsort((rng.random(n_cells), rank))[:n]]
+    return rng.permutation(kept)
+
+
+## sampled cells of a dataset, shared by all the UMAP-sized artifacts
+DOWNSAMPLE_INDEX_FILE = "downsample_index.json"
+
+
+def save_downsample_index(dataset_path, cs_ids, sizes=(100000, 50000), method="stratified", labels=None,
+                          coords=None, min_per_cluster=200, random_state=42):
+    """
+    Sample the cells once and write the sample as an ordered list (downsample_index.json), so that
+    every n-cell artifact (umap_embeddings_100k/50k.csv, the UMAP subset of the metadata and
+    expression views, the coarse levels of the UMAP tiles) uses the same cells.
+
+    Parameters:
+    dataset_path (str): Dataset folder.
+    cs_ids (array-like): All cell ids, aligned with labels / coords.
+    sizes (tuple): Sample sizes; the first n ids of the list are the n-cell sample for each size,
+        each smaller sample is drawn (with the same method) from the larger one.
+    method, labels, coords, min_per_cluster, random_state: See downsample_cells().
+
+    Returns:
+    list: The ordered cs_ids (as long as the largest size).
+    """
+
+    cs_ids = np.asarray(cs_ids).astype(str)
+    labels = np.asarray(labels) if labels is not None else None
+    coords = np.asarray(coords) if coords is not None else None
+
+    ## largest sample first, then each smaller one from the previous: positions in nested order
+    positions = np.arange(len(cs_ids))
+    nested = []
+    for n in sorted(sizes, reverse=True):
+        picked = downsample_cells(
+            len(positions), n, method,
+            labels=labels[positions] if labels is not None else None,
+            coords=coords[positions] if coords is not None else None,
+            min_per_cluster=min_per_cluster, random_state=random_state,
+        )
+        picked_set = np.zeros(len(positions), dtype=bool)
+        picked_set[picked] = True
+        nested.append(positions[~picked_set])  # in this sample, not in the next smaller one
+        positions = positions[picked]
+    order = np.concatenate([positions] + nested[::-1][:-1]) if nested else positions
+
+    index = {
+        "method": method,
+        "min_per_cluster": min_per_cluster,
+        "random_state": random_state,
+        "sizes": sorted(min(n, len(cs_ids)) for n in sizes),
+        "cs_ids": cs_ids[order].tolist(),
+    }
+    with open(os.path.join(dataset_path, DOWNSAMPLE_INDEX_FILE), "w") as f:
+        json.dump(index, f)
+    return index["cs_ids"]
+
+
+def umap_tile_levels(x, y, tile_points=10000, max_level=16, random_state=42, preferred=None):
+    """
+    Assign every point of an embedding to a level of a quadtree tile pyramid.
+
+    Level z splits the (square) extent of the points into 2^z x 2^z tiles. Each tile takes at most
+    tile_points random points that no coarser level took, so the points of levels <= z inside any
+    area are a uniform sample of it, and every point appears at some level (the deepest level
+    takes all the rest).
+
+    Parameters:
+    x, y (np.ndarray): Coordinates.
+    tile_points (int): Points added per tile and level.
+    max_level (int): Deepest level.
+    random_state (int): Seed of the random priority of the points.
+    preferred (np.ndarray): Positions of points each tile takes first, in this order (the cells of
+        the downsample index, so the coarse levels show the same cells as umap_embeddings_50k.csv).
+
+    Returns:
+    tuple: (levels as np.int8 array, bounds [x0, y0, size] of the level-0 tile).
+    """
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    levels = np.full(n, -1, dtype=np.int8)
+    if n == 0:
+        return levels, [0.0, 0.0, 1.0]
+
+    x0, y0 = float(x.min()), float(y.min())
+    size = max(float(x.max()) - x0, float(y.max()) - y0) or 1.0
+    size *= 1 + 1e-9  # the maximum falls inside the last tile
+    priority = np.random.default_rng(random_state).random(n)
+    if preferred is not None and len(preferred):
+        priority += 1
+        priority[preferred] = np.arange(len(preferred)) / len(preferred)
+
+    remaining = np.arange(n)
+    for level in range(max_level + 1):
+        if level == max_level:
+            levels[remaining] = level
+            break
+        tiles = 1 << level
+        tx = np.minimum(((x[remaining] - x0) / size * tiles).astype(np.int64), tiles - 1)
+        ty = np.minimum(((y[remaining] - y0) / size * tiles).astype(np.int64), tiles - 1)
+        key = tx * tiles + ty
+        order = np.lexsort((priority[remaining], key))
+        sorted_key = key[order]
+        ## rank of each point within its tile, by priority
+        rank = np.arange(len(order)) - np.searchsorted(sorted_key, sorted_key, side="left")
+        taken = order[rank < tile_points]
+        levels[remaining[taken]] = level
+        remaining = np.sort(remaining[order[rank >= tile_points]])
+        if len(remaining) == 0:
+            break
+
+    return levels, [x0, y0, size]
+
+
+def umap_tile_counts(x, y, levels, bounds):
+    """
+    Count the points of every non-empty tile of each level of the pyramid of umap_tile_levels().
+
+    Parameters:
+    x, y (np.ndarray): Coordinates.
+    levels (np.ndarray): Level of each point.
+    bounds (list): [x0, y0, size] of the level-0 tile.
+
+    Returns:
+    list: One dict per level z with "tile" (sorted keys tx * 2^z + ty of the non-empty tiles),
+    "count" (points of all levels in the tile) and "sampled" (points of levels <= z in the tile).
+    """
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x0, y0, size = bounds
+    n_levels = int(levels.max()) + 1 if len(levels) else 0
+    tile_counts = []
+    for level in range(n_levels):
+        tiles = 1 << level
+        tx = np.minimum(((x - x0) / size * tiles).astype(np.int64), tiles - 1)
+        ty = np.minimum(((y - y0) / size * tiles).astype(np.int64), tiles - 1)
+        key = tx * tiles + ty
+        tile, count = np.unique(key, return_counts=True)
+        sampled = np.bincount(np.searchsorted(tile, key[levels <= level]), minlength=len(tile))
+        tile_counts.append({"tile": tile, "count": count, "sampled": sampled})
+    return tile_counts
+
+
+def save_umap_tiles(embeddings_data, dataset_path, tile_points=10000, max_level=16, random_state=42, preferred_ids=None):
+    """
+    Write the UMAP tile pyramid read by backend/funcs/umap_tiles.py (/api/getumaptiles).
+
+    Parameters:
+    embeddings_data (pd.DataFrame): Full embedding indexed by cs_id, columns UMAP_1 and UMAP_2.
+    dataset_path (str): Dataset folder; writes umap_tiles.parquet (cs_id, UMAP_1, UMAP_2, level,
+        sorted by level) and umap_tiles.json (bounds, tile_points, the first row of each level and
+        the per-tile point counts of umap_tile_counts()).
+    tile_points, max_level, random_state: See umap_tile_levels().
+    preferred_ids (list): cs_ids the tiles take first (see umap_tile_levels(preferred)).
+
+    Returns:
+    dict: The content of umap_tiles.json.
+    """
+
+    import polars as pl
+
+    x = embeddings_data["UMAP_1"].to_numpy(dtype=np.float64)
+    y = embeddings_data["UMAP_2"].to_numpy(dtype=np.float64)
+    preferred = None
+    if preferred_ids is not None:
+        preferred = embeddings_data.index.get_indexer(preferred_ids)
+        preferred = preferred[preferred >= 0]
+    levels, bounds = umap_tile_levels(x, y, tile_points, max_level, random_state, preferred)
+    order = np.argsort(levels, kind="stable")
+    n_levels = int(levels.max()) + 1 if len(levels) else 0
+
+    tiles = pl.DataFrame(
+        [
+            pl.Series("cs_id", embeddings_data.index.astype(str).to_numpy()[order], dtype=pl.String),
+            pl.Series("UMAP_1", x[order]),
+            pl.Series("UMAP_2", y[order]),
+            pl.Series("level", levels[order]),
+        ]
+    )
+    info = {
+        "bounds": bounds,
+        "tile_points": tile_points,
+        "n_points": len(levels),
+        ## rows of levels <= z are the first level_offsets[z + 1] rows
+        "level_offsets": np.searchsorted(levels[order], np.arange(n_levels + 1), side="left").tolist(),
+        ## per level, the point counts of the non-empty tiles (the density of /api/getumaptiles)
+        "tile_counts": [
+            {key: values.tolist() for key, values in counts.items()}
+            for counts in umap_tile_counts(x, y, levels, bounds)
+        ],
+    }
+
+    tmp_path = os.path.join(dataset_path, "umap_tiles.parquet.tmp")
+    tiles.write_parquet(tmp_path, compression="zstd")
+    os.replace(tmp_path, os.path.join(dataset_path, "umap_tiles.parquet"))
+    with open(os.path.join(dataset_path, "umap_tiles.json"), "w") as f:
+        ## no indent: the tile counts hold a few entries per tile
+        json.dump(info, f)
+    return info
+
+
+## per-dataset content version read by backend/funcs/http_cache.py
+DATASET_VERSION_FILE = "dataset_version.json"
+
+
+def save_dataset_version(dataset_path):
+    """
+    Record the content version of a processed dataset folder, used for the ETags of its responses.
+
+    Parameters:
+    dataset_path (str): Dataset folder, e.g. backend/datasets/<dataset>.
+
+    Returns:
+    dict: {"version", "created", "n_files"}. The version is a hash of the relative path, mtime and
+    size of every file in the folder (logs excluded); run this last, after all files are written.
+    """
+
+    entries = []
+    for root, dirs, files in os.walk(dataset_path):
+        dirs.sort()
+        for file_name in sorted(files):
+            if file_name == DATASET_VERSION_FILE or file_name.endswith((".log", ".tmp")):
+                continue
+            file_path = os.path.join(root, file_name)
+            st = os.stat(file_path)
+            entries.append(f"{os.path.relpath(file_path, dataset_path)}\t{st.st_mtime_ns}\t{st.st_size}")
+
+    version = {
+        "version": hashlib.sha1("\n".join(entries).encode()).hexdigest()[:16],
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "n_files": len(entries),
+    }
+    tmp_path = os.path.join(dataset_path, DATASET_VERSION_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(version, f, indent=4)
+    os.replace(tmp_path, os.path.join(dataset_path, DATASET_VERSION_FILE))
+    return version
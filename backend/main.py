@@ -5,8 +5,10 @@ from backend.db import create_db_and_tables
 from backend.routes import db_routes, api_routes, visium_routes, qtl_routes, dm_routes,signal_routes
 
 from backend.settings import settings
+from backend.funcs.responses import ORJSONResponse
+from backend.funcs.compression import CompressionMiddleware
 
-app = FastAPI(debug=settings.debug)
+app = FastAPI(debug=settings.debug, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +19,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
 
 app.add_event_handler("startup", create_db_and_tables)
 
@@ -2,8 +2,17 @@ from fastapi import APIRouter, HTTPException
 from starlette.requests import Request
 
 from backend.db import SessionDep
+from backend.settings import settings
 from backend.db_utils.crud import *
 from backend.funcs.get_data import *
+from backend.funcs.executor import run_blocking, run_encoded, encoded_response, executor_stats
+from backend.funcs.cache import artifact_cache
+from backend.funcs.signal_tiles import tile_cache
+from backend.funcs.bigwig_pool import bigwig_pool
+from backend.funcs.gene_index import gene_index
+from backend.funcs.arrow import wants_arrow, arrow_response, cell_metadata_ipc, umap_ipc, expr_ipc, columns_ipc
+from backend.funcs.compression import precompressed_response
+from backend.funcs.http_cache import dataset_etag, get_dataset_version
 
 router = APIRouter()
 
@@ -13,6 +22,27 @@ async def read_root():
     return {"Message": "Hello API."}
 
 
+@router.get("/getcachestats")
+async def getcachestats():
+    return {
+        "artifacts": artifact_cache.stats(),
+        "signal_tiles": tile_cache.stats(),
+        "bigwig_handles": bigwig_pool.stats(),
+        "executor": executor_stats(),
+        "gene_index": gene_index.stats(),
+    }
+
+
+@router.get("/getdatasetversion")
+async def getdatasetversion(request: Request):
+    ## content version of a dataset, pass it as ?v= to make its cached responses immutable
+    dataset_id = request.query_params.get("dataset")
+    version = get_dataset_version(dataset_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Error: Dataset not found.")
+    return {"dataset": dataset_id, "version": version}
+
+
 @router.get("/gethomedata")
 async def gethomedata(session: SessionDep):
     print("gethomedata() called================")
@@ -28,21 +58,69 @@ async def getgenelist(request: Request):
     print("getgenelist() called================")
     dataset_id = request.query_params.get("dataset")
     query_str = request.query_params.get("query_str")
-
-    response = get_gene_list(dataset_id, query_str)
+    ## optional: mode=prefix (default), substring or fuzzy, and at most `limit` matches
+    mode = request.query_params.get("mode", "prefix")
+    limit = request.query_params.get("limit")
+    try:
+        limit = int(limit) if limit else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+
+    response = await run_blocking("getgenelist", get_gene_list, dataset_id, query_str, mode, limit)
     # print (response)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting gene list.")
     return response
 
 
+@router.get("/searchgenes")
+async def searchgenes(request: Request):
+    ## genes of all datasets matching query_str, each with the datasets that contain it
+    print("searchgenes() called================")
+    query_str = request.query_params.get("query_str", "")
+    mode = request.query_params.get("mode", "prefix")
+    limit = request.query_params.get("limit")
+    try:
+        limit = int(limit) if limit else 100
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+
+    response = await run_blocking("searchgenes", search_global_genes, query_str, mode, limit)
+    if "Error" in response:
+        raise HTTPException(status_code=404, detail=response)
+    return response
+
+
+@router.get("/getgenedatasets")
+async def getgenedatasets(request: Request):
+    ## which datasets contain gene[] (expression / pseudobulk / qtl flags), in one lookup
+    print("getgenedatasets() called================")
+    genes = request.query_params.getlist("genes[]") or request.query_params.getlist("gene")
+
+    response = await run_blocking("getgenedatasets", get_gene_datasets, genes)
+    return response
+
+
 @router.get("/getsamplelist")
 async def getsamplelist(request: Request):
     print("getsamplelist() called================")
     dataset_id = request.query_params.get("dataset")
     query_str = request.query_params.get("query_str")
-
-    response = get_sample_list(dataset_id, query_str)
+    ## optional: mode=prefix (default), substring or fuzzy, and at most `limit` matches
+    mode = request.query_params.get("mode", "prefix")
+    limit = request.query_params.get("limit")
+    try:
+        limit = int(limit) if limit else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+
+    response = await run_blocking("getsamplelist", get_sample_list, dataset_id, query_str, mode, limit)
     # print (response)
     if "Error" in response:
         return {"success": False, "message": "Error in getting sample list."}
@@ -50,12 +128,22 @@ async def getsamplelist(request: Request):
 
 
 @router.get("/getmetalist")
+@dataset_etag()
 async def getmetalist(request: Request):
     print("getmetalist() called================")
     dataset_id = request.query_params.get("dataset")
     query_str = request.query_params.get("query_str")
-
-    response = get_meta_list(dataset_id, query_str)
+    ## optional: mode=prefix (default), substring or fuzzy, and at most `limit` matches
+    mode = request.query_params.get("mode", "prefix")
+    limit = request.query_params.get("limit")
+    try:
+        limit = int(limit) if limit else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+
+    response = await run_blocking("getmetalist", get_meta_list, dataset_id, query_str, mode, limit)
     # print (response)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting Meta list.")
@@ -67,7 +155,7 @@ async def getmainclusterinfo(request: Request):
     print("getmainclusterinfo() called================")
     dataset_id = request.query_params.get("dataset")
 
-    response = get_config_info(dataset_id)
+    response = await run_blocking("getmainclusterinfo", get_config_info, dataset_id)
     # print (response)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting main cluster info.")
@@ -80,11 +168,12 @@ async def getmainclusterinfo(request: Request):
 
 
 @router.get("/getclusterlist")
+@dataset_etag()
 async def getclusterlist(request: Request):
     print("getclusterlist() called================")
     dataset_id = request.query_params.get("dataset")
 
-    response = get_cluster_list(dataset_id)
+    response = await run_blocking("getclusterlist", get_cluster_list, dataset_id)
     # print (response)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting cluster list.")
@@ -96,7 +185,7 @@ async def getcellcounts(request: Request):
     print("getcellcounts() called================")
     dataset_id = request.query_params.get("dataset")
 
-    response = get_celltype_counts(dataset_id)
+    response = await run_blocking("getcellcounts", get_celltype_counts, dataset_id)
     # print (response)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting celltype list.")
@@ -104,11 +193,12 @@ async def getcellcounts(request: Request):
 
 
 @router.get("/getmarkergenes")
+@dataset_etag()
 async def getmarkergenes(request: Request):
     print("getmarkergenes() called================")
     dataset_id = request.query_params.get("dataset")
 
-    response = get_marker_genes(dataset_id)
+    response = await run_blocking("getmarkergenes", get_marker_genes, dataset_id)
     # print (response)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting gene markers.")
@@ -121,7 +211,7 @@ async def getdegsofcluster(request: Request):
     cluster = request.query_params.get("cluster")
     print(f"getdegsofcluster({dataset_id},{cluster}) called================")
 
-    response = get_degs_pseudobulk(dataset_id, cluster)
+    response = await run_blocking("getdegsofcluster", get_degs_pseudobulk, dataset_id, cluster)
     # response = get_degs_celllevel(dataset_id, celltype)
     # print (response)
     if "Error" in response:
@@ -130,28 +220,100 @@ async def getdegsofcluster(request: Request):
 
 
 @router.get("/getumapembedding")
+@dataset_etag()
 async def getumapembedding(request: Request):
     print("getumapembedding() called================")
     dataset_id = request.query_params.get("dataset")
 
-    response = get_umapembedding(dataset_id)
+    ## layout=index: aligned arrays {"cell", "x", "y"}, cells as int positions (cs_ids from /getcellids)
+    layout = request.query_params.get("layout", "rows")
+
+    ## runs in a worker process, the response comes back JSON-encoded (or as Arrow, format=arrow)
+    arrow = wants_arrow(request)
+    encode = {"encode": columns_ipc if layout == "index" else umap_ipc} if arrow else {}
+    response = await run_encoded("getumapembedding", get_umapembedding, dataset_id, layout, **encode)
     # print (response)
-    if "Error" in response:
+    if isinstance(response, str) and "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting Meta list.")
+    return arrow_response(response) if arrow else encoded_response(response)
+
+
+@router.get("/getumaptiles")
+@dataset_etag()
+async def getumaptiles(request: Request):
+    print("getumaptiles() called================")
+    dataset_id = request.query_params.get("dataset")
+    ## viewport x0, y0, x1, y1 in UMAP coordinates (default: the whole embedding), and the level of
+    ## detail (default: from the viewport size)
+    bbox = [request.query_params.get(key) for key in ("x0", "y0", "x1", "y1")]
+    level = request.query_params.get("level")
+    try:
+        bbox = [float(value) if value else None for value in bbox]
+        level = int(level) if level else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid viewport or level.")
+    ## layout=index: points as int cell positions instead of cs_ids
+    layout = request.query_params.get("layout", "columns")
+
+    response = await run_blocking("getumaptiles", get_umap_tile_data, dataset_id, *bbox, level, layout)
+    if isinstance(response, str) and "Error" in response:
+        raise HTTPException(status_code=404, detail="Error in getting UMAP tiles.")
     return response
 
 
 @router.get("/getexprdata")
+@dataset_etag()
 async def getexprdata(request: Request):
     print("getgeneexprdata() called================")
     dataset_id = request.query_params.get("dataset")
     gene = request.query_params.get("gene")
-
-    response = get_expr_data(dataset_id, gene)
+    ## layout=index: {"cell", "value"} arrays, cells as int positions (cs_ids from /getcellids)
+    layout = request.query_params.get("layout", "dict")
+    ## subset=umap: {"value"} dense array aligned with getumapembedding (zeros included),
+    ## or cells[]=<int positions> for the values of those cells
+    subset = request.query_params.get("subset")
+    try:
+        cells = [int(cell) for cell in request.query_params.getlist("cells[]")] or None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cell index.")
+
+    ## runs in a worker process, the response comes back JSON-encoded (or as Arrow, format=arrow)
+    arrow = wants_arrow(request)
+    columns = layout == "index" or subset is not None or cells is not None
+    encode = {"encode": columns_ipc if columns else expr_ipc} if arrow else {}
+    response = await run_encoded("getexprdata", get_expr_data, dataset_id, gene, layout, subset, cells, **encode)
     # print (response)
-    if "Error" in response:
+    if isinstance(response, str) and "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting expression data.")
-    return response
+    return arrow_response(response) if arrow else encoded_response(response)
+
+
+@router.get("/getbatchexprdata")
+@dataset_etag()
+async def getbatchexprdata(request: Request):
+    ## several genes in one response (see get_batch_expr_data): genes[]=..., level=cell|pseudobulk,
+    ## subset=umap or cells[]=<positions> for dense values, group_by=cluster|condition|<column> for
+    ## per-group mean and % expressing instead of values
+    dataset_id = request.query_params.get("dataset")
+    genes = request.query_params.getlist("genes[]")
+    level = request.query_params.get("level", "cell")
+    subset = request.query_params.get("subset")
+    group_by = request.query_params.get("group_by")
+    print(f"getbatchexprdata({dataset_id}, {len(genes)} genes) called================")
+    try:
+        cells = [int(cell) for cell in request.query_params.getlist("cells[]")] or None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cell index.")
+    if len(genes) > settings.batch_genes_max:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_genes_max} genes per request.")
+
+    ## runs in a worker process, the response comes back JSON-encoded
+    response = await run_encoded(
+        "getbatchexprdata", get_batch_expr_data, dataset_id, genes, level, subset, cells, group_by
+    )
+    if isinstance(response, str) and "Error" in response:
+        raise HTTPException(status_code=404, detail=response)
+    return encoded_response(response)
 
 
 @router.get("/getpseudoexprdata")
@@ -160,7 +322,7 @@ async def getpseudoexprdata(request: Request):
     dataset_id = request.query_params.get("dataset")
     gene = request.query_params.get("gene")
 
-    response = get_pseudoexpr_data(dataset_id, gene)
+    response = await run_blocking("getpseudoexprdata", get_pseudoexpr_data, dataset_id, gene)
     # print (response)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting expression data.")
@@ -168,18 +330,71 @@ async def getpseudoexprdata(request: Request):
 
 
 @router.get("/getallmetadata")
+@dataset_etag("dataset_id")
 async def getallmetadata(request: Request):
     dataset = request.query_params.get("dataset_id")
     cols = request.query_params.getlist("cols[]")
     rows = request.query_params.getlist("rows[]")
     print(f"getallmetadata({dataset},{cols},{rows}) called================")
 
-    metadata = get_all_metadata(dataset, cols=cols, rows=rows)
+    ## format=arrow returns only the cell table (cs_id + columns), the mappings and sample
+    ## metadata come from /getmetadatamapping
+    if wants_arrow(request):
+        metadata = await run_encoded(
+            "getallmetadata", get_cell_metadata_table, dataset, cols=cols, rows=rows, encode=cell_metadata_ipc
+        )
+        if isinstance(metadata, str) and "Error" in metadata:
+            raise HTTPException(status_code=404, detail=metadata)
+        return arrow_response(metadata)
+
+    ## layout=index: columns aligned with int cell positions instead of cs_id rows
+    layout = request.query_params.get("layout", "split")
+
+    ## runs in a worker process, the response comes back JSON-encoded
+    metadata = await run_encoded("getallmetadata", get_all_metadata, dataset, cols=cols, rows=rows, layout=layout)
 
-    if "Error" in metadata:
+    if isinstance(metadata, str) and "Error" in metadata:
         raise HTTPException(status_code=404, detail=metadata)
 
-    return metadata
+    return encoded_response(metadata)
+
+
+@router.get("/getcellids")
+@dataset_etag()
+async def getcellids(request: Request):
+    ## lookup table of the layout=index responses: cs_id of each cell position
+    dataset_id = request.query_params.get("dataset")
+    print(f"getcellids({dataset_id}) called================")
+
+    response = await run_encoded("getcellids", get_cell_ids, dataset_id)
+    if isinstance(response, str) and "Error" in response:
+        raise HTTPException(status_code=404, detail=response)
+    return encoded_response(response)
+
+
+@router.get("/getmetadatamapping")
+async def getmetadatamapping(request: Request):
+    dataset = request.query_params.get("dataset_id")
+    print(f"getmetadatamapping({dataset}) called================")
+
+    cell_metadata_mapping = await run_blocking("getmetadatamapping", get_metadata_mapping, dataset)
+    sample_metadata = await run_blocking("getmetadatamapping", get_sample_metadata, dataset)
+    return {"cell_metadata_mapping": cell_metadata_mapping, "sample_metadata": sample_metadata}
+
+
+@router.get("/getdatasetfile")
+@dataset_etag()
+async def getdatasetfile(request: Request):
+    ## raw dataset file (e.g. umap_embeddings_50k.csv), served from its precompressed copy if there is one
+    dataset_id = request.query_params.get("dataset")
+    file_name = request.query_params.get("file", "")
+    gene = request.query_params.get("gene", "")
+    print(f"getdatasetfile({dataset_id},{file_name}{gene}) called================")
+
+    file_path = get_dataset_file_path(dataset_id, file_name, gene)
+    if "Error" in file_path:
+        raise HTTPException(status_code=404, detail=file_path)
+    return precompressed_response(file_path, request.headers.get("accept-encoding", ""))
 
 
 @router.get("/getallsamplemetadata")
@@ -187,7 +402,7 @@ async def getallsamplemetadata(request: Request):
     print("getallsamplemetadata() called================")
     dataset_id = request.query_params.get("dataset")
 
-    response = get_sample_metadata(dataset_id)
+    response = await run_blocking("getallsamplemetadata", get_sample_metadata, dataset_id)
     # print (response)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting sample metadata.")
@@ -200,7 +415,7 @@ async def getmetadataofsample(request: Request):
     dataset_id = request.query_params.get("dataset")
     sample = request.query_params.get("sample")
 
-    response = get_metadata_of_sample(dataset_id, sample)
+    response = await run_blocking("getmetadataofsample", get_metadata_of_sample, dataset_id, sample)
     # print (response)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting sample metadata.")
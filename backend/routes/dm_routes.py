@@ -14,6 +14,11 @@ from sqlmodel import Session
 
 from backend.db import get_session
 from backend.db_utils.crud import insert_study, insert_dataset, import_sample_sheet, delete_dataset
+from backend.funcs.cache import artifact_cache
+from backend.funcs.bigwig_pool import bigwig_pool
+from backend.funcs.executor import reset_process_pool
+from backend.funcs.http_cache import update_dataset_version, remove_dataset_version
+from backend.funcs.gene_index import gene_index
 from backend.models import Study, Dataset
 
 router = APIRouter()
@@ -131,6 +136,15 @@ async def extractdata(data: SubmissionData, session: Session = Depends(get_sessi
     with open(f"{dataset_path}/dataset_info.toml", 'w') as f:
         toml.dump(config, f)
 
+    ## drop cached files of a previous upload with the same name
+    artifact_cache.invalidate(dataset_name)
+    bigwig_pool.invalidate(dataset_name)
+    reset_process_pool()
+    ## the processing scripts record a new version when they finish
+    remove_dataset_version(dataset_name)
+    ## (re-)add to the global gene index; rescanned again once processing changes its files
+    gene_index.update_dataset(dataset_name)
+
     study_dict["study_id"] = study_dict["study_name"]
     study = Study(**study_dict)
 
@@ -252,6 +266,9 @@ async def preparemetafeatures(data: MetaFeatureData, session: Session = Depends(
 
     with open(f"{dataset_path}/dataset_info.toml", 'w') as f:
         toml.dump(dataset_info, f)
+    artifact_cache.invalidate(dataset)
+    reset_process_pool()
+    remove_dataset_version(dataset)
 
     ## process meta data
     print("=======process meta data==========")
@@ -313,6 +330,10 @@ def check_toml_file(toml_data):
 @router.get("/refreshdatabase")
 async def refreshdatabase(session: Session = Depends(get_session)):
     try:
+        artifact_cache.invalidate()
+        bigwig_pool.invalidate()
+        reset_process_pool()
+
         ## loop through all datasets
         for dataset_i in os.listdir("backend/datasets"):
             dataset_path = f"backend/datasets/{dataset_i}"
@@ -349,6 +370,10 @@ async def refreshdatabase(session: Session = Depends(get_session)):
                 shutil.copyfile(sample_sheet_path, f"{dataset_path}/{dataset_dict['sample_sheet']}")
                 import_sample_sheet(sample_sheet_path, session)
 
+            ## record the current files as the dataset's content version (ETags of its responses)
+            update_dataset_version(dataset_i)
+
+        gene_index.reset()
         return {"message": "Database refreshed successfully", "success": True}
     except Exception as e:
         return {"message": "Error: " + str(e), "success": False}
@@ -360,6 +385,10 @@ async def deletedataset(dataset: str = Query(...),session: Session = Depends(get
         ## remove records from database
         print(f"=======deleting dataset: {dataset}==========")
         if delete_dataset(dataset, session):
+            artifact_cache.invalidate(dataset)
+            bigwig_pool.invalidate(dataset)
+            reset_process_pool()
+            gene_index.remove_dataset(dataset)
             print(f"======= remoing data folder==========")
             # dataset_path = f"backend/datasets/{dataset}"
             # shutil.rmtree(dataset_path)
@@ -1,3 +1,4 @@
+import polars as pl
 from fastapi import APIRouter, HTTPException
 from fastapi import Request
 
@@ -19,6 +20,8 @@ from backend.funcs.get_data import (
     get_snp_locations_in_chromosome,
     get_gwas_in_chromosome,
 )
+from backend.funcs.executor import run_blocking, render_json
+from backend.funcs.arrow import wants_arrow, arrow_response, columns_ipc
 
 router = APIRouter()
 
@@ -34,7 +37,7 @@ async def getgenelocation(request: Request):
     dataset_id = request.query_params.get("dataset")
     gene = request.query_params.get("gene")
 
-    response = get_gene_location(dataset_id, gene)
+    response = await run_blocking("getgenelocation", get_gene_location, dataset_id, gene)
 
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting gene location.")
@@ -47,7 +50,7 @@ async def getsnplocation(request: Request):
     dataset_id = request.query_params.get("dataset")
     snp = request.query_params.get("snp")
 
-    response = get_snp_location(dataset_id, snp)
+    response = await run_blocking("getsnplocation", get_snp_location, dataset_id, snp)
 
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting SNP location.")
@@ -65,11 +68,11 @@ async def getgenelocationsinchromosome(request: Request):
     start = int(start) if start else None
     end = int(end) if end else None
 
-    response = get_gene_locations_in_chromosome(dataset_id, chromosome, start, end)
+    response = await run_blocking("getgenelocationsinchromosome", get_gene_locations_in_chromosome, dataset_id, chromosome, start, end)
 
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting gene locations.")
-    return response
+    return await render_json("getgenelocationsinchromosome", response)
 
 
 @router.get("/getsnplocationsinchromosome")
@@ -83,11 +86,19 @@ async def getsnplocationsinchromosome(request: Request):
     start = int(start) if start else None
     end = int(end) if end else None
 
-    response = get_snp_locations_in_chromosome(dataset_id, chromosome, start, end)
+    response = await run_blocking("getsnplocationsinchromosome", get_snp_locations_in_chromosome, dataset_id, chromosome, start, end)
 
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting SNP locations.")
-    return response
+    if isinstance(response, str):
+        ## no SNPs in the region: the message as JSON, an empty table of the same columns as Arrow
+        if wants_arrow(request):
+            empty = {"snp_id": pl.Series(dtype=pl.String), "position": pl.Series(dtype=pl.Int64)}
+            return arrow_response(columns_ipc(empty))
+        return response
+    if wants_arrow(request):
+        return arrow_response(await run_blocking("getsnplocationsinchromosome", columns_ipc, response))
+    return await render_json("getsnplocationsinchromosome", response)
 
 
 @router.get("/getgwasinchromosome")
@@ -100,14 +111,17 @@ async def getgwasinchromosome(request: Request):
 
     start = int(start) if start else None
     end = int(end) if end else None
+    ## optional: cap the number of points for zoomed-out views, see get_gwas_in_chromosome
+    max_points = request.query_params.get("max_points")
+    max_points = int(max_points) if max_points else None
 
-    response = get_gwas_in_chromosome(dataset_id, chromosome, start, end)
+    response = await run_blocking("getgwasinchromosome", get_gwas_in_chromosome, dataset_id, chromosome, start, end, max_points)
 
     if "Error" in response:
         if "Chromosome file not found" in response:
             return {"hasGwas": False, "data": []}
         # raise HTTPException(status_code=404, detail="Error in getting GWAS data.")
-    return {"hasGwas": True, "data": response}
+    return await render_json("getgwasinchromosome", {"hasGwas": True, "data": response})
 
 
 @router.get("/getgenechromosome")
@@ -116,7 +130,7 @@ async def getgenechromosome(request: Request):
     dataset_id = request.query_params.get("dataset")
     gene = request.query_params.get("gene")
 
-    response = get_gene_chromosome(dataset_id, gene)
+    response = await run_blocking("getgenechromosome", get_gene_chromosome, dataset_id, gene)
 
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting gene chromosome.")
@@ -129,7 +143,7 @@ async def getsnpchromosome(request: Request):
     dataset_id = request.query_params.get("dataset")
     snp = request.query_params.get("snp")
 
-    response = get_snp_chromosome(dataset_id, snp)
+    response = await run_blocking("getsnpchromosome", get_snp_chromosome, dataset_id, snp)
 
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting SNP chromosome.")
@@ -141,8 +155,17 @@ async def getgenelist(request: Request):
     print("getgenelist() called================")
     dataset_id = request.query_params.get("dataset")
     query_str = request.query_params.get("query_str")
-
-    response = get_qtl_gene_list(dataset_id, query_str)
+    ## optional: mode=prefix (default), substring or fuzzy, and at most `limit` matches
+    mode = request.query_params.get("mode", "prefix")
+    limit = request.query_params.get("limit")
+    try:
+        limit = int(limit) if limit else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+
+    response = await run_blocking("getgenelist", get_qtl_gene_list, dataset_id, query_str, mode, limit)
 
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting gene list.")
@@ -154,8 +177,17 @@ async def getsnplist(request: Request):
     print("getsnplist() called================")
     dataset_id = request.query_params.get("dataset")
     query_str = request.query_params.get("query_str")
-
-    response = get_qtl_snp_list(dataset_id, query_str)
+    ## optional: mode=prefix (default), substring or fuzzy, and at most `limit` matches
+    mode = request.query_params.get("mode", "prefix")
+    limit = request.query_params.get("limit")
+    try:
+        limit = int(limit) if limit else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="Invalid limit.")
+
+    response = await run_blocking("getsnplist", get_qtl_snp_list, dataset_id, query_str, mode, limit)
 
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting SNP list.")
@@ -168,7 +200,7 @@ async def getgenecelltypes(request: Request):
     dataset_id = request.query_params.get("dataset")
     gene = request.query_params.get("gene")
 
-    response = get_gene_celltypes(dataset_id, gene)
+    response = await run_blocking("getgenecelltypes", get_gene_celltypes, dataset_id, gene)
     if "Error" in response:
         raise HTTPException(
             status_code=404, detail="Error in getting cell types for gene."
@@ -182,7 +214,7 @@ async def getsnpcelltypes(request: Request):
     dataset_id = request.query_params.get("dataset")
     snp = request.query_params.get("snp")
 
-    response = get_snp_celltypes(dataset_id, snp)
+    response = await run_blocking("getsnpcelltypes", get_snp_celltypes, dataset_id, snp)
     if "Error" in response:
         raise HTTPException(
             status_code=404, detail="Error in getting cell types for SNP."
@@ -197,7 +229,7 @@ async def getsnpdataforgene(request: Request):
     gene = request.query_params.get("gene")
     celltype = request.query_params.get("celltype")
 
-    response = get_snp_data_for_gene(dataset_id, gene, celltype)
+    response = await run_blocking("getsnpdataforgene", get_snp_data_for_gene, dataset_id, gene, celltype)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting SNP data.")
     return response
@@ -210,7 +242,7 @@ async def getgenedataforsnp(request: Request):
     snp = request.query_params.get("snp")
     celltype = request.query_params.get("celltype")
 
-    response = get_gene_data_for_snp(dataset_id, snp, celltype)
+    response = await run_blocking("getgenedataforsnp", get_gene_data_for_snp, dataset_id, snp, celltype)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting gene data.")
     return response
@@ -7,10 +7,13 @@ from fastapi import Request
 from backend.funcs.get_data import (
     get_bw_data_exists,
     get_region_signal_data,
+    get_multi_region_signal_data,
     get_celltype_list,
     get_gene_locations_in_chromosome,
     get_gwas_in_chromosome,
 )
+from backend.funcs.executor import run_blocking, render_json
+from backend.funcs.arrow import wants_arrow, arrow_response, columns_ipc
 
 router = APIRouter()
 
@@ -23,7 +26,7 @@ async def read_root():
 @router.get("/getbwdataexists")
 async def getbwdataexists(request: Request):
     dataset_id = request.query_params.get("dataset")
-    exists = get_bw_data_exists(dataset_id)
+    exists = await run_blocking("getbwdataexists", get_bw_data_exists, dataset_id)
     return {"hasBWData": exists}
 
 @router.get("/getregionsignaldata")
@@ -34,11 +37,14 @@ async def getregionsignaldata(request: Request):
     end = int(request.query_params.get("end"))
     celltype = request.query_params.get("celltype")
     bin_size = int(request.query_params.get("binsize", 1))
+    ## encoding=rle returns {"start", "end", "value"} runs instead of per-base positions
+    rle = request.query_params.get("encoding", "") == "rle"
 
     print(f"getregionsignaldata() called with bin size {bin_size}================")
 
-    response = get_region_signal_data(
-        dataset_id, chromosome, start, end, celltype, bin_size
+    response = await run_blocking(
+        "getregionsignaldata", get_region_signal_data,
+        dataset_id, chromosome, start, end, celltype, bin_size, rle
     )
 
     if "Error" in response:
@@ -46,7 +52,39 @@ async def getregionsignaldata(request: Request):
         if "BigWig folder not found" in response:
             return {"hasBWData": False, "message": response}
         raise HTTPException(status_code=404, detail="Error in getting signal data")
-    return {"hasBWData": True, "data": response}
+    ## format=arrow returns the data columns only; a missing bigwig folder still answers in JSON
+    if wants_arrow(request):
+        return arrow_response(await run_blocking("getregionsignaldata", columns_ipc, response))
+    return await render_json("getregionsignaldata", {"hasBWData": True, "data": response})
+
+
+@router.get("/getmultiregionsignaldata")
+async def getmultiregionsignaldata(request: Request):
+    dataset_id = request.query_params.get("dataset")
+    chromosome = request.query_params.get("chromosome")
+    start = int(request.query_params.get("start"))
+    end = int(request.query_params.get("end"))
+    celltypes = request.query_params.getlist("celltypes[]")
+    bin_size = int(request.query_params.get("binsize", 1))
+    rle = request.query_params.get("encoding", "") == "rle"
+
+    print(f"getmultiregionsignaldata() called for {len(celltypes)} cell types with bin size {bin_size}================")
+
+    response = await run_blocking(
+        "getmultiregionsignaldata", get_multi_region_signal_data,
+        dataset_id, chromosome, start, end, celltypes, bin_size, rle
+    )
+
+    if isinstance(response, str):
+        print(response)
+        if "BigWig folder not found" in response:
+            return {"hasBWData": False, "message": response}
+        raise HTTPException(status_code=404, detail="Error in getting signal data")
+
+    ## failed tracks are reported separately, the others are still returned
+    errors = {c: track for c, track in response.items() if isinstance(track, str)}
+    data = {c: track for c, track in response.items() if not isinstance(track, str)}
+    return await render_json("getmultiregionsignaldata", {"hasBWData": True, "data": data, "errors": errors})
 
 
 @router.get("/getcelltypelist")
@@ -55,7 +93,7 @@ async def getcelltypelist(request: Request):
 
     dataset_id = request.query_params.get("dataset")
 
-    response = get_celltype_list(dataset_id)
+    response = await run_blocking("getcelltypelist", get_celltype_list, dataset_id)
 
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting cell type list")
@@ -73,12 +111,12 @@ async def getgenelocationsinchromosome(request: Request):
     start = int(start) if start else None
     end = int(end) if end else None
 
-    response = get_gene_locations_in_chromosome(dataset_id, chromosome, start, end)
+    response = await run_blocking("getgenelocationsinchromosome", get_gene_locations_in_chromosome, dataset_id, chromosome, start, end)
 
     if "Error" in response:
         print(response)
         raise HTTPException(status_code=404, detail="Error in getting gene locations.")
-    return response
+    return await render_json("getgenelocationsinchromosome", response)
 
 
 @router.get("/getgwasinchromosome")
@@ -91,9 +129,12 @@ async def getgwasinchromosome(request: Request):
 
     start = int(start) if start else None
     end = int(end) if end else None
+    ## optional: cap the number of points for zoomed-out views, see get_gwas_in_chromosome
+    max_points = request.query_params.get("max_points")
+    max_points = int(max_points) if max_points else None
 
-    response = get_gwas_in_chromosome(dataset_id, chromosome, start, end)
+    response = await run_blocking("getgwasinchromosome", get_gwas_in_chromosome, dataset_id, chromosome, start, end, max_points)
 
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting GWAS data.")
-    return response
+    return await render_json("getgwasinchromosome", response)
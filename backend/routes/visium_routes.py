@@ -6,6 +6,8 @@ from fastapi.responses import JSONResponse, FileResponse
 from backend.db import SessionDep
 from backend.db_utils.crud import *
 from backend.funcs.get_data import *
+from backend.funcs.executor import run_blocking
+from backend.funcs.http_cache import dataset_etag
 
 import os
 
@@ -21,7 +23,7 @@ async def getcoordinates(request:Request):
     print("getcoordinates() called================")
     dataset_id = request.query_params.get("dataset")
     sample = request.query_params.get("sample")
-    results = get_visium_coordinates(dataset_id, sample)
+    results = await run_blocking("getcoordinates", get_visium_coordinates, dataset_id, sample)
 
     # if "Error" in results:
     #     raise HTTPException(status_code=404, detail="Error in getting coordinates.")
@@ -31,6 +33,7 @@ async def getcoordinates(request:Request):
 
 
 @router.get("/getimage")
+@dataset_etag()
 async def getimage(request: Request):
     print("getimage() called================")
     dataset_id = request.query_params.get("dataset")
@@ -77,7 +80,7 @@ async def getvisiumdefaults(request:Request):
     print("getvisiumdefaults() called================")
     dataset_id = request.query_params.get("dataset")
 
-    response = get_spatial_defaults(dataset_id)
+    response = await run_blocking("getvisiumdefaults", get_spatial_defaults, dataset_id)
     # print (response)
     if "Error" in response:
         raise HTTPException(status_code=404, detail="Error in getting visium defaults.")
@@ -5,6 +5,50 @@ class Settings(BaseSettings):
     uvicorn_host: str = "0.0.0.0"
     debug: bool = False
 
+    ## memory budget of the parsed dataset file cache (backend/funcs/cache.py)
+    artifact_cache_mb: int = 512
+    ## threads reading bigwig tracks for multi-celltype signal requests
+    signal_threads: int = 8
+    ## memory budget of the binned bigwig tile cache (backend/funcs/signal_tiles.py)
+    signal_tile_cache_mb: int = 128
+    ## open pyBigWig handles in total / per file (backend/funcs/bigwig_pool.py)
+    bigwig_max_handles: int = 256
+    bigwig_readers_per_file: int = 4
+
+    ## thread pool running the blocking data loaders of the routes (backend/funcs/executor.py)
+    io_threads: int = 16
+    ## worker processes for the whole-dataset endpoints (metadata, UMAP, expression); 0 runs them on the threads.
+    ## Workers are spawned, so a script serving the app must guard its entry point with if __name__ == "__main__"
+    process_workers: int = 2
+    ## artifact cache budget of each worker process: the cached files of the app can take up to
+    ## artifact_cache_mb + process_workers * process_cache_mb. Worker caches are not included in
+    ## /api/getcachestats and are dropped whenever datasets are changed through /datasetmanage
+    process_cache_mb: int = 256
+    ## concurrent requests per endpoint, and lower limits for the heavy full-dataset endpoints
+    endpoint_concurrency: int = 8
+    endpoint_limits: dict[str, int] = {
+        "getallmetadata": 2,
+        "getumapembedding": 4,
+        "getallsamplemetadata": 4,
+        "getmultiregionsignaldata": 4,
+        "getgwasinchromosome": 4,
+        "getbatchexprdata": 4,
+    }
+
+    ## response compression (backend/funcs/compression.py): smallest body worth compressing, and
+    ## levels per encoding (gzip 1 shrinks the JSON responses ~70% at ~10 ms per MB);
+    ## br and zstd are used only when the brotli / zstandard packages are installed
+    compression_min_size: int = 1024
+    compression_levels: dict[str, int] = {"gzip": 1, "br": 4, "zstd": 3}
+    ## browser/proxy cache lifetime (seconds) of per-dataset responses, revalidated by ETag afterwards
+    ## (backend/funcs/http_cache.py); requests pinned with ?v=<dataset version> are cached for a year
+    dataset_cache_max_age: int = 3600
+    ## batch expression requests (/api/getbatchexprdata): most genes per request, threads reading them
+    batch_genes_max: int = 50
+    expr_threads: int = 8
+    ## how often (seconds) the global gene index stats the dataset version files for changes (backend/funcs/gene_index.py)
+    gene_index_check_seconds: int = 30
+
     class Config:
         env_file = ".env"  # 可选：已手动 load_dotenv 也可以省略
 
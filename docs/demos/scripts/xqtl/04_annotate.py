@@ -343,6 +343,37 @@ for i, (snp, data) in enumerate(snp_to_regions.items(), 1):
             else "ETA: Calculating..."
         )
 
+# Sorted SNP position index, lets the backend fill SNP positions with one lookup instead of opening SNP JSONs
+print("\nWriting SNP index...")
+snp_index_df = pd.DataFrame(
+    [(snp, data["chromosome"], data["position"]) for snp, data in snp_info_map.items()],
+    columns=["snp_id", "chromosome", "position"],
+).sort_values("snp_id")
+snp_index_df.to_parquet(f"{dataset_name}/snp_index.parquet", index=False)
+print(f"  - {len(snp_index_df):,} SNPs")
+
+# Gene annotation table, lets the backend annotate target genes with one join instead of opening gene JSONs
+print("Writing gene index...")
+gene_index_df = pd.DataFrame(
+    [
+        (gene, data["chromosome"], data["position_start"], data["position_end"], data["strand"])
+        for gene, data in gene_info_map.items()
+    ],
+    columns=["gene_id", "chromosome", "position_start", "position_end", "strand"],
+)
+gene_index_df.to_parquet(f"{dataset_name}/gene_index.parquet", index=False)
+print(f"  - {len(gene_index_df):,} genes")
+
+# Flag significant SNPs (those in snp_list.json) in snp_locations, so region queries
+# in the backend can filter on the column instead of checking every SNP against the list
+print("Flagging significant SNPs in snp_locations...")
+significant_snps = set(snp_ids)
+for filepath in glob(dataset_name + "/snp_locations/*.tsv"):
+    df = pd.read_csv(filepath, sep="\t")
+    df["is_significant"] = df["snp_id"].isin(significant_snps)
+    df.to_csv(filepath, sep="\t", index=False)
+    print(f"  - {Path(filepath).stem}: {df['is_significant'].sum():,} significant SNPs")
+
 # Write lists
 Path(f"{dataset_name}/gene_list.json").write_text(json.dumps(gene_ids, separators=(",", ":")))
 Path(f"{dataset_name}/snp_list.json").write_text(json.dumps(snp_ids, separators=(",", ":")))
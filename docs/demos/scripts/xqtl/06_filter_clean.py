@@ -46,6 +46,7 @@ output_dir = Path(f"{dataset_name}/gene_locations")
 output_dir.mkdir(exist_ok=True)
 
 print("Writing gene location parquet files...")
+gene_index_dfs = []
 for chrom, entries in chrom_data.items():
     df = pd.DataFrame(entries)
     df.drop_duplicates(
@@ -54,6 +55,20 @@ for chrom, entries in chrom_data.items():
     out_path = output_dir / f"{chrom}.parquet"
     df.to_parquet(out_path, index=False)
     print(f"  - {chrom}: {len(df):,} entries")
+    gene_index_dfs.append(df.assign(chromosome=chrom))
+
+# Gene annotation table used by the backend to annotate target genes/regions with one join.
+# 04_annotate.py already writes it with real strands, only build it here for datasets without one
+gene_index_path = f"{dataset_name}/gene_index.parquet"
+if os.path.exists(gene_index_path):
+    print("Gene index written by 04_annotate.py, keeping it")
+elif not gene_index_dfs:
+    print("No chr-start-end gene IDs found, skipping gene index")
+else:
+    print("Writing gene index...")
+    gene_index_df = pd.concat(gene_index_dfs)
+    gene_index_df = gene_index_df[["gene_id", "chromosome", "position_start", "position_end", "strand"]]
+    gene_index_df.to_parquet(gene_index_path, index=False)
 
 print("Remove unuseful files...")
 ## remove filtered_celltypes folder
@@ -1,4 +1,4 @@
-import pandas as pd
+import polars as pl
 import os
 
 dataset_name = "eQTLsummary_demo"
@@ -9,16 +9,37 @@ gwas_snp_col = "rsID"
 gwas_beta_col = "b"
 gwas_pval_col = "p"
 
+## rows per parquet row group; the backend reads only the row groups whose
+## position statistics overlap the requested window
+row_group_size = 10000
+
+## zoom levels for whole-chromosome views (must match backend/funcs/gwas_levels.py):
+## every variant with p < keep_p_value, plus the lowest-p variant of each bin
+level_bin_sizes = [1000, 10000, 100000, 1000000]
+keep_p_value = 1e-5
+
 
 output_dir = f"{dataset_name}/gwas"
-process_gwas_data(input_file, output_dir)
+levels_dir = os.path.join(output_dir, "levels")
+os.makedirs(levels_dir, exist_ok=True)
+
 
-os.makedirs(output_dir, exist_ok=True)
+def reduce_gwas_level(df, bin_size):
+    significant = df.filter(pl.col("p_value") < keep_p_value)
+    binned = (
+        df.filter(pl.col("p_value") >= keep_p_value)
+        .with_columns((pl.col("position") // bin_size).alias("_bin"))
+        .sort("p_value")
+        .unique(subset="_bin", keep="first")
+        .drop("_bin")
+    )
+    return pl.concat([significant, binned]).sort("position")
 
-df = pd.read_csv(input_file, sep="\t")
+
+df = pl.read_csv(input_file, separator="\t", infer_schema_length=100000)
 
 df = df.rename(
-    columns={
+    {
         gwas_chrom_col: "chromosome",
         gwas_pos_col: "position",
         gwas_beta_col: "beta_value",
@@ -28,16 +49,21 @@ df = df.rename(
 )
 
 output_cols = ["chromosome", "snp_id", "position", "beta_value", "p_value"]
-df = df[output_cols]
-
-for chrom, group in df.groupby("chromosome"):
-    formatted_group = group.copy()
-    formatted_group["beta_value"] = formatted_group["beta_value"].map("{0:.6g}".format)
-    formatted_group["p_value"] = formatted_group["p_value"].map("{0:.6g}".format)
-    formatted_group = formatted_group.drop(columns=["chromosome"])
+df = df.select(output_cols).with_columns(
+    pl.col("position").cast(pl.Int64),
+    pl.col("beta_value").cast(pl.Float64).round_sig_figs(6),
+    pl.col("p_value").cast(pl.Float64).round_sig_figs(6),
+)
 
-    output_file = os.path.join(output_dir, f"{chrom}.tsv")
+for (chrom,), group in df.group_by("chromosome"):
+    formatted_group = group.drop("chromosome").sort("position")
 
-    formatted_group.to_csv(output_file, sep="\t", index=False, float_format="%0.6g")
+    output_file = os.path.join(output_dir, f"{chrom}.parquet")
+    formatted_group.write_parquet(output_file, statistics=True, row_group_size=row_group_size)
     print(f"Saved {len(formatted_group)} variants to {output_file}")
 
+    formatted_group = formatted_group.drop_nulls()
+    for bin_size in level_bin_sizes:
+        level = reduce_gwas_level(formatted_group, bin_size)
+        level.write_parquet(os.path.join(levels_dir, f"{chrom}.{bin_size}.parquet"))
+    print(f"Saved {len(level_bin_sizes)} zoom levels for {chrom}")
@@ -13,10 +13,11 @@ export const getHomeData = async () => {
     }
 }
 
-export const getGeneList = async (dataset,query_str) => {
+// limit and mode ("prefix", "substring" or "fuzzy") are optional
+export const getGeneList = async (dataset,query_str,limit,mode) => {
     try {
         const response = await axios.get(`${API_URL}/getgenelist`,
-            {params: {dataset:dataset,query_str:query_str}});
+            {params: {dataset:dataset,query_str:query_str,limit:limit,mode:mode}});
         return response;
     } catch (error) {
         console.error("Error getGeneList:", error);
@@ -24,10 +25,11 @@ export const getGeneList = async (dataset,query_str) => {
     }
 }
 
-export const getSampleList = async (dataset,query_str) => {
+// limit and mode ("prefix", "substring" or "fuzzy") are optional
+export const getSampleList = async (dataset,query_str,limit,mode) => {
     try {
         const response = await axios.get(`${API_URL}/getsamplelist`,
-            {params: {dataset:dataset,query_str:query_str}});
+            {params: {dataset:dataset,query_str:query_str,limit:limit,mode:mode}});
         return response;
     } catch (error) {
         console.error("Error getSampleList:", error);
@@ -35,10 +37,11 @@ export const getSampleList = async (dataset,query_str) => {
     }
 }
 
-export const getMetaList = async (dataset,query_str) => {
+// limit and mode ("prefix", "substring" or "fuzzy") are optional
+export const getMetaList = async (dataset,query_str,limit,mode) => {
     try {
         const response = await axios.get(`${API_URL}/getmetalist`,
-            {params: {dataset:dataset,query_str:query_str}});
+            {params: {dataset:dataset,query_str:query_str,limit:limit,mode:mode}});
         return response;
     } catch (error) {
         console.error("Error getMetaList:", error);
@@ -79,10 +82,11 @@ export const getCellCounts = async (dataset) => {
     }
 }
 
-export const getUMAPData = async (dataset) => {
+// layout "index": {cell, x, y} arrays with integer cell positions (cs_ids from getCellIds)
+export const getUMAPData = async (dataset, layout) => {
     try {
         const response = await axios.get(`${API_URL}/getumapembedding`,
-            {params: {dataset:dataset}});
+            {params: {dataset:dataset, layout:layout}});
         return response;
     } catch (error) {
         console.error("Error getUMAPData:", error);
@@ -90,10 +94,37 @@ export const getUMAPData = async (dataset) => {
     }
 }
 
-export const getExprData = async (dataset,gene) => {
+// cells of a UMAP viewport at a level of detail; the bounds and level are optional
+export const getUMAPTiles = async (dataset, bounds = {}, level = null) => {
+    try {
+        const params = {dataset:dataset, ...bounds};
+        if (level !== null) params.level = level;
+        const response = await axios.get(`${API_URL}/getumaptiles`,
+            {params: params});
+        return response;
+    } catch (error) {
+        console.error("Error getUMAPTiles:", error);
+        throw error;
+    }
+}
+
+// lookup table of the layout "index" responses: cs_id of each cell position
+export const getCellIds = async (dataset) => {
+    try {
+        const response = await axios.get(`${API_URL}/getcellids`,
+            {params: {dataset:dataset}});
+        return response;
+    } catch (error) {
+        console.error("Error getCellIds:", error);
+        throw error;
+    }
+}
+
+// subset "umap": {value} dense array aligned with getUMAPData (zeros included)
+export const getExprData = async (dataset,gene,layout,subset) => {
     try {
         const response = await axios.get(`${API_URL}/getexprdata`,
-            {params: {dataset:dataset,gene:gene}});
+            {params: {dataset:dataset,gene:gene,layout:layout,subset:subset}});
         return response;
     } catch (error) {
         console.error("Error getExprData:", error);
@@ -101,6 +132,19 @@ export const getExprData = async (dataset,gene) => {
     }
 }
 
+// several genes in one request; options: level ("cell"/"pseudobulk"), subset ("umap"),
+// group_by ("cluster"/"condition"/column) for per-group mean and percent expressing
+export const getBatchExprData = async (dataset, genes, options = {}) => {
+    try {
+        const response = await axios.get(`${API_URL}/getbatchexprdata`,
+            {params: {dataset:dataset, genes:genes, ...options}});
+        return response;
+    } catch (error) {
+        console.error("Error getBatchExprData:", error);
+        throw error;
+    }
+}
+
 export const getPseudoExprData = async (dataset,gene) => {
     try {
         const response = await axios.get(`${API_URL}/getpseudoexprdata`,
@@ -135,10 +179,10 @@ export const getAllSampleMetaData = async (dataset) => {
 }
 
 
-export const getAllMetaData = async (dataset_id="all", cols=["all"], rows=["all"]) => {
+export const getAllMetaData = async (dataset_id="all", cols=["all"], rows=["all"], layout) => {
     try {
         const response = await axios.get(`${API_URL}/getallmetadata`,
-            {params: {dataset_id: dataset_id, cols: cols,  rows: rows}});
+            {params: {dataset_id: dataset_id, cols: cols,  rows: rows, layout: layout}});
         return response;
     } catch (error) {
         console.error("Error getAllMetaData:", error);
@@ -27,10 +27,11 @@ export const getSnpLocation = async (dataset, snp) => {
     }
 };
 
-export const getGeneList = async (dataset, query_str) => {
+// limit and mode ("prefix", "substring" or "fuzzy") are optional
+export const getGeneList = async (dataset, query_str, limit, mode) => {
     try {
         const response = await axios.get(`${QTL_URL}/getgenelist`, {
-            params: { dataset: dataset, query_str: query_str },
+            params: { dataset: dataset, query_str: query_str, limit: limit, mode: mode },
         });
         return response;
     } catch (error) {
@@ -39,10 +40,11 @@ export const getGeneList = async (dataset, query_str) => {
     }
 };
 
-export const getSnpList = async (dataset, query_str) => {
+// limit and mode ("prefix", "substring" or "fuzzy") are optional
+export const getSnpList = async (dataset, query_str, limit, mode) => {
     try {
         const response = await axios.get(`${QTL_URL}/getsnplist`, {
-            params: { dataset: dataset, query_str: query_str },
+            params: { dataset: dataset, query_str: query_str, limit: limit, mode: mode },
         });
         return response;
     } catch (error) {
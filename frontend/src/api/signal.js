@@ -41,6 +41,35 @@ export const getRegionSignalData = async (
     }
 };
 
+export const getMultiRegionSignalData = async (
+    dataset,
+    chromosome,
+    start,
+    end,
+    celltypes,
+    binSize,
+) => {
+    try {
+        const response = await axios.get(
+            `${SIGNAL_URL}/getmultiregionsignaldata`,
+            {
+                params: {
+                    dataset: dataset,
+                    chromosome: chromosome,
+                    start: start,
+                    end: end,
+                    celltypes: celltypes,
+                    binsize: binSize,
+                },
+            },
+        );
+        return response;
+    } catch (error) {
+        console.error("Error getMultiRegionSignalData:", error);
+        throw error;
+    }
+};
+
 export const getCellTypeList = async (dataset) => {
     try {
         const response = await axios.get(`${SIGNAL_URL}/getcelltypelist`, {
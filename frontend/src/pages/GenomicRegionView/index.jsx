@@ -43,6 +43,10 @@ import {supportsWebGL} from "../../utils/webgl.js";
 const webGLSupported = supportsWebGL();
 console.log("WebGL supported:", webGLSupported);
 
+// The server bins signal at power-of-two sizes (signal_tiles.snap_bin_size in the backend),
+// so request that size and use it for the bin ranges shown in the plot.
+const snapBinSize = (binSize) => (binSize <= 1 ? 1 : 2 ** Math.ceil(Math.log2(binSize)));
+
 function ConfirmationDialog({
                                 isOpen,
                                 handleClose,
@@ -263,8 +267,9 @@ function GenomicRegionView() {
                 }
             }
 
-            const binSize =
-                binSizeOverride ?? Math.ceil(Math.abs(end - start) * 0.002);
+            const binSize = snapBinSize(
+                binSizeOverride ?? Math.ceil(Math.abs(end - start) * 0.002),
+            );
 
             await fetchSignalData(datasetId, start, end, binSize);
             setCurrentBinSize(binSize);
@@ -472,8 +477,8 @@ function GenomicRegionView() {
             selectedChromosome &&
             datasetId
         ) {
-            const binSize = Math.ceil(
-                Math.abs(visibleRange.end - visibleRange.start) * 0.002,
+            const binSize = snapBinSize(
+                Math.ceil(Math.abs(visibleRange.end - visibleRange.start) * 0.002),
             );
 
             // Only fetch if the bin size changed significantly or was panned
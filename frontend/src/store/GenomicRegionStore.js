@@ -1,7 +1,7 @@
 import { create } from "zustand";
 import {
     getBWDataExists,
-    getRegionSignalData,
+    getMultiRegionSignalData,
     getCellTypeList,
     getGeneLocationsInChromosome,
     getGwasInChromosome,
@@ -132,34 +132,43 @@ const useSignalStore = create((set, get) => ({
         }
         set({ loading: true, snpData: {} });
 
-        const promises = get().availableCellTypes.map(async (c) => {
-            // console.log(
-            //     `Fetching signal data for ${dataset}, chromosome ${chromosome}, range ${start}-${end}, cell type ${c}, bin size ${binSize}`,
-            // );
-
-            const response = await getRegionSignalData(
+        try {
+            // all cell type tracks in one request
+            const cellTypes = get().availableCellTypes;
+            const response = await getMultiRegionSignalData(
                 dataset,
                 chromosome,
                 start,
                 end,
-                c,
+                cellTypes,
                 binSize,
             );
             const hasBWData = response.data.hasBWData;
-            set({ hasBWData: hasBWData });
             if (!hasBWData) {
-                return [c, []];
+                set({
+                    hasBWData: false,
+                    signalData: Object.fromEntries(cellTypes.map((c) => [c, []])),
+                    loading: false,
+                });
+                return;
             }
-            const signalData = response.data.data;
-            const signalDataRows = columnToRow(signalData);
-            return [c, signalDataRows];
-        });
 
-        try {
-            const results = await Promise.all(promises);
-
-            const newSignalData = Object.fromEntries(results);
-            set({ signalData: newSignalData, loading: false, error: null });
+            const tracks = response.data.data;
+            for (const [c, message] of Object.entries(response.data.errors)) {
+                console.error(`Error fetching signal data for ${c}:`, message);
+            }
+            const newSignalData = Object.fromEntries(
+                cellTypes.map((c) => [
+                    c,
+                    tracks[c] ? columnToRow(tracks[c]) : [],
+                ]),
+            );
+            set({
+                hasBWData: true,
+                signalData: newSignalData,
+                loading: false,
+                error: null,
+            });
         } catch (error) {
             console.error("Error fetching signal data:", error);
             throw error;
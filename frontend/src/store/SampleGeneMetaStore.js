@@ -90,7 +90,8 @@ const useSampleGeneMetaStore = create((set, get) => ({
         }
 
         try {
-            const response = await getGeneList(dataset_id, query_str)
+            // the autocomplete shows the first 100 matches
+            const response = await getGeneList(dataset_id, query_str, 100)
             if (response.status === 200) {
                 const data = await response.data
                 await set({geneList: data})